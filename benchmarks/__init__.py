@@ -0,0 +1,4 @@
+"""Micro-benchmarks for the hot paths of the collector.
+
+Run them from the repository root, e.g. ``python -m benchmarks.codec``.
+"""
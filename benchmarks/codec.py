@@ -0,0 +1,96 @@
+"""Compare the XOR codec in toad_sp_data.smartplug against the original
+byte-by-byte implementation."""
+import argparse
+import json
+import timeit
+from struct import pack
+
+from tests.mocks import SmartPlugMock
+from toad_sp_data import smartplug
+
+
+def reference_encrypt(payload: bytes) -> bytes:
+    key = 171
+    result = pack(">I", len(payload))
+    for i in payload:
+        key = x = key ^ i
+        result += bytes([x])
+    return result
+
+
+def reference_decrypt(response: bytes) -> bytes:
+    response = response[4:]
+    key = 171
+    result = b""
+    for i in response:
+        x = key ^ i
+        key = i
+        result += bytes([x])
+    return result
+
+
+def payloads():
+    """
+    Payloads to benchmark: the SmartPlugMock command and response, a
+    realistic sysinfo-sized response and a large buffer.
+
+    :return: dict with payload names as keys and plain bytes as values
+    """
+    sysinfo = dict(SmartPlugMock.ok_response)
+    sysinfo["system"] = {
+        "get_sysinfo": dict(
+            SmartPlugMock.ok_response["system"]["get_sysinfo"],
+            alias="x" * 32,
+            dev_name="Wi-Fi Smart Plug With Energy Monitoring",
+            deviceId="0" * 40,
+            hwId="0" * 32,
+            fwId="0" * 32,
+            oemId="0" * 32,
+            sw_ver="1.2.5 Build 171213 Rel.101523",
+        )
+    }
+    return {
+        "mock command": json.dumps(SmartPlugMock.ok_command).encode("utf-8"),
+        "mock response": json.dumps(SmartPlugMock.ok_response).encode("utf-8"),
+        "sysinfo": json.dumps(sysinfo).encode("utf-8"),
+        "64 KiB": bytes(range(256)) * 256,
+    }
+
+
+def check(payload: bytes) -> None:
+    encrypted = reference_encrypt(payload)
+    assert smartplug.encrypt(payload) == encrypted, "encrypt output differs"
+    assert smartplug.decrypt(encrypted) == payload, "decrypt output differs"
+    assert reference_decrypt(encrypted) == payload
+    # feed the response in uneven chunks
+    decryptor = smartplug.Decryptor()
+    body = memoryview(encrypted)[4:]
+    chunks = []
+    while body:
+        chunks.append(decryptor.feed(body[:7]))
+        body = body[7:]
+    assert b"".join(chunks) == payload, "incremental decrypt output differs"
+
+
+def bench(number: int) -> None:
+    print(f"numpy: {'yes' if smartplug.np is not None else 'no'}")
+    header = ("payload", "bytes", "function", "old us", "new us")
+    print("{:<14}{:>7}  {:<8}{:>10}{:>10}".format(*header))
+    for name, payload in payloads().items():
+        check(payload)
+        encrypted = reference_encrypt(payload)
+        rounds = max(1, number * 256 // max(len(payload), 256))
+        for label, old, new, arg in (
+            ("encrypt", reference_encrypt, smartplug.encrypt, payload),
+            ("decrypt", reference_decrypt, smartplug.decrypt, encrypted),
+        ):
+            old_t = timeit.timeit(lambda: old(arg), number=rounds) / rounds * 1e6
+            new_t = timeit.timeit(lambda: new(arg), number=rounds) / rounds * 1e6
+            row = (name, len(payload), label, old_t, new_t)
+            print("{:<14}{:>7}  {:<8}{:>10.2f}{:>10.2f}".format(*row))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-n", "--number", type=int, default=2000)
+    bench(parser.parse_args().number)
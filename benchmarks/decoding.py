@@ -0,0 +1,92 @@
+"""Compare the time to get the power, relay state and MAC out of HS110
+responses with each JSON decoder and with the targeted extraction."""
+import argparse
+import timeit
+from typing import Dict, List
+
+from toad_sp_data import capture, decoding, logger, smartplug
+
+# answers of HS110 plugs to get_realtime and get_sysinfo
+PAYLOADS = {
+    "hs110 v1": (
+        b'{"emeter":{"get_realtime":{"current":0.012517,"voltage":231.215513,'
+        b'"power":1.522843,"total":0.012,"err_code":0}},"system":{"get_sysinfo":'
+        b'{"err_code":0,"sw_ver":"1.2.5 Build 171213 Rel.101523","hw_ver":"1.0",'
+        b'"type":"IOT.SMARTPLUGSWITCH","model":"HS110(EU)","mac":"50:C7:BF:01:02:03",'
+        b'"deviceId":"8006E1B4C4A1A1F5C1B1C8D8E5A2D8A81B2C9C61",'
+        b'"hwId":"45E29DA8382494D2E82688B52A0B2EB5",'
+        b'"fwId":"00000000000000000000000000000000",'
+        b'"oemId":"3D341ECE302C0642C99E31CE2430544B",'
+        b'"alias":"Desk","dev_name":"Wi-Fi Smart Plug With Energy Monitoring",'
+        b'"icon_hash":"","relay_state":1,"on_time":4326,"active_mode":"schedule",'
+        b'"feature":"TIM:ENE","updating":0,"rssi":-61,"led_off":0,'
+        b'"latitude":43.270784,"longitude":-2.938756}}}'
+    ),
+    "hs110 v2": (
+        b'{"emeter":{"get_realtime":{"voltage_mv":230512,"current_ma":8,'
+        b'"power_mw":1200,"total_wh":3,"err_code":0}},"system":{"get_sysinfo":'
+        b'{"sw_ver":"1.0.4 Build 191111 Rel.143500","hw_ver":"2.0",'
+        b'"model":"HS110(EU)","deviceId":"80066D4A2D2D2A3E4F5A6B7C8D9E0F1A2B3C4D5E",'
+        b'"oemId":"1998A14DAA86E4E001FD7CAF42868B5E",'
+        b'"hwId":"044A516EE63C875F9458DA25C2CCC5A0","rssi":-55,'
+        b'"latitude_i":432707,"longitude_i":-29387,"alias":"Kettle",'
+        b'"status":"new","mic_type":"IOT.SMARTPLUGSWITCH","feature":"TIM:ENE",'
+        b'"mac":"B0:BE:76:01:02:03","updating":0,"led_off":0,"relay_state":0,'
+        b'"on_time":0,"icon_hash":"","dev_name":"Smart Wi-Fi Plug With Energy '
+        b'Monitoring","active_mode":"none","next_action":{"type":-1},'
+        b'"err_code":0}}}'
+    ),
+}
+
+
+def captured_payloads(path: str) -> Dict[str, List[bytes]]:
+    """
+    Decrypt the full responses of a capture file.
+
+    :param path: capture file written with [CAPTURE] enabled
+    :return: payloads by name, for bench()
+    """
+    payloads = []
+    for response in capture.read_capture(path):
+        data = smartplug.decrypt(response.frame)
+        if b'"system"' in data:
+            payloads.append(data)
+    return {"capture": payloads}
+
+
+def bench(payloads: Dict[str, List[bytes]], number: int) -> None:
+    methods = {
+        f"{name} + extract_info": (
+            lambda data, loads=loads: smartplug.extract_info(loads(data))
+        )
+        for name, loads in decoding.DECODERS.items()
+    }
+    methods["targeted"] = decoding.extract_info
+    header = ("payload", "bytes", "method", "us/response", "fallbacks")
+    print("{:<10}{:>6}  {:<24}{:>12}{:>10}".format(*header))
+    for name, samples in payloads.items():
+        size = sum(map(len, samples)) / max(len(samples), 1)
+        fallbacks = sum(decoding.extract_info(data) is None for data in samples)
+        for method_name, method in methods.items():
+
+            def run():
+                for data in samples:
+                    method(data)
+
+            seconds = timeit.timeit(run, number=number)
+            per_response = seconds / number / max(len(samples), 1) * 1e6
+            row = (name, size, method_name, per_response)
+            row += (fallbacks if method_name == "targeted" else "",)
+            print("{:<10}{:>6.0f}  {:<24}{:>12.2f}{:>10}".format(*row))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-n", "--number", type=int, default=10000)
+    parser.add_argument("--capture", help="benchmark the responses of a capture")
+    args = parser.parse_args()
+    logger.verbose = False
+    if args.capture:
+        bench(captured_payloads(args.capture), max(1, args.number // 100))
+    else:
+        bench({name: [data] for name, data in PAYLOADS.items()}, args.number)
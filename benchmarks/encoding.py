@@ -0,0 +1,42 @@
+"""Compare the size and encode time of the MQTT payload encodings."""
+import argparse
+import timeit
+from time import time
+
+from toad_sp_data import encoding
+from toad_sp_data.gatherer import wrap_senml
+
+
+def readings(count: int) -> dict:
+    """
+    Build a wrapped senml pack as published by Gatherer.
+
+    :param count: number of readings, two records each
+    :return: wrapped senml
+    """
+    senml = []
+    for i in range(count):
+        base_name = f"sp_w.r{i // 10}.c{i % 10}"
+        senml.append(
+            {"bn": f"{base_name}/power", "bu": "W", "t": time(), "v": 42.0 + i / 7}
+        )
+        senml.append({"bn": f"{base_name}/status", "bu": "S", "t": time(), "v": 1})
+    return wrap_senml(senml)
+
+
+def bench(number: int) -> None:
+    header = ("readings", "encoding", "bytes/reading", "encode us/reading")
+    print("{:>8}  {:<8}{:>15}{:>19}".format(*header))
+    for count in (1, 10, 200):
+        payload = readings(count)
+        for name, encoder in encoding.ENCODERS.items():
+            size = len(encoder(payload))
+            seconds = timeit.timeit(lambda: encoder(payload), number=number)
+            row = (count, name, size / count, seconds / number / count * 1e6)
+            print("{:>8}  {:<8}{:>15.1f}{:>19.2f}".format(*row))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-n", "--number", type=int, default=1000)
+    bench(parser.parse_args().number)
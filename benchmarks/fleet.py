@@ -0,0 +1,335 @@
+"""Run the real Gatherer against a fleet of simulated SmartPlugs and a local
+MQTT stand-in, and report its throughput and resource usage.
+
+The plugs listen on port 9999 of consecutive loopback addresses
+(127.10.0.1, 127.10.0.2, ...) inside a separate process, so the CPU time
+and memory reported are the collector's only. Dead hosts have no listener
+and refuse connections, lost requests are never answered.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import random
+import resource
+import socket
+import struct
+import tempfile
+from time import monotonic, perf_counter, sleep
+from typing import Dict, List
+
+from toad_sp_data import config, gatherer, logger, protocol, smartplug
+
+_BASE_ADDRESS = struct.unpack(">I", socket.inet_aton("127.10.0.1"))[0]
+_PORT = 9999
+
+
+def plug_address(index: int) -> str:
+    return socket.inet_ntoa(struct.pack(">I", _BASE_ADDRESS + index))
+
+
+def plug_mac(index: int) -> str:
+    return ":".join(f"{b:02X}" for b in struct.pack(">IH", 0xCAFE, index))
+
+
+class SimulatedPlug:
+    """A SmartPlug answering get_realtime/get_sysinfo with a random walk of
+    power values after a configurable latency."""
+
+    def __init__(self, index: int, args: argparse.Namespace):
+        self.address = plug_address(index)
+        self.mac = plug_mac(index)
+        self.args = args
+        self.power = random.uniform(0, 200)
+        self.relay_state = 1
+
+    def response(self, cmd: dict) -> dict:
+        self.power = max(0.0, self.power + random.gauss(0, self.args.power_step))
+        response: Dict[str, dict] = {}
+        if "emeter" in cmd:
+            response["emeter"] = {
+                "get_realtime": {
+                    "current": self.power / 230,
+                    "voltage": 230.0,
+                    "power": self.power,
+                    "total": 1.5,
+                    "err_code": 0,
+                }
+            }
+        if "system" in cmd:
+            response["system"] = {
+                "get_sysinfo": {
+                    "sw_ver": "1.2.5 Build 171213 Rel.101523",
+                    "hw_ver": "1.0",
+                    "type": "IOT.SMARTPLUGSWITCH",
+                    "model": "HS110(EU)",
+                    "mac": self.mac,
+                    "deviceId": "8006" + "0" * 36,
+                    "hwId": "0" * 32,
+                    "fwId": "0" * 32,
+                    "oemId": "0" * 32,
+                    "alias": f"Plug {self.address}",
+                    "dev_name": "Wi-Fi Smart Plug With Energy Monitoring",
+                    "icon_hash": "",
+                    "relay_state": self.relay_state,
+                    "on_time": 1000,
+                    "active_mode": "schedule",
+                    "feature": "TIM:ENE",
+                    "updating": 0,
+                    "rssi": -60,
+                    "led_off": 0,
+                    "latitude": 0,
+                    "longitude": 0,
+                    "err_code": 0,
+                }
+            }
+        return response
+
+    async def handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            while True:
+                cmd = json.loads(await smartplug.read_frame(reader, 60))
+                if random.random() < self.args.loss:
+                    # never answer, the collector has to time out
+                    await asyncio.sleep(60)
+                    break
+                latency = self.args.latency + random.uniform(0, self.args.jitter)
+                await asyncio.sleep(latency / 1000)
+                payload = json.dumps(self.response(cmd)).encode("utf-8")
+                writer.write(smartplug.encrypt(payload))
+                await writer.drain()
+                if not self.args.keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        except asyncio.CancelledError:
+            # the fleet is shutting down
+            return
+        writer.close()
+
+
+def run_fleet(args: argparse.Namespace, ready, stop) -> None:
+    """
+    Serve the simulated plugs until stop is set, to be run in a process.
+
+    :param args: benchmark arguments
+    :param ready: event set once every plug is listening
+    :param stop: event to set to stop the plugs
+    :return: None
+    """
+    random.seed(args.seed)
+
+    async def serve():
+        servers = []
+        for index in range(args.plugs):
+            if random.random() < args.dead:
+                continue
+            plug = SimulatedPlug(index, args)
+            server = await asyncio.start_server(plug.handle, plug.address, _PORT)
+            servers.append(server)
+        ready.set()
+        while not stop.is_set():
+            await asyncio.sleep(0.1)
+        for server in servers:
+            server.close()
+
+    asyncio.run(serve())
+
+
+class MQTTStandIn:
+    """Minimal MQTT 3.1.1 broker that accepts connections and counts the
+    PUBLISH packets it receives."""
+
+    def __init__(self):
+        self.messages = 0
+        self.payload_bytes = 0
+        self.server: asyncio.AbstractServer = None
+
+    async def start(self) -> int:
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            while True:
+                packet_type = (await reader.readexactly(1))[0] >> 4
+                length, shift = 0, 0
+                while True:
+                    byte = (await reader.readexactly(1))[0]
+                    length |= (byte & 0x7F) << shift
+                    shift += 7
+                    if not byte & 0x80:
+                        break
+                body = await reader.readexactly(length)
+                if packet_type == 1:  # CONNECT
+                    writer.write(b"\x20\x02\x00\x00")
+                elif packet_type == 3:  # PUBLISH
+                    self.messages += 1
+                    topic_length = struct.unpack_from(">H", body)[0]
+                    self.payload_bytes += len(body) - 2 - topic_length
+                elif packet_type == 12:  # PINGREQ
+                    writer.write(b"\xd0\x00")
+                elif packet_type == 14:  # DISCONNECT
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        writer.close()
+
+
+class BenchmarkGatherer(gatherer.Gatherer):
+    """Gatherer that counts polls and records their latency."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.latencies: List[float] = []
+        self.polls = 0
+
+    async def poll(self, ip: str) -> float:
+        start = perf_counter()
+        delay = await super().poll(ip)
+        self.latencies.append(perf_counter() - start)
+        self.polls += 1
+        return delay
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as statm:
+            pages = int(statm.read().split()[1])
+        return pages * resource.getpagesize() / 2 ** 20
+    except OSError:  # pragma: no cover
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def run_collector(args: argparse.Namespace) -> dict:
+    """
+    Run the Gatherer against the fleet for args.duration seconds.
+
+    :param args: benchmark arguments
+    :return: report
+    """
+    broker = MQTTStandIn()
+    broker_port = await broker.start()
+    ids = {plug_mac(i): f"sp_bench.{i}" for i in range(args.plugs)}
+    g = BenchmarkGatherer(asyncio.get_event_loop(), "Benchmark", smartplug_ids=ids)
+    await g.connect("127.0.0.1", broker_port)
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    cpu_start = usage.ru_utime + usage.ru_stime
+    start = monotonic()
+    g.start([plug_address(i) for i in range(args.plugs)])
+    await asyncio.sleep(args.duration)
+    elapsed = monotonic() - start
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    cpu = usage.ru_utime + usage.ru_stime - cpu_start
+    polls, latencies = g.polls, list(g.latencies)
+    planned = None if g.sampler is None else round(g.sampler.planned_rate(), 1)
+    await g.stop()
+    await broker.stop()
+    report = {
+        "plugs": args.plugs,
+        "engine": config.GATHERER_ENGINE,
+        "seconds": round(elapsed, 2),
+        "polls": polls,
+        "polls/s": round(polls / elapsed, 1),
+        "latency p50 ms": round(percentile(latencies, 0.5) * 1000, 2),
+        "latency p90 ms": round(percentile(latencies, 0.9) * 1000, 2),
+        "latency p99 ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "mqtt messages": broker.messages,
+        "mqtt payload bytes": broker.payload_bytes,
+        "cpu s": round(cpu, 2),
+        "cpu % of wall": round(100 * cpu / elapsed, 1),
+        "rss MB": round(rss_mb(), 1),
+    }
+    if planned is not None:
+        report["sampler polls/s"] = planned
+    return report
+
+
+def configure(args: argparse.Namespace) -> None:
+    """Point the collector at the fleet only, without ETCD nor discovery."""
+    config.ETCD_HOST, config.ETCD_PORT = "127.0.0.1", 9
+    config.ETCD_FLUSH_INTERVAL = 3600
+    config.ETCD_WATCH = False
+    config.SPOOL_DIRECTORY = tempfile.mkdtemp(prefix="toad_sp_spool")
+    config.SNAPSHOT_ENABLED = False
+    # poll the whole fleet from the start
+    config.GATHERER_RAMP_RATE = 0
+    config.DISCOVERY_MODE = "tcp"
+    config.GATHERER_ENGINE = args.engine
+    config.GATHERER_WORKERS = args.workers
+    config.SP_KEEP_ALIVE = args.keep_alive
+    config.DEADBAND_ENABLED = not args.no_deadband
+    config.SLEEP_TIME_SHORT = args.period
+    config.SLEEP_TIME_LONG = args.period * 3
+    # poll every plug at the period unless comparing with the sampler
+    config.SAMPLER_ENABLED = args.adaptive
+    config.SAMPLER_MIN_INTERVAL = args.period
+    config.SAMPLER_MAX_INTERVAL = args.period * 12
+    config.SAMPLER_BUDGET = args.budget
+    logger.verbose = False
+    if not args.log:
+        # the ETCD and per-IP errors would flood the report
+        logging.disable(logging.ERROR)
+    config.MQTT_DATA_BASES = ["bench"]
+    config.MQTT_DATA_ENCODINGS = {"bench": args.encoding}
+    protocol.MQTT_PUB_TOPIC = "bench"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--plugs", type=int, default=1000)
+    parser.add_argument("--duration", type=float, default=20, help="seconds")
+    parser.add_argument("--period", type=float, default=5, help="poll period (s)")
+    parser.add_argument("--latency", type=float, default=20, help="ms")
+    parser.add_argument("--jitter", type=float, default=30, help="ms")
+    parser.add_argument("--loss", type=float, default=0.01, help="fraction")
+    parser.add_argument("--dead", type=float, default=0.2, help="fraction")
+    parser.add_argument("--power-step", type=float, default=5, help="W")
+    parser.add_argument("--engine", choices=("loop", "scheduler"), default="loop")
+    parser.add_argument("--workers", type=int, default=config.GATHERER_WORKERS)
+    parser.add_argument("--keep-alive", action="store_true")
+    parser.add_argument("--encoding", default="json")
+    parser.add_argument("--no-deadband", action="store_true")
+    parser.add_argument(
+        "--adaptive", action="store_true", help="adapt the period to the power"
+    )
+    parser.add_argument("--budget", type=float, default=0, help="polls/s, 0 any")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--log", action="store_true", help="keep collector logs")
+    args = parser.parse_args()
+
+    configure(args)
+    context = multiprocessing.get_context("spawn")
+    ready, stop = context.Event(), context.Event()
+    fleet = context.Process(target=run_fleet, args=(args, ready, stop))
+    fleet.start()
+    if not ready.wait(300):
+        raise RuntimeError("The simulated fleet did not start")
+    try:
+        report = asyncio.run(run_collector(args))
+    finally:
+        stop.set()
+        fleet.join(10)
+        sleep(0.1)
+    for key, value in report.items():
+        print(f"{key:<20}{value}")
+
+
+if __name__ == "__main__":
+    main()
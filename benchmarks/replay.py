@@ -0,0 +1,159 @@
+"""Feed the responses of a capture file (see [CAPTURE] in config.ini) through
+the decode and publish path of the Gatherer, and report how long each step
+took.
+
+Every response goes through decrypt, json.loads, extract_info, info_to_senml
+and pub_to_mqtt, whose messages are counted instead of being sent. Responses
+are replayed as fast as possible, or with their captured timing when
+--realtime is given. Responses of plugs only asked for their power reuse the
+relay state and MAC of the last full response from the same IP.
+"""
+import argparse
+import asyncio
+import json
+import logging
+from collections import defaultdict
+from time import perf_counter, sleep
+from typing import Dict, List
+
+from toad_sp_data import capture, config, gatherer, logger, protocol, smartplug
+from toad_sp_data.capture import CapturedResponse
+
+
+class ReplayGatherer(gatherer.Gatherer):
+    """Gatherer that counts the messages it publishes."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.messages = 0
+        self.payload_bytes = 0
+
+    def publish(self, message_or_topic, payload=None, *args, **kwargs):
+        self.messages += 1
+        self.payload_bytes += len(payload)
+
+
+def plug_ids(responses: List[CapturedResponse]) -> Dict[str, str]:
+    """
+    Give an ID to the MAC of every plug in the capture.
+
+    :param responses: captured responses
+    :return: dict with MACs as keys and IDs as values
+    """
+    ids: Dict[str, str] = {}
+    for response in responses:
+        try:
+            sysinfo = json.loads(smartplug.decrypt(response.frame))["system"]
+        except (KeyError, ValueError, smartplug.DecryptionException):
+            continue
+        mac = sysinfo["get_sysinfo"]["mac"]
+        ids.setdefault(mac, f"sp_replay.{len(ids)}")
+    return ids
+
+
+def replay(
+    g: ReplayGatherer, responses: List[CapturedResponse], args: argparse.Namespace
+) -> dict:
+    """
+    Replay the responses through g and time every step.
+
+    :param g: gatherer to format and publish with
+    :param responses: captured responses
+    :param args: benchmark arguments
+    :return: report
+    """
+    seconds: Dict[str, float] = defaultdict(float)
+    # last full info by IP, for the responses without sysinfo
+    last_info: Dict[str, dict] = {}
+    errors = 0
+    start = perf_counter()
+    first = responses[0].timestamp if responses else 0
+    for response in responses:
+        if args.realtime:
+            delay = (response.timestamp - first) / args.speed
+            delay -= perf_counter() - start
+            if delay > 0:
+                sleep(delay)
+        try:
+            started = perf_counter()
+            data = smartplug.decrypt(response.frame)
+            decrypted = perf_counter()
+            parsed = json.loads(data)
+            loaded = perf_counter()
+            if "system" in parsed:
+                info = last_info[response.ip] = smartplug.extract_info(parsed)
+            else:
+                info = dict(last_info[response.ip])
+                info["power"] = smartplug.extract_power(parsed)
+            extracted = perf_counter()
+            senml = g.info_to_senml(info)
+            formatted = perf_counter()
+            g.pub_to_mqtt(gatherer.wrap_senml(senml))
+            published = perf_counter()
+        except (KeyError, ValueError, smartplug.DecryptionException):
+            errors += 1
+            continue
+        seconds["decrypt"] += decrypted - started
+        seconds["json.loads"] += loaded - decrypted
+        seconds["extract_info"] += extracted - loaded
+        seconds["info_to_senml"] += formatted - extracted
+        seconds["pub_to_mqtt"] += published - formatted
+    elapsed = perf_counter() - start
+    replayed = len(responses) - errors
+    report = {
+        "responses": len(responses),
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "responses/s": round(replayed / elapsed, 1) if elapsed else float("nan"),
+    }
+    for step, total in seconds.items():
+        report[f"{step} us"] = round(total / max(replayed, 1) * 1e6, 2)
+    report["mqtt messages"] = g.messages
+    report["mqtt payload bytes"] = g.payload_bytes
+    return report
+
+
+def configure(args: argparse.Namespace) -> None:
+    """Keep the collector away from ETCD, the broker and the capture itself."""
+    config.ETCD_HOST, config.ETCD_PORT = "127.0.0.1", 9
+    config.SPOOL_ENABLED = False
+    config.SNAPSHOT_ENABLED = False
+    config.CAPTURE_ENABLED = False
+    config.SP_KEEP_ALIVE = False
+    logger.verbose = False
+    if not args.log:
+        logging.disable(logging.ERROR)
+    config.MQTT_DATA_BASES = ["bench"]
+    config.MQTT_DATA_ENCODINGS = {"bench": args.encoding}
+    protocol.MQTT_PUB_TOPIC = "bench"
+
+
+async def run(args: argparse.Namespace) -> dict:
+    responses = list(capture.read_capture(args.capture)) * args.repeat
+    g = ReplayGatherer(
+        asyncio.get_event_loop(),
+        "Replay",
+        smartplug_ids=plug_ids(responses),
+        cached_ips={},
+    )
+    return replay(g, responses, args)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("capture", help="capture file")
+    parser.add_argument("--realtime", action="store_true")
+    parser.add_argument("--speed", type=float, default=1, help="realtime factor")
+    parser.add_argument("--repeat", type=int, default=1, help="replay n times")
+    parser.add_argument("--encoding", default="json")
+    parser.add_argument("--log", action="store_true", help="keep collector logs")
+    args = parser.parse_args()
+
+    configure(args)
+    report = asyncio.run(run(args))
+    for key, value in report.items():
+        print(f"{key:<20}{value}")
+
+
+if __name__ == "__main__":
+    main()
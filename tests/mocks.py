@@ -15,13 +15,35 @@ class SmartPlugMock:
         "system": {"get_sysinfo": {"mac": "CA:FE:CA:FE:CA:FE", "relay_state": 1}},
         "emeter": {"get_realtime": {"power": 42}},
     }
+    # response sent by a plug answering garbage, e.g. a truncated frame
+    garbage_response = b'{"emeter": {"get_realtime": {"pow'
 
-    def __init__(self, addr, port, loop: asyncio.AbstractEventLoop):
+    @staticmethod
+    def response_to(cmd) -> dict:
+        """Answer any part of the correct command, None if it is incorrect."""
+        if not isinstance(cmd, dict) or not cmd:
+            return None
+        for module, method in cmd.items():
+            if SmartPlugMock.ok_command.get(module) != method:
+                return None
+        return {module: SmartPlugMock.ok_response[module] for module in cmd}
+
+    def __init__(
+        self,
+        addr,
+        port,
+        loop: asyncio.AbstractEventLoop,
+        keep_alive=False,
+        garbage=False,
+    ):
         self.addr = addr
         self.port = port
-        self._coroutine = asyncio.start_server(
-            SmartPlugMock.handle_command, self.addr, self.port, loop=loop,
-        )
+        handler = SmartPlugMock.handle_command
+        if keep_alive:
+            handler = SmartPlugMock.handle_commands
+        if garbage:
+            handler = SmartPlugMock.handle_garbage
+        self._coroutine = asyncio.start_server(handler, self.addr, self.port)
         self._loop = loop
         self.server: asyncio.base_events.Server = ...
 
@@ -40,10 +62,11 @@ class SmartPlugMock:
         try:
             # decrypt and load message to raise exception if it is invalid
             cmd = loads(smartplug.decrypt(encrypted_cmd).decode("utf-8"))
-            if cmd != SmartPlugMock.ok_command:
+            response = SmartPlugMock.response_to(cmd)
+            if response is None:
                 raise smartplug.DecryptionException
             # send response
-            response = dumps(SmartPlugMock.ok_response)
+            response = dumps(response)
             encrypted_response = smartplug.encrypt(response.encode("utf-8"))
             writer.write(encrypted_response)
         except (JSONDecodeError, UnicodeDecodeError, smartplug.DecryptionException):
@@ -54,6 +77,73 @@ class SmartPlugMock:
         writer.close()
         await writer.wait_closed()
 
+    @staticmethod
+    async def handle_commands(
+        reader: asyncio.streams.StreamReader, writer: asyncio.streams.StreamWriter
+    ) -> None:
+        """Answer commands on the same connection until the client closes it
+        or sends an incorrect command."""
+        while True:
+            try:
+                response = SmartPlugMock.response_to(
+                    loads(await smartplug.read_frame(reader, 5))
+                )
+                if response is None:
+                    raise smartplug.DecryptionException
+            except (
+                asyncio.IncompleteReadError,
+                JSONDecodeError,
+                UnicodeDecodeError,
+                smartplug.DecryptionException,
+            ):
+                break
+            writer.write(smartplug.encrypt(dumps(response).encode("utf-8")))
+            await writer.drain()
+        writer.close()
+        await writer.wait_closed()
+
+    @staticmethod
+    async def handle_garbage(
+        reader: asyncio.streams.StreamReader, writer: asyncio.streams.StreamWriter
+    ) -> None:
+        """Answer any command with an encrypted response that is not JSON."""
+        await reader.read(2048)
+        writer.write(smartplug.encrypt(SmartPlugMock.garbage_response))
+        writer.write_eof()
+        await writer.drain()
+        writer.close()
+        await writer.wait_closed()
+
+
+class SmartPlugUDPMock(SmartPlugMock, asyncio.DatagramProtocol):
+    """SmartPlugs also answer get_sysinfo commands sent over UDP to the same
+    port, without the length header used over TCP."""
+
+    sysinfo_response = {"system": SmartPlugMock.ok_response["system"]}
+
+    def __init__(self, addr, port, loop: asyncio.AbstractEventLoop):
+        super().__init__(addr, port, loop)
+        self.transport: asyncio.DatagramTransport = ...
+
+    async def start(self):
+        await super().start()
+        self.transport, _ = await self._loop.create_datagram_endpoint(
+            lambda: self, local_addr=(self.addr, self.port)
+        )
+
+    async def stop(self):
+        self.transport.close()
+        await super().stop()
+
+    def datagram_received(self, data, addr):
+        try:
+            cmd = smartplug.decrypt_datagram(data)
+        except smartplug.DecryptionException:
+            return
+        if cmd == {"system": {"get_sysinfo": {}}}:
+            response = smartplug.encrypt_datagram(self.sysinfo_response)
+            self.transport.sendto(response, addr)
+
 
 if __name__ == "__main__":
     loop = asyncio.get_event_loop()
@@ -0,0 +1,47 @@
+from toad_sp_data.backoff import Backoff
+
+
+def test_unknown_address():
+    backoff = Backoff(fast_delay=5, base_delay=15, ceiling=100, jitter=0)
+    assert [backoff.failure("10.0.0.1", known=False) for _ in range(5)] == [
+        15,
+        30,
+        60,
+        100,
+        100,
+    ]
+    assert backoff.distribution() == {"<=128s": 1}
+    assert backoff.saved_probe_rate() == 1 / 15 - 1 / 100
+    # answering resets the backoff
+    assert backoff.success("10.0.0.1") == 5
+    assert len(backoff) == 0
+    assert backoff.failure("10.0.0.1", known=False) == 15
+
+
+def test_known_plug():
+    backoff = Backoff(fast_delay=5, base_delay=15, ceiling=100, fast_retries=2)
+    assert backoff.failure("10.0.0.1", known=True) == 5
+    assert backoff.failure("10.0.0.1", known=True) == 5
+    delay = backoff.failure("10.0.0.1", known=True)
+    # backoff with jitter after the fast retries
+    assert 9 <= delay <= 11
+    for _ in range(10):
+        assert backoff.failure("10.0.0.1", known=True) <= 110
+
+
+def test_long_dead_address():
+    backoff = Backoff(fast_delay=5, base_delay=15, ceiling=900, jitter=0.1)
+    for _ in range(5000):
+        delay = backoff.failure("10.0.0.1", known=False)
+        assert delay <= 900 * 1.1
+    # jittered around the ceiling, not stuck on it
+    assert delay >= 900 * 0.9
+
+
+def test_delay_without_polling():
+    backoff = Backoff(fast_delay=5, base_delay=15, ceiling=100, jitter=0)
+    assert backoff.delay("10.0.0.1") == 5
+    assert backoff.failure("10.0.0.1", known=False) == 15
+    # reading the delay does not back off further
+    assert backoff.delay("10.0.0.1") == backoff.delay("10.0.0.1") == 15
+    assert len(backoff) == 1
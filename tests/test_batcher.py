@@ -0,0 +1,27 @@
+import asyncio
+
+import pytest
+
+from toad_sp_data.batcher import SenMLBatcher
+
+_record = {"bn": "w.r0.c0/power", "bu": "W", "t": 0.0, "v": 42.0}
+
+
+def test_flush_on_size():
+    packs = []
+    batcher = SenMLBatcher(packs.append, max_records=4, window=60)
+    batcher.add([_record, _record])
+    batcher.add([{}])
+    assert len(batcher) == 2 and packs == []
+    batcher.add([_record, _record])
+    assert packs == [[_record] * 4] and len(batcher) == 0
+    assert batcher.flush() == 0 and len(packs) == 1
+
+
+@pytest.mark.asyncio
+async def test_flush_on_window():
+    packs = []
+    batcher = SenMLBatcher(packs.append, max_records=100, window=0.01)
+    batcher.add([_record])
+    await asyncio.wait_for(batcher.run_once(), 1)
+    assert packs == [[_record]]
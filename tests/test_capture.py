@@ -0,0 +1,37 @@
+import pytest
+
+from tests import mocks
+from toad_sp_data import capture, smartplug
+
+
+def test_write_and_read(tmp_path):
+    path = str(tmp_path / "plugs.cap")
+    writer = capture.CaptureWriter(path)
+    frame = smartplug.encrypt(b'{"emeter": {}}')
+    writer.write("10.0.0.1", 0.25, frame, timestamp=100.0)
+    writer.write("10.0.0.2", 0.5, frame, timestamp=101.0)
+    writer.close()
+    responses = list(capture.read_capture(path))
+    assert [r.ip for r in responses] == ["10.0.0.1", "10.0.0.2"]
+    assert responses[0] == capture.CapturedResponse(100.0, "10.0.0.1", 0.25, frame)
+    # a partially written record ends the capture
+    with open(path, "ab") as file:
+        file.write(b"\x00" * 5)
+    assert len(list(capture.read_capture(path))) == 2
+
+
+@pytest.mark.asyncio
+async def test_capture_responses(tmp_path, unused_tcp_port, event_loop):
+    sp_mock = mocks.SmartPlugMock("127.0.0.1", unused_tcp_port, event_loop)
+    await sp_mock.start()
+    path = str(tmp_path / "capture" / "plugs.cap")
+    capture.start(path)
+    try:
+        ok, response = await smartplug.get_power("127.0.0.1", unused_tcp_port)
+    finally:
+        capture.stop()
+        await sp_mock.stop()
+    assert ok and capture.writer is None
+    (captured,) = capture.read_capture(path)
+    assert captured.ip == "127.0.0.1" and captured.latency >= 0
+    assert smartplug.decrypt_command(captured.frame) == response
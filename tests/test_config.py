@@ -0,0 +1,13 @@
+import pytest
+
+from toad_sp_data import config
+from toad_sp_data.encoding import EncodingException
+
+
+def test_parse_data_bases():
+    assert config.parse_data_bases("influx_data/sp,other_db/sp:cbor") == {
+        "influx_data/sp": "json",
+        "other_db/sp": "cbor",
+    }
+    with pytest.raises(EncodingException):
+        config.parse_data_bases("influx_data/sp:cbr")
@@ -0,0 +1,33 @@
+from toad_sp_data.deadband import Deadband
+
+
+def test_absolute_deadband():
+    deadband = Deadband(absolute=1, relative=0.05, heartbeat=300)
+    assert deadband.update("mac", 0.0, 0, now=0)
+    assert not deadband.update("mac", 0.4, 0, now=1)
+    assert not deadband.update("mac", 1.0, 0, now=2)
+    assert deadband.update("mac", 1.5, 0, now=3)
+    # compared against the last published power, not the last reading
+    assert not deadband.update("mac", 2.0, 0, now=4)
+    assert deadband.update("mac", 2.6, 0, now=5)
+    assert deadband.published == 3 and deadband.suppressed == 3
+
+
+def test_relative_deadband():
+    deadband = Deadband(absolute=1, relative=0.05, heartbeat=300)
+    assert deadband.update("mac", 1000.0, 1, now=0)
+    assert not deadband.update("mac", 1045.0, 1, now=1)
+    assert deadband.update("mac", 1051.0, 1, now=2)
+
+
+def test_relay_state_and_heartbeat():
+    deadband = Deadband(absolute=1, relative=0.05, heartbeat=300)
+    assert deadband.update("mac", 0.0, 1, now=0)
+    assert deadband.update("mac", 0.0, 0, now=1)
+    assert not deadband.update("mac", 0.0, 0, now=300)
+    assert deadband.update("mac", 0.0, 0, now=301)
+    # plugs are tracked independently
+    assert deadband.update("other", 0.0, 0, now=301)
+    assert len(deadband) == 2
+    deadband.forget("mac")
+    assert deadband.update("mac", 0.0, 0, now=302)
@@ -0,0 +1,81 @@
+import json
+
+import pytest
+
+from toad_sp_data import decoding
+
+# HS110 v1 answer to get_realtime and get_sysinfo
+_hs110_v1 = (
+    b'{"emeter":{"get_realtime":{"current":0.012,"voltage":231.2,"power":1.5,'
+    b'"total":0.012,"err_code":0}},"system":{"get_sysinfo":{"err_code":0,'
+    b'"sw_ver":"1.2.5 Build 171213 Rel.101523","hw_ver":"1.0",'
+    b'"type":"IOT.SMARTPLUGSWITCH","model":"HS110(EU)","mac":"50:C7:BF:01:02:03",'
+    b'"alias":"Desk \\"power\\": 9","relay_state":1,"on_time":120,'
+    b'"feature":"TIM:ENE","rssi":-61,"led_off":0}}}'
+)
+# HS110 v2 reports milli-units
+_hs110_v2 = (
+    b'{"emeter": {"get_realtime": {"voltage_mv": 230512, "current_ma": 8, '
+    b'"power_mw": 1200, "total_wh": 3, "err_code": 0}}, "system": {"get_sysinfo": '
+    b'{"mac": "B0:BE:76:01:02:03", "relay_state": 0, "err_code": 0}}}'
+)
+
+
+def full_info(data: bytes) -> dict:
+    response = json.loads(data)
+    power = response["emeter"]["get_realtime"]
+    return {
+        "power": power["power"] if "power" in power else power["power_mw"] / 1000.0,
+        "relay_state": response["system"]["get_sysinfo"]["relay_state"],
+        "mac": response["system"]["get_sysinfo"]["mac"],
+    }
+
+
+def test_extract_info():
+    for data in (_hs110_v1, _hs110_v2):
+        assert decoding.extract_info(data) == full_info(data)
+    assert decoding.extract_power(_hs110_v2) == 1.2
+    assert decoding.extract_power(b'{"emeter":{"get_realtime":{"power":42}}}') == 42
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        # emeter not supported
+        b'{"emeter":{"err_code":-1,"err_msg":"module not support"},'
+        b'"system":{"get_sysinfo":{"mac":"50:C7:BF:01:02:03","relay_state":1}}}',
+        # duplicated keys, the full parse keeps the last one
+        _hs110_v1.replace(b'"rssi"', b'"power":2,"rssi"'),
+        # both units
+        _hs110_v2.replace(b'"total_wh"', b'"power":1.2,"total_wh"'),
+        # unexpected values
+        _hs110_v1.replace(b'"relay_state":1', b'"relay_state":"on"'),
+        _hs110_v1.replace(b'"power":1.5', b'"power":null'),
+        _hs110_v1.replace(b"50:C7:BF:01:02:03", b"unknown"),
+    ],
+)
+def test_extract_info_fallback(data):
+    assert decoding.extract_info(data) is None
+
+
+def test_get_decoder():
+    assert decoding.get_decoder("json") is json.loads
+    assert decoding.get_decoder("auto")(_hs110_v1) == json.loads(_hs110_v1)
+    with pytest.raises(decoding.DecodingException):
+        decoding.get_decoder("yaml")
+
+
+def test_targeted():
+    assert decoding.targeted("auto", "json")
+    assert decoding.targeted("targeted", "auto")
+    assert not decoding.targeted("full", "json")
+    with pytest.raises(decoding.DecodingException):
+        decoding.targeted("regex", "json")
+
+
+def test_framed():
+    assert decoding.framed(_hs110_v1)
+    assert decoding.framed(b' {"system": {}}\n')
+    assert not decoding.framed(_hs110_v1[: len(_hs110_v1) // 2])
+    assert not decoding.framed(b"")
+    assert not decoding.framed(b"\x8b\x00garbage")
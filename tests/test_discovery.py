@@ -0,0 +1,41 @@
+import pytest
+
+from tests import mocks
+from toad_sp_data import smartplug
+from toad_sp_data.discovery import Discovery
+
+
+@pytest.fixture
+async def udp_mock(unused_udp_port, event_loop) -> mocks.SmartPlugUDPMock:
+    sp_mock = mocks.SmartPlugUDPMock("127.0.0.1", unused_udp_port, event_loop)
+    await sp_mock.start()
+    yield sp_mock
+    await sp_mock.stop()
+
+
+@pytest.mark.asyncio
+async def test_scan(udp_mock):
+    found = []
+    discovery = Discovery(
+        targets=[udp_mock.addr],
+        on_found=lambda mac, ip: found.append((mac, ip)),
+        port=udp_mock.port,
+        timeout=0.2,
+    )
+    mac = mocks.SmartPlugMock.ok_response["system"]["get_sysinfo"]["mac"]
+    assert await discovery.scan() == {mac: udp_mock.addr}
+    assert found == [(mac, udp_mock.addr)]
+    # plugs that did not move are not reported again
+    await discovery.scan()
+    assert len(found) == 1
+
+
+def test_handle_reply():
+    discovery = Discovery(targets=[])
+    discovery.handle_reply(b"\xca\xfe", "127.0.0.1")
+    discovery.handle_reply(smartplug.encrypt_datagram({"system": {}}), "127.0.0.1")
+    assert discovery.plugs == {}
+    reply = {"system": {"get_sysinfo": {"mac": "CA:FE:CA:FE:CA:FE"}}}
+    discovery.handle_reply(smartplug.encrypt_datagram(reply), "127.0.0.1")
+    discovery.handle_reply(smartplug.encrypt_datagram(reply), "127.0.0.2")
+    assert discovery.plugs == {"CA:FE:CA:FE:CA:FE": "127.0.0.2"}
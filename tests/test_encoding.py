@@ -0,0 +1,47 @@
+from json import loads
+
+import pytest
+
+from toad_sp_data import encoding
+
+_payload = {
+    "data": [
+        {"bn": "w.r0.c0/power", "bu": "W", "t": 1584613140.6419, "v": 42.0},
+        {"bn": "w.r0.c0/status", "bu": "S", "t": 1584613140.6419, "v": 1},
+    ]
+}
+
+
+def test_encode_json():
+    assert loads(encoding.encode_json(_payload)) == _payload
+
+
+def test_cbor():
+    # examples from RFC 8949, appendix A
+    assert encoding.cbor_dumps(0) == b"\x00"
+    assert encoding.cbor_dumps(-1000) == b"\x39\x03\xe7"
+    assert encoding.cbor_dumps(1000000) == b"\x1a\x00\x0f\x42\x40"
+    assert encoding.cbor_dumps(1.1) == b"\xfb\x3f\xf1\x99\x99\x99\x99\x99\x9a"
+    assert encoding.cbor_dumps("IETF") == b"\x64IETF"
+    assert encoding.cbor_dumps([1, [2, 3]]) == b"\x82\x01\x82\x02\x03"
+    assert encoding.cbor_dumps({"a": 1}) == b"\xa1\x61a\x01"
+    item = {"a": [None, True, False, -24, 2 ** 40, 0.5, b"\x00", "ü"]}
+    assert encoding.cbor_loads(encoding.cbor_dumps(item)) == item
+    with pytest.raises(encoding.EncodingException):
+        encoding.cbor_dumps({1, 2})
+    with pytest.raises(encoding.EncodingException):
+        encoding.cbor_loads(b"\x82\x01")
+
+
+def test_senml_cbor():
+    encoded = encoding.encode_senml_cbor(_payload)
+    assert len(encoded) < len(encoding.encode_json(_payload)) * 0.6
+    record = encoding.cbor_loads(encoded)["data"][0]
+    assert record[encoding.SENML_CBOR_LABELS["bn"]] == "w.r0.c0/power"
+    assert encoding.decode_senml_cbor(encoded) == _payload
+
+
+def test_get_encoder():
+    assert encoding.get_encoder("cbor") is encoding.encode_senml_cbor
+    with pytest.raises(encoding.EncodingException):
+        encoding.get_encoder("xml")
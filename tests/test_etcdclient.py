@@ -64,3 +64,48 @@ def test_get_smartplug_ips(tmp_cache_client):
         assert k in tmp_cache_client.expected and ips.get(
             k
         ) == tmp_cache_client.expected.get(k)
+
+
+def test_get_client():
+    client = etcdclient.get_client(ETCD_HOST, ETCD_PORT)
+    assert etcdclient.get_client(ETCD_HOST, ETCD_PORT) is client
+
+
+@pytest.mark.asyncio
+async def test_get_smartplug_ids_async(tmp_client):
+    ids = await etcdclient.get_smartplug_ids_async(ETCD_HOST, ETCD_PORT, tmp_client.key)
+    assert ids == tmp_client.expected
+
+
+@pytest.mark.asyncio
+async def test_put_cached_ip_async(tmp_cache_client):
+    sp_id, sp_ip = "sp_w.r0.c0", "0.0.0.2"
+    await etcdclient.put_cached_ip_async(
+        ETCD_HOST, ETCD_PORT, tmp_cache_client.key, sp_id, sp_ip
+    )
+    ips = await etcdclient.get_cached_ips_async(
+        ETCD_HOST, ETCD_PORT, tmp_cache_client.key
+    )
+    assert ips.get(sp_id) == sp_ip
+
+
+def test_read_missing_children(monkeypatch):
+    class MissingKeyClient:
+        def read(self, key):
+            raise etcd.EtcdKeyNotFound("Key not found", {"errorCode": 100, "index": 41})
+
+    monkeypatch.setattr(etcdclient, "get_client", lambda *args: MissingKeyClient())
+    assert etcdclient.read_children(ETCD_HOST, ETCD_PORT, "/missing") == ({}, 42)
+
+
+def test_read_children_and_watch(tmp_client):
+    ids, index = etcdclient.read_children(ETCD_HOST, ETCD_PORT, tmp_client.key)
+    assert ids == tmp_client.expected
+    tmp_client.write(f"{tmp_client.key}/CA:FE:CA:FE:CA:FE", "sp_w.r2.c2")
+    result = etcdclient.watch(ETCD_HOST, ETCD_PORT, tmp_client.key, index, 1)
+    assert result.key.endswith("/CA:FE:CA:FE:CA:FE")
+    assert result.value == "sp_w.r2.c2"
+    with pytest.raises(etcd.EtcdWatchTimedOut):
+        etcdclient.watch(
+            ETCD_HOST, ETCD_PORT, tmp_client.key, result.modifiedIndex + 1, 0.1
+        )
@@ -6,7 +6,7 @@ from time import time
 
 from gmqtt import Client as MQTTClient
 from gmqtt.mqtt.constants import MQTTv311
-from tests import MQTT_BROKER_HOST, MQTT_BROKER_PORT
+from tests import MQTT_BROKER_HOST, MQTT_BROKER_PORT, mocks
 from toad_sp_data import gatherer  # , protocol
 
 _sample_senml = {
@@ -48,3 +48,121 @@ async def test_pub_to_mqtt():
     client.publish(topic, _sample_senml, qos=1)
     await client.disconnect()
     await listener.stop()
+
+
+@pytest.fixture
+def offline_config(monkeypatch):
+    for name in (
+        "SNAPSHOT_ENABLED",
+        "SPOOL_ENABLED",
+        "SAMPLER_ENABLED",
+        "ETCD_WATCH",
+        "METRICS_ENABLED",
+    ):
+        monkeypatch.setattr(gatherer.config, name, False)
+    monkeypatch.setattr(gatherer.config, "DISCOVERY_MODE", "tcp")
+    monkeypatch.setattr(gatherer.config, "GATHERER_ENGINE", "loop")
+
+
+@pytest.fixture
+def offline_gatherer(offline_config):
+    return gatherer.Gatherer(event_loop=asyncio.get_event_loop(), cached_ips={})
+
+
+@pytest.mark.asyncio
+async def test_undecodable_response_backs_off(offline_gatherer):
+    client = offline_gatherer
+    client.alive_ips.add("192.168.0.10")
+    await client.pipeline.put(gatherer.Reading("192.168.0.10", b'{"error": 1}', None))
+    await client.pipeline.stages[0].run_once()
+    # counted as a failed poll of the IP
+    assert client.pipeline.stages[0].failed == 1
+    assert "192.168.0.10" not in client.alive_ips
+    assert client.undecodable_ips == {"192.168.0.10"}
+    # an unknown address backs off from the long delay
+    assert client.backoff.delay("192.168.0.10") > client.backoff.fast_delay
+
+
+@pytest.mark.asyncio
+async def test_known_ips_first(offline_config, monkeypatch):
+    monkeypatch.setattr(gatherer.config, "GATHERER_RAMP_RATE", 2)
+    client = gatherer.Gatherer(
+        asyncio.get_event_loop(),
+        smartplug_ids={"CA:FE:CA:FE:CA:FE": "sp1"},
+        cached_ips={"sp1": "192.168.0.5"},
+        alive_ips=["192.168.0.7"],
+    )
+    # ETCD is not read in the background
+    client.warm = False
+    added = []
+    monkeypatch.setattr(client, "add_target", added.append)
+    monkeypatch.setattr(client, "disconnect", lambda: asyncio.sleep(0))
+    client.start([f"192.168.0.{i}" for i in range(1, 9)])
+    assert sorted(added) == ["192.168.0.5", "192.168.0.7"]
+    await asyncio.sleep(0.05)
+    # then the rest of the range, GATHERER_RAMP_RATE IPs per second
+    assert added[2:] == ["192.168.0.1", "192.168.0.2"]
+    await client.stop()
+
+
+def test_warm_start(offline_config, monkeypatch, tmp_path):
+    monkeypatch.setattr(gatherer.config, "SNAPSHOT_ENABLED", True)
+    monkeypatch.setattr(gatherer.config, "SNAPSHOT_DIRECTORY", str(tmp_path))
+    saved = gatherer.snapshot.Snapshot(
+        {"CA:FE:CA:FE:CA:FE": "sp1"}, {"sp1": "192.168.0.5"}, ["192.168.0.7"]
+    )
+    gatherer.snapshot.save(gatherer.snapshot_path("Gatherer"), saved)
+
+    def get_smartplug_ids(*args):
+        raise AssertionError("ETCD read on a warm start")
+
+    monkeypatch.setattr(gatherer.etcdclient, "get_smartplug_ids", get_smartplug_ids)
+    event_loop = asyncio.new_event_loop()
+    client = gatherer.create_gatherer(event_loop)
+    event_loop.close()
+    assert client.warm
+    assert client.take_snapshot() == saved
+
+
+@pytest.mark.asyncio
+async def test_garbage_response_backs_off(
+    offline_gatherer, unused_tcp_port, event_loop, monkeypatch
+):
+    sp_mock = mocks.SmartPlugMock(
+        "127.0.0.1", unused_tcp_port, event_loop, garbage=True
+    )
+    await sp_mock.start()
+    get_power = gatherer.smartplug.get_power
+    monkeypatch.setattr(
+        gatherer.smartplug,
+        "get_power",
+        lambda ip, pool, parse: get_power(ip, sp_mock.port, pool, parse),
+    )
+    client = offline_gatherer
+    failures = gatherer.metrics.POLLS.labels(gatherer.metrics.UNKNOWN_IP, "failure")
+    count = failures.value
+    try:
+        delay = await client.poll(sp_mock.addr)
+    finally:
+        await sp_mock.stop()
+    # nothing reaches the pipeline, the poll failed
+    assert failures.value == count + 1
+    assert client.pipeline.depths()["decode"] == 0
+    assert delay > client.backoff.fast_delay
+    assert sp_mock.addr not in client.alive_ips
+
+
+@pytest.mark.asyncio
+async def test_big_target_space_on_scheduler(offline_gatherer, monkeypatch):
+    monkeypatch.setattr(gatherer.config, "GATHERER_LOOP_MAX_TARGETS", 16)
+    monkeypatch.setattr(gatherer.config, "GATHERER_RAMP_RATE", 0)
+    client = offline_gatherer
+    client.warm = False
+    monkeypatch.setattr(client, "disconnect", lambda: asyncio.sleep(0))
+    ips = gatherer.TargetSpace.parse(["198.51.100.0/24"])
+    client.start(ips)
+    # polled from the scheduler, without a Loop per IP
+    assert client.scheduler is not None
+    assert len(client.scheduler) == len(ips) == 254
+    assert client.targets == {}
+    await client.stop()
@@ -0,0 +1,74 @@
+import asyncio
+import uuid
+
+import pytest
+
+from tests import ETCD_HOST, ETCD_PORT, ETCD_CACHE_KEY
+from toad_sp_data import etcdclient
+from toad_sp_data.ipcache import IPCache
+
+
+def test_set():
+    cache = IPCache(ETCD_HOST, ETCD_PORT, ETCD_CACHE_KEY, {"sp_w.r0.c0": "0.0.0.0"})
+    assert not cache.set("sp_w.r0.c0", "0.0.0.0")
+    assert cache.suppressed == 1 and cache.dirty == 0
+    assert cache.set("sp_w.r0.c0", "0.0.0.1")
+    assert cache.set("sp_w.r1.c1", "0.0.0.2")
+    assert cache.dirty == 2
+    assert cache.get("sp_w.r0.c0") == "0.0.0.1" and "sp_w.r1.c1" in cache
+    assert len(cache) == 2
+
+
+@pytest.mark.asyncio
+async def test_flush():
+    key = f"{ETCD_CACHE_KEY}/{uuid.uuid4()}"
+    cache = IPCache(ETCD_HOST, ETCD_PORT, key)
+    cache.set("sp_w.r0.c0", "0.0.0.0")
+    cache.set("sp_w.r1.c1", "0.0.0.1")
+    assert await cache.flush() == 2
+    assert cache.flushed == 2 and cache.dirty == 0
+    assert await cache.flush() == 0
+    ips = await etcdclient.get_cached_ips_async(ETCD_HOST, ETCD_PORT, key)
+    assert ips == dict(cache.items())
+    client = etcdclient.get_client(ETCD_HOST, ETCD_PORT)
+    client.delete(key, recursive=True)
+
+
+@pytest.mark.asyncio
+async def test_flush_failure(unused_tcp_port):
+    cache = IPCache("127.0.0.1", unused_tcp_port, ETCD_CACHE_KEY)
+    cache.set("sp_w.r0.c0", "0.0.0.0")
+    assert await cache.flush() == 0
+    assert cache.failed == 1 and cache.dirty == 1
+
+
+@pytest.mark.asyncio
+async def test_flush_cancelled(monkeypatch):
+    async def put_cached_ip_async(*args):
+        await asyncio.sleep(3600)
+
+    monkeypatch.setattr(etcdclient, "put_cached_ip_async", put_cached_ip_async)
+    cache = IPCache(ETCD_HOST, ETCD_PORT, ETCD_CACHE_KEY)
+    cache.set("sp_w.r0.c0", "0.0.0.0")
+    cache.set("sp_w.r1.c1", "0.0.0.1")
+    flush = asyncio.ensure_future(cache.flush())
+    await asyncio.sleep(0)
+    flush.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await flush
+    # the batch is written by the next flush
+    assert cache.dirty == 2
+
+
+def test_apply():
+    cache = IPCache(ETCD_HOST, ETCD_PORT, ETCD_CACHE_KEY, {"sp_w.r0.c0": "0.0.0.0"})
+    assert cache.apply("sp_w.r1.c1", "0.0.0.1")
+    assert not cache.apply("sp_w.r1.c1", "0.0.0.1")
+    assert cache.apply("sp_w.r0.c0", None) and "sp_w.r0.c0" not in cache
+    assert cache.dirty == 0
+    # local changes waiting to be flushed win over remote ones
+    cache.set("sp_w.r2.c2", "0.0.0.2")
+    assert not cache.apply("sp_w.r2.c2", "0.0.0.3")
+    cache.apply_all({"sp_w.r3.c3": "0.0.0.3"})
+    assert dict(cache.items()) == {"sp_w.r2.c2": "0.0.0.2", "sp_w.r3.c3": "0.0.0.3"}
+    assert cache.dirty == 1
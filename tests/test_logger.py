@@ -0,0 +1,61 @@
+import io
+import logging
+import queue
+from logging.handlers import QueueListener
+
+from toad_sp_data import logger
+
+
+def test_lazy_formatting(caplog, monkeypatch):
+    formatted = []
+
+    class Reading:
+        def __str__(self):
+            formatted.append(self)
+            return "42 W"
+
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    caplog.set_level(logging.INFO, logger.logger.name)
+    monkeypatch.setattr(logger.logger, "propagate", False)
+    monkeypatch.setattr(logger.logger, "handlers", [logger._LazyQueueHandler(records)])
+    logger.log_info("[SP]\tObtained %s", Reading())
+    # queued with its arguments, nothing formatted on the event loop
+    assert formatted == []
+    stream = io.StringIO()
+    listener = QueueListener(records, logging.StreamHandler(stream))
+    listener.start()
+    listener.stop()
+    assert len(formatted) == 1
+    assert stream.getvalue() == "[SP]\tObtained 42 W\n"
+
+
+def test_not_verbose(caplog):
+    class Explosive:
+        def __str__(self):
+            raise AssertionError("formatted while not verbose")
+
+    verbose = logger.verbose
+    logger.verbose = False
+    try:
+        with caplog.at_level(logging.INFO):
+            logger.log_info_verbose("[SP]\t%s", Explosive())
+    finally:
+        logger.verbose = verbose
+    assert caplog.records == []
+
+
+def test_rate_limit(caplog, monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(logger, "monotonic", lambda: now[0])
+    monkeypatch.setattr(logger, "rate_limit", 60)
+    with caplog.at_level(logging.INFO):
+        for _ in range(3):
+            logger.log_info_limited("10.0.0.1", "[SP]\tFailed %s", "10.0.0.1")
+        logger.log_info_limited("10.0.0.2", "[SP]\tFailed %s", "10.0.0.2")
+        now[0] = 61
+        logger.log_info_limited("10.0.0.1", "[SP]\tFailed %s", "10.0.0.1")
+    assert [r.getMessage() for r in caplog.records] == [
+        "[SP]\tFailed 10.0.0.1",
+        "[SP]\tFailed 10.0.0.2",
+        "[SP]\tFailed 10.0.0.1 (2 similar suppressed)",
+    ]
@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+
+from toad_sp_data import metrics
+
+
+def test_counter_render():
+    registry = metrics.Registry()
+    polls = registry.register(
+        metrics.Counter("polls", "Polls by result", labels=("result",))
+    )
+    polls.labels("success").inc()
+    polls.labels("success").inc(2)
+    polls.labels('fail"ure').inc()
+    assert registry.render() == (
+        "# HELP polls Polls by result\n"
+        "# TYPE polls counter\n"
+        'polls_total{result="success"} 3.0\n'
+        'polls_total{result="fail\\"ure"} 1.0\n'
+    )
+    with pytest.raises(ValueError):
+        polls.labels("success", "extra")
+
+
+def test_gauge_function():
+    gauge = metrics.Gauge("pending", "Pending records")
+    gauge.set(3)
+    assert gauge.render()[-1] == "pending 3"
+    gauge.set_function(lambda: 7)
+    assert gauge.render()[-1] == "pending 7"
+
+
+def test_counter_function():
+    dropped = metrics.Counter("dropped", "Dropped items", labels=("stage",))
+    dropped.labels("decode").set_function(lambda: 4)
+    assert dropped.render() == [
+        "# HELP dropped Dropped items",
+        "# TYPE dropped counter",
+        'dropped_total{stage="decode"} 4',
+    ]
+
+
+def test_histogram_buckets():
+    histogram = metrics.Histogram("latency", "Latency", buckets=(0.1, 1))
+    for value in (0.05, 0.1, 0.5, 2):
+        histogram.observe(value)
+    assert histogram.render()[2:] == [
+        'latency_bucket{le="0.1"} 2',
+        'latency_bucket{le="1"} 3',
+        'latency_bucket{le="+Inf"} 4',
+        "latency_sum 2.65",
+        "latency_count 4",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_measure_loop_lag():
+    count = metrics.EVENT_LOOP_LAG_SECONDS.labels().count
+    await metrics.measure_loop_lag(0.01)
+    assert metrics.EVENT_LOOP_LAG_SECONDS.labels().count == count + 1
+
+
+async def _get(port: int, path: str) -> bytes:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+    response = await reader.read()
+    writer.close()
+    return response
+
+
+@pytest.mark.asyncio
+async def test_server():
+    metrics.POLLS.labels("10.0.0.1", "success").inc()
+    metrics.POLLS.labels(metrics.UNKNOWN_IP, "failure").inc()
+    server = await metrics.start_server("127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    try:
+        response = await _get(port, "/metrics")
+        assert response.startswith(b"HTTP/1.1 200 OK\r\n")
+        assert b'toad_sp_polls_total{ip="10.0.0.1",result="success"}' in response
+        assert b'toad_sp_polls_total{ip="unknown",result="failure"}' in response
+        assert b"# TYPE toad_sp_poll_stage_seconds histogram" in response
+        response = await _get(port, "/other")
+        assert response.startswith(b"HTTP/1.1 404 Not Found\r\n")
+    finally:
+        server.close()
+        await server.wait_closed()
@@ -0,0 +1,94 @@
+import asyncio
+
+import pytest
+
+from toad_sp_data import loop
+from toad_sp_data.pipeline import BoundedQueue, Pipeline, PipelineException
+
+
+def test_bounded_queue_policies():
+    with pytest.raises(PipelineException):
+        BoundedQueue(1, "spill")
+    with pytest.raises(PipelineException):
+        BoundedQueue(0)
+    oldest = BoundedQueue(2, "drop-oldest")
+    newest = BoundedQueue(2, "drop-newest")
+    for item in range(4):
+        oldest.offer(item)
+        newest.offer(item)
+    assert [oldest.get_nowait(), oldest.get_nowait()] == [2, 3]
+    assert [newest.get_nowait(), newest.get_nowait()] == [0, 1]
+    assert oldest.dropped == newest.dropped == 2
+
+
+@pytest.mark.asyncio
+async def test_block_policy_waits():
+    queue = BoundedQueue(1, "block")
+    await queue.put(0)
+    put = asyncio.ensure_future(queue.put(1))
+    await asyncio.sleep(0.01)
+    assert not put.done() and queue.dropped == 0
+    assert queue.get_nowait() == 0
+    await asyncio.wait_for(put, 1)
+    assert queue.get_nowait() == 1
+
+
+@pytest.mark.asyncio
+async def test_stages_chain_and_drain():
+    results = []
+
+    async def double(item):
+        await asyncio.sleep(0)
+        return item * 2
+
+    def fail_odd(item):
+        if item % 4:
+            raise ValueError(item)
+        return item
+
+    pipeline = Pipeline()
+    pipeline.add_stage("double", double, 2)
+    pipeline.add_stage("check", fail_odd, 2)
+    pipeline.add_stage("collect", results.append, 2)
+    loops = [loop.Loop(async_func=s.run_once, arguments=()) for s in pipeline.stages]
+    event_loop = asyncio.get_event_loop()
+    for stage_loop in loops:
+        stage_loop.start(event_loop)
+    for item in range(6):
+        await pipeline.put(item)
+    assert await pipeline.drain(1)
+    for stage_loop in loops:
+        await stage_loop.stop()
+    assert results == [0, 4, 8]
+    assert [s.processed for s in pipeline.stages] == [6, 3, 3]
+    assert pipeline.stages[1].failed == 3
+    assert pipeline.depths() == {"double": 0, "check": 0, "collect": 0}
+    assert pipeline.dropped() == {"double": 0, "check": 0, "collect": 0}
+
+
+@pytest.mark.asyncio
+async def test_drain_times_out():
+    pipeline = Pipeline()
+    pipeline.add_stage("stuck", lambda item: item, 2, "drop-newest")
+    for item in range(3):
+        await pipeline.put(item)
+    assert pipeline.depths() == {"stuck": 2}
+    assert pipeline.dropped() == {"stuck": 1}
+    assert not await pipeline.drain(0.05)
+
+
+@pytest.mark.asyncio
+async def test_on_error():
+    errors = []
+
+    def fail(item):
+        raise ValueError(item)
+
+    pipeline = Pipeline()
+    stage = pipeline.add_stage(
+        "fail", fail, 2, on_error=lambda item, err: errors.append((item, err))
+    )
+    await pipeline.put(1)
+    await stage.run_once()
+    assert stage.failed == 1
+    assert [(item, type(err)) for item, err in errors] == [(1, ValueError)]
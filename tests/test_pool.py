@@ -0,0 +1,65 @@
+import pytest
+
+from tests import mocks
+from toad_sp_data import smartplug
+from toad_sp_data.pool import ConnectionPool
+
+
+@pytest.fixture
+async def keep_alive_mock(unused_tcp_port, event_loop) -> mocks.SmartPlugMock:
+    sp_mock = mocks.SmartPlugMock("127.0.0.1", unused_tcp_port, event_loop, True)
+    await sp_mock.start()
+    yield sp_mock
+    await sp_mock.stop()
+
+
+@pytest.fixture
+async def closing_mock(unused_tcp_port, event_loop) -> mocks.SmartPlugMock:
+    sp_mock = mocks.SmartPlugMock("127.0.0.1", unused_tcp_port, event_loop)
+    await sp_mock.start()
+    yield sp_mock
+    await sp_mock.stop()
+
+
+@pytest.mark.asyncio
+async def test_pool_keep_alive(keep_alive_mock):
+    pool = ConnectionPool(idle_timeout=60)
+    for _ in range(3):
+        ok, response = await smartplug.get_power(
+            keep_alive_mock.addr, keep_alive_mock.port, pool=pool
+        )
+        assert ok and response == mocks.SmartPlugMock.ok_response
+    assert pool.stats.misses == 1 and pool.stats.hits == 2
+    assert len(pool) == 1
+    # the server drops the connection: the command is retried on a new one
+    ok, _ = await smartplug.send_command(
+        {"_": "_"}, keep_alive_mock.addr, keep_alive_mock.port, pool=pool
+    )
+    assert not ok and pool.stats.reconnects == 1
+    pool.close()
+    assert len(pool) == 0
+
+
+@pytest.mark.asyncio
+async def test_pool_idle_eviction(keep_alive_mock):
+    pool = ConnectionPool(idle_timeout=0)
+    ok, _ = await smartplug.get_power(
+        keep_alive_mock.addr, keep_alive_mock.port, pool=pool
+    )
+    assert ok and len(pool) == 1
+    assert pool.evict_idle() == 1
+    assert pool.stats.idle_evictions == 1 and len(pool) == 0
+
+
+@pytest.mark.asyncio
+async def test_pool_no_keep_alive(closing_mock):
+    pool = ConnectionPool(idle_timeout=60)
+    for _ in range(3):
+        ok, response = await smartplug.get_power(
+            closing_mock.addr, closing_mock.port, pool=pool
+        )
+        assert ok and response == mocks.SmartPlugMock.ok_response
+    # after the first close the pool connects once per request
+    assert pool.stats.hits == 0 and pool.stats.misses == 3
+    assert pool.stats.server_closes == 1
+    assert len(pool) == 0
@@ -0,0 +1,52 @@
+from toad_sp_data.registry import Registry
+
+
+def test_indexes():
+    registry = Registry()
+    assert registry.set_mac("CA:FE", "sp_w.r0.c0")
+    assert not registry.set_mac("CA:FE", "sp_w.r0.c0")
+    assert registry.set_ip("sp_w.r0.c0", "10.0.0.1")
+    assert not registry.set_ip("sp_w.r0.c0", "10.0.0.1")
+    record = registry.get("sp_w.r0.c0")
+    assert registry.by_mac("CA:FE") is record and registry.by_ip("10.0.0.1") is record
+    assert registry.ids() == {"CA:FE": "sp_w.r0.c0"}
+    assert registry.ips() == {"sp_w.r0.c0": "10.0.0.1"}
+    # moving the plug updates the IP index
+    assert registry.set_ip("sp_w.r0.c0", "10.0.0.2")
+    assert registry.by_ip("10.0.0.1") is None and registry.by_ip("10.0.0.2") is record
+
+
+def test_reassign_mac():
+    registry = Registry()
+    registry.set_mac("CA:FE", "sp_w.r0.c0")
+    registry.set_ip("sp_w.r0.c0", "10.0.0.1")
+    assert registry.set_mac("CA:FE", "sp_w.r1.c1")
+    assert registry.by_mac("CA:FE").sp_id == "sp_w.r1.c1"
+    # the old ID keeps its cached IP
+    assert registry.get("sp_w.r0.c0").mac is None
+    assert registry.by_ip("10.0.0.1").sp_id == "sp_w.r0.c0"
+    # a new MAC for an ID replaces its previous one
+    assert registry.set_mac("FE:CA", "sp_w.r1.c1")
+    assert registry.by_mac("CA:FE") is None
+
+
+def test_prune():
+    registry = Registry()
+    registry.set_mac("CA:FE", "sp_w.r0.c0")
+    registry.set_ip("sp_w.r0.c0", "10.0.0.1")
+    assert registry.set_mac("CA:FE", None)
+    assert not registry.set_mac("CA:FE", None)
+    assert "sp_w.r0.c0" in registry
+    assert registry.set_ip("sp_w.r0.c0", None)
+    assert "sp_w.r0.c0" not in registry and len(registry) == 0
+    assert registry.by_ip("10.0.0.1") is None
+
+
+def test_shared_ip():
+    registry = Registry()
+    registry.set_ip("sp_w.r0.c0", "10.0.0.1")
+    registry.set_ip("sp_w.r1.c1", "10.0.0.1")
+    assert registry.by_ip("10.0.0.1").sp_id == "sp_w.r1.c1"
+    # forgetting the stale claim keeps the index of the latest one
+    registry.set_ip("sp_w.r0.c0", None)
+    assert registry.by_ip("10.0.0.1").sp_id == "sp_w.r1.c1"
@@ -0,0 +1,52 @@
+import pytest
+
+from toad_sp_data.sampler import Sampler
+
+
+def test_steady_and_variable_plugs():
+    sampler = Sampler(min_interval=5, max_interval=60, budget=0)
+    # plugs without readings are polled fast
+    assert sampler.interval("steady") == 5
+    for _ in range(20):
+        sampler.update("steady", 100.0)
+    assert sampler.interval("steady") == 60
+    for power in [0.0, 1000.0] * 10:
+        sampler.update("fridge", power)
+    assert sampler.interval("fridge") == 5
+    assert len(sampler) == 2
+    assert sampler.planned_rate() == pytest.approx(1 / 60 + 1 / 5)
+
+
+def test_reacts_to_a_change():
+    sampler = Sampler(min_interval=5, max_interval=60, budget=0, scale=5)
+    for _ in range(20):
+        sampler.update("plug", 20.0)
+    sampler.update("plug", 120.0)
+    # a single jump is enough to poll faster
+    assert sampler.interval("plug") < 10
+    for _ in range(20):
+        sampler.update("plug", 120.0)
+    intervals = []
+    for _ in range(20):
+        sampler.update("plug", 120.0)
+        intervals.append(sampler.interval("plug"))
+    # and the plug slows down once steady
+    assert intervals == sorted(intervals)
+    assert intervals[-1] > 30
+
+
+def test_budget():
+    sampler = Sampler(min_interval=5, max_interval=60, budget=1)
+    for plug in range(10):
+        for power in [0.0, 1000.0] * 10:
+            sampler.update(plug, power)
+    # 10 plugs at 5 s would be 2 polls/s
+    assert sampler.stretch() == pytest.approx(2)
+    assert sampler.interval(0) == pytest.approx(10)
+    assert sampler.planned_rate() == pytest.approx(1)
+    # but never beyond the maximum interval
+    sampler.budget = 0.01
+    assert sampler.interval(0) == 60
+    for plug in range(10):
+        sampler.forget(plug)
+    assert len(sampler) == 0 and sampler.stretch() == 1
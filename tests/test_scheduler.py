@@ -0,0 +1,40 @@
+import asyncio
+
+import pytest
+
+from toad_sp_data.scheduler import Scheduler
+
+
+@pytest.mark.asyncio
+async def test_scheduler():
+    polls = {}
+    in_flight = []
+
+    async def poll(target):
+        polls[target] = polls.get(target, 0) + 1
+        in_flight.append(scheduler.in_flight)
+        await asyncio.sleep(0.01)
+        if target == "broken":
+            raise ValueError(target)
+        return 0.05
+
+    scheduler = Scheduler(poll, workers=4, retry_delay=10)
+    for i in range(20):
+        scheduler.add(f"10.0.0.{i}")
+    scheduler.add("broken")
+    scheduler.add("10.0.0.0")
+    assert len(scheduler) == 21
+    task = asyncio.ensure_future(scheduler.run())
+    await asyncio.sleep(0.2)
+    scheduler.remove("10.0.0.0")
+    removed_polls = polls["10.0.0.0"]
+    await asyncio.sleep(0.2)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    assert max(in_flight) <= 4
+    assert all(polls[f"10.0.0.{i}"] > 1 for i in range(1, 20))
+    # the removed target is not polled again
+    assert polls["10.0.0.0"] <= removed_polls + 1
+    # the failed target waits for the retry delay
+    assert polls["broken"] == 1
+    assert scheduler.in_flight == 0
@@ -1,9 +1,10 @@
+import asyncio
 from json import dumps, loads, JSONDecodeError
 
 import pytest
 
 from tests import mocks
-from toad_sp_data import smartplug
+from toad_sp_data import config, smartplug
 
 # test payload both with and without encryption
 _command = {"emeter": {"get_realtime": {}}, "system": {"get_sysinfo": {}}}
@@ -62,6 +63,28 @@ def test_decrypt():
         pass
 
 
+def test_decryptor():
+    decryptor = smartplug.Decryptor()
+    body = _encrypted[4:]
+    decrypted = b""
+    while body:
+        decrypted += decryptor.feed(body[:5])
+        body = body[5:]
+    assert decrypted == _decrypted
+    assert decryptor.feed(b"") == b""
+
+
+def test_codec_large_payload(monkeypatch):
+    payload = bytes(range(256)) * 32
+    encrypted = smartplug.encrypt(payload)
+    assert len(encrypted) == len(payload) + 4
+    assert smartplug.decrypt(encrypted) == payload
+    # the NumPy and pure Python paths must produce the same bytes
+    monkeypatch.setattr(smartplug, "np", None)
+    assert smartplug.encrypt(payload) == encrypted
+    assert smartplug.decrypt(encrypted) == payload
+
+
 def test_decrypt_command():
     cmd = smartplug.decrypt_command(_encrypted)
     assert cmd == _command
@@ -99,6 +122,49 @@ async def test_send_command(smartplug_mock):
     assert not ok and type(response) is dict and response == {}
 
 
+@pytest.mark.asyncio
+async def test_read_frame():
+    # response split across several segments
+    reader = asyncio.StreamReader()
+    for i in range(0, len(_encrypted), 10):
+        reader.feed_data(_encrypted[i:][:10])
+    assert await smartplug.read_frame(reader, 1) == _decrypted
+    # truncated response
+    reader = asyncio.StreamReader()
+    reader.feed_data(_encrypted[:-1])
+    reader.feed_eof()
+    with pytest.raises(asyncio.IncompleteReadError):
+        await smartplug.read_frame(reader, 1)
+    # header announcing a huge response
+    reader = asyncio.StreamReader()
+    reader.feed_data(b"\xff\xff\xff\xff")
+    with pytest.raises(smartplug.DecryptionException):
+        await smartplug.read_frame(reader, 1)
+    # peer that never finishes the response
+    reader = asyncio.StreamReader()
+    reader.feed_data(_encrypted[:8])
+    with pytest.raises(asyncio.TimeoutError):
+        await smartplug.read_frame(reader, 0.1)
+
+
+@pytest.mark.asyncio
+async def test_send_command_timeout(unused_tcp_port):
+    async def silent(reader, writer):
+        await reader.read(2048)
+
+    server = await asyncio.start_server(silent, "127.0.0.1", unused_tcp_port)
+    ok, err = await smartplug.send_command(
+        _command, "127.0.0.1", unused_tcp_port, read_timeout=0.1, total_timeout=1
+    )
+    assert not ok and isinstance(err, asyncio.TimeoutError)
+    ok, err = await smartplug.send_command(
+        _command, "127.0.0.1", unused_tcp_port, read_timeout=1, total_timeout=0.1
+    )
+    assert not ok and isinstance(err, asyncio.TimeoutError)
+    server.close()
+    await server.wait_closed()
+
+
 @pytest.mark.asyncio
 async def test_get_power(smartplug_mock):
     ok, response = await smartplug.get_power(smartplug_mock.addr, smartplug_mock.port)
@@ -107,6 +173,32 @@ async def test_get_power(smartplug_mock):
     assert not ok
 
 
+@pytest.mark.asyncio
+async def test_get_realtime(smartplug_mock):
+    ok, response = await smartplug.get_realtime(
+        smartplug_mock.addr, smartplug_mock.port
+    )
+    assert ok and response == {"emeter": mocks.SmartPlugMock.ok_response["emeter"]}
+    assert smartplug.extract_power(response) == 42
+
+
+@pytest.mark.asyncio
+async def test_parse_info(smartplug_mock, monkeypatch):
+    ok, data = await smartplug.get_power(
+        smartplug_mock.addr, smartplug_mock.port, parse=False
+    )
+    assert ok and loads(data) == mocks.SmartPlugMock.ok_response
+    expected = {"mac": "CA:FE:CA:FE:CA:FE", "power": 42, "relay_state": 1}
+    assert smartplug.parse_info(data) == expected
+    assert smartplug.parse_power(data) == 42
+    # unexpected shapes are parsed whole
+    duplicated = data.replace(b'"power"', b'"power": 1, "power"')
+    for extractor in ("targeted", "full"):
+        monkeypatch.setattr(config, "SP_EXTRACTOR", extractor)
+        assert smartplug.parse_info(data) == expected
+        assert smartplug.parse_info(duplicated) == expected
+
+
 @pytest.mark.asyncio
 async def test_extract_info(smartplug_mock):
     expected = {"mac": "CA:FE:CA:FE:CA:FE", "power": 42, "relay_state": 1}
@@ -119,3 +211,16 @@ async def test_extract_info(smartplug_mock):
     )
     expected["power"] = float(expected["power"])
     assert info == expected
+
+
+@pytest.mark.asyncio
+async def test_garbage_response(unused_tcp_port, event_loop):
+    sp_mock = mocks.SmartPlugMock(
+        "127.0.0.1", unused_tcp_port, event_loop, garbage=True
+    )
+    await sp_mock.start()
+    try:
+        ok, _ = await smartplug.get_power(sp_mock.addr, sp_mock.port, parse=False)
+        assert not ok
+    finally:
+        await sp_mock.stop()
@@ -0,0 +1,22 @@
+from toad_sp_data import snapshot
+
+
+def test_save_and_load(tmp_path):
+    path = str(tmp_path / "snapshot" / "Gatherer.json")
+    assert snapshot.load(path) is None
+    saved = snapshot.Snapshot(
+        {"CA:FE:CA:FE:CA:FE": "sp1"}, {"sp1": "10.0.0.1"}, ["10.0.0.1", "10.0.0.9"]
+    )
+    snapshot.save(path, saved)
+    assert snapshot.load(path) == saved
+    # a newer snapshot replaces the previous one
+    snapshot.save(path, snapshot.Snapshot({}, {}, []))
+    assert snapshot.load(path) == snapshot.Snapshot({}, {}, [])
+
+
+def test_load_corrupt(tmp_path):
+    path = tmp_path / "Gatherer.json"
+    path.write_text('{"ids": {}')
+    assert snapshot.load(str(path)) is None
+    path.write_text('{"ids": {}, "ips": {}}')
+    assert snapshot.load(str(path)) is None
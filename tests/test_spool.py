@@ -0,0 +1,68 @@
+import os
+
+import pytest
+
+from toad_sp_data.spool import Spool, SpoolException
+
+
+def drain(spool):
+    messages = []
+    while len(spool):
+        batch = spool.peek(3)
+        messages.extend(batch)
+        spool.consume(len(batch))
+    return messages
+
+
+def test_append_and_replay(tmp_path):
+    spool = Spool(str(tmp_path), segment_size=64, max_size=1024)
+    for i in range(10):
+        assert spool.append("data/sp", f"reading {i}".encode())
+    assert len(spool) == 10 and len(os.listdir(tmp_path)) > 1
+    replayed = [payload for _, payload in drain(spool)]
+    assert replayed == [f"reading {i}".encode() for i in range(10)]
+    assert spool.size == 0 and spool.peek(3) == []
+    with pytest.raises(SpoolException):
+        spool.consume(1)
+
+
+def test_reopen(tmp_path):
+    spool = Spool(str(tmp_path), segment_size=64)
+    for i in range(5):
+        spool.append("data/sp", bytes([i]))
+    spool.consume(len(spool.peek(2)))
+    # peeked but not consumed messages are read again
+    spool.peek(2)
+    spool.close()
+    spool = Spool(str(tmp_path), segment_size=64)
+    assert len(spool) == 3
+    assert drain(spool) == [("data/sp", bytes([i])) for i in range(2, 5)]
+
+
+def test_truncate_partial_write(tmp_path):
+    spool = Spool(str(tmp_path))
+    spool.append("data/sp", b"complete")
+    spool.close()
+    (segment,) = [n for n in os.listdir(tmp_path) if n.endswith(".seg")]
+    with open(tmp_path / segment, "ab") as file:
+        file.write(b"\x00\x01\x02")
+    spool = Spool(str(tmp_path))
+    assert spool.peek(10) == [("data/sp", b"complete")]
+    spool.append("data/sp", b"next")
+    assert drain(spool) == [("data/sp", b"complete"), ("data/sp", b"next")]
+
+
+def test_evict(tmp_path):
+    spool = Spool(str(tmp_path / "oldest"), segment_size=64, max_size=128)
+    for i in range(20):
+        assert spool.append("t", bytes([i]) * 10)
+    assert spool.size <= 128 and spool.dropped == 20 - len(spool)
+    assert drain(spool)[-1] == ("t", bytes([19]) * 10)
+    spool = Spool(
+        str(tmp_path / "newest"), segment_size=64, max_size=128, evict="newest"
+    )
+    results = [spool.append("t", bytes([i]) * 10) for i in range(20)]
+    assert not results[-1] and spool.dropped == results.count(False)
+    assert spool.peek(1) == [("t", bytes([0]) * 10)]
+    with pytest.raises(SpoolException):
+        Spool(str(tmp_path), evict="random")
@@ -0,0 +1,53 @@
+import time
+
+from toad_sp_data import utils
+from toad_sp_data.supervisor import Supervisor
+from toad_sp_data.targets import TargetSpace
+
+_IPS = [f"10.0.0.{i}" for i in range(10)]
+
+
+def sleep_forever(ips, worker):
+    time.sleep(60)
+
+
+def crash(ips, worker):
+    raise SystemExit(1)
+
+
+def test_shard():
+    shards = utils.shard(_IPS, 3)
+    assert [len(s) for s in shards] == [4, 3, 3]
+    assert sorted(ip for s in shards for ip in s) == sorted(_IPS)
+
+
+def test_shard_target_space():
+    supervisor = Supervisor(sleep_forever, TargetSpace.from_ips(_IPS), workers=3)
+    shards = supervisor.shards()
+    assert [list(shards[i]) for i in range(3)] == [_IPS[:4], _IPS[4:7], _IPS[7:]]
+
+
+def test_supervisor_restart():
+    supervisor = Supervisor(sleep_forever, _IPS, workers=2)
+    supervisor._start_all()
+    assert sorted(supervisor._processes) == [0, 1]
+    supervisor._processes[1].terminate()
+    supervisor._processes[1].join()
+    supervisor.check()
+    assert supervisor._processes[1].is_alive()
+    assert len(supervisor._restarts[1]) == 1
+    supervisor.stop()
+    assert supervisor._processes == {}
+
+
+def test_supervisor_drop_and_rebalance():
+    supervisor = Supervisor(crash, _IPS, workers=2, max_restarts=1)
+    supervisor._start_all()
+    for _ in range(3):
+        for process in supervisor._processes.values():
+            process.join()
+        supervisor.check()
+    # one slot is dropped, the other gets every IP
+    assert len(supervisor.active) == 1
+    assert list(supervisor.shards().values()) == [_IPS]
+    supervisor.stop()
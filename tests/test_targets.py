@@ -0,0 +1,43 @@
+import pickle
+
+import pytest
+
+from toad_sp_data import utils
+from toad_sp_data.targets import TargetSpace, TargetSpaceException
+
+
+def test_ip_range_includes_end():
+    assert utils.ip_range("10.0.0.254", "10.0.1.1") == [
+        "10.0.0.254",
+        "10.0.0.255",
+        "10.0.1.0",
+        "10.0.1.1",
+    ]
+
+
+def test_parse():
+    space = TargetSpace.parse(
+        ["10.0.0.0/30", "10.0.1.5-10.0.1.9", "10.0.0.3", "10.0.1.8-10.0.1.10"],
+        ["10.0.1.7", "10.0.1.10-10.0.1.20"],
+    )
+    expected = ["10.0.0.1", "10.0.0.2", "10.0.0.3", "10.0.1.5", "10.0.1.6"]
+    expected += ["10.0.1.8", "10.0.1.9"]
+    assert list(space) == expected and len(space) == len(expected)
+    for ip in expected:
+        assert ip in space
+    for ip in ("10.0.0.0", "10.0.0.4", "10.0.1.7", "10.0.1.10", "host", None):
+        assert ip not in space
+    assert len(TargetSpace.parse(["10.0.0.0/16"], ["10.0.0.0/24"])) == 65534 - 254
+    assert TargetSpace.parse(["10.0.0.7/32"]) == TargetSpace.from_ips(["10.0.0.7"])
+    for spec in ("10.0.0.9-10.0.0.1", "10.0.0.300", "10.0.0.0/33"):
+        with pytest.raises(TargetSpaceException):
+            TargetSpace.parse([spec])
+
+
+def test_shards():
+    space = TargetSpace.parse(["10.0.0.1-10.0.0.5", "10.0.2.0/29"])
+    shards = space.shards(3)
+    assert [len(s) for s in shards] == [4, 4, 3]
+    assert [ip for s in shards for ip in s] == list(space)
+    assert pickle.loads(pickle.dumps(shards[1])) == shards[1]
+    assert [len(s) for s in TargetSpace.from_ips(["10.0.0.1"]).shards(2)] == [1, 0]
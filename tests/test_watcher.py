@@ -0,0 +1,85 @@
+import asyncio
+
+import etcd
+import pytest
+
+from toad_sp_data import etcdclient
+from toad_sp_data.watcher import KeyWatcher
+
+
+def _result(action, key, value=None, index=10, directory=False):
+    node = {"key": key, "modifiedIndex": index, "createdIndex": index}
+    if directory:
+        node["dir"] = True
+    else:
+        node["value"] = value
+    return etcd.EtcdResult(action=action, node=node)
+
+
+@pytest.mark.asyncio
+async def test_handle():
+    changes, resets = [], []
+    watcher = KeyWatcher(
+        "127.0.0.1",
+        9,
+        "/smartplugs/mac_to_id/",
+        on_change=lambda *args: changes.append(args),
+        on_reset=resets.append,
+    )
+    watcher._event_loop = asyncio.get_event_loop()
+    watcher.handle(_result("set", "/smartplugs/mac_to_id/CA:FE", "sp_0", 10))
+    watcher.handle(_result("delete", "/smartplugs/mac_to_id/FE:CA", index=11))
+    # grandchildren and directories are not mirrored
+    watcher.handle(_result("set", "/smartplugs/mac_to_id/a/b", "x", 12))
+    watcher.handle(
+        _result("set", "/smartplugs/mac_to_id/dir", index=13, directory=True)
+    )
+    watcher.handle(_result("delete", "/smartplugs/mac_to_id", index=14))
+    assert watcher.index == 15
+    await asyncio.sleep(0)
+    assert changes == [("CA:FE", "sp_0"), ("FE:CA", None)]
+    assert resets == [{}]
+
+
+@pytest.mark.asyncio
+async def test_retry_on_failure():
+    watcher = KeyWatcher(
+        "127.0.0.1",
+        9,
+        "/smartplugs/mac_to_id",
+        on_change=lambda *args: None,
+        on_reset=lambda ids: None,
+        retry_delay=0.01,
+    )
+    watcher.start(asyncio.get_event_loop())
+    await asyncio.sleep(0.1)
+    assert watcher._thread.is_alive() and watcher.index is None
+    watcher.stop()
+    await asyncio.sleep(0.1)
+    assert not watcher._thread.is_alive()
+
+
+@pytest.mark.asyncio
+async def test_missing_key(monkeypatch):
+    reads = []
+
+    def read_children(*args):
+        reads.append(args)
+        return {}, None
+
+    monkeypatch.setattr(etcdclient, "read_children", read_children)
+    resets = []
+    watcher = KeyWatcher(
+        "127.0.0.1",
+        9,
+        "/smartplugs/mac_to_id",
+        on_change=lambda *args: None,
+        on_reset=resets.append,
+        retry_delay=0.05,
+    )
+    watcher.start(asyncio.get_event_loop())
+    await asyncio.sleep(0.2)
+    watcher.stop()
+    # read again every retry_delay, not in a tight loop
+    assert 1 <= len(reads) <= 5
+    assert resets == [{}] * len(resets) and len(resets) <= len(reads)
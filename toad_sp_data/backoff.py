@@ -0,0 +1,127 @@
+"""Per-address exponential backoff for addresses that do not answer."""
+import random
+from typing import Dict
+
+
+class BackoffState:
+    """Backoff state of an address that failed its last poll."""
+
+    __slots__ = ("failures", "step", "delay")
+
+    def __init__(self):
+        self.failures = 0
+        # delay without jitter, stops growing at the ceiling
+        self.step = 0.0
+        self.delay = 0.0
+
+
+class Backoff:
+    """Computes the delay before polling an address again.
+
+    Known plugs that miss a poll are retried at the fast delay a few times
+    before backing off, unknown addresses back off from the first failure.
+    Delays grow exponentially up to a ceiling, are jittered around it and
+    are reset as soon as the address answers.
+    """
+
+    def __init__(
+        self,
+        fast_delay: float,
+        base_delay: float,
+        ceiling: float,
+        factor: float = 2,
+        jitter: float = 0.1,
+        fast_retries: int = 3,
+    ):
+        """
+        Constructor for Backoff.
+
+        :param fast_delay: seconds between polls of live and missing plugs
+        :param base_delay: seconds after the first failure of unknown addresses
+        :param ceiling: maximum seconds between polls
+        :param factor: growth of the delay after each failure
+        :param jitter: maximum fraction of the delay added or subtracted
+        :param fast_retries: failures of known plugs retried at fast_delay
+        """
+        self.fast_delay = fast_delay
+        self.base_delay = base_delay
+        self.ceiling = ceiling
+        self.factor = factor
+        self.jitter = jitter
+        self.fast_retries = fast_retries
+        self._states: Dict[str, BackoffState] = {}
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+    def success(self, ip: str) -> float:
+        """
+        Reset the backoff of an address that answered.
+
+        :param ip: polled address
+        :return: seconds to wait before polling it again
+        """
+        self._states.pop(ip, None)
+        return self.fast_delay
+
+    def delay(self, ip: str) -> float:
+        """
+        Get the delay of an address without registering a poll.
+
+        :param ip: polled address
+        :return: seconds set by its last failure, fast_delay if it has none
+        """
+        state = self._states.get(ip)
+        return self.fast_delay if state is None else state.delay
+
+    def failure(self, ip: str, known: bool) -> float:
+        """
+        Register a failed poll.
+
+        :param ip: polled address
+        :param known: whether a plug was last seen at the address
+        :return: seconds to wait before polling it again
+        """
+        state = self._states.get(ip)
+        if state is None:
+            state = self._states[ip] = BackoffState()
+        state.failures += 1
+        if known and state.failures <= self.fast_retries:
+            state.delay = self.fast_delay
+            return state.delay
+        if state.step:
+            step = state.step * self.factor
+        elif known:
+            step = self.fast_delay * self.factor
+        else:
+            step = self.base_delay
+        state.step = min(step, self.ceiling)
+        state.delay = state.step * (1 + random.uniform(-self.jitter, self.jitter))
+        return state.delay
+
+    def distribution(self) -> Dict[str, int]:
+        """
+        Count backing-off addresses by current delay, in power of two buckets.
+
+        :return: dict with bucket upper bounds in seconds as keys
+        """
+        buckets: Dict[float, int] = {}
+        for state in self._states.values():
+            bound = 1.0
+            while bound < state.delay:
+                bound *= 2
+            buckets[bound] = buckets.get(bound, 0) + 1
+        return {f"<={int(bound)}s": buckets[bound] for bound in sorted(buckets)}
+
+    def saved_probe_rate(self) -> float:
+        """
+        Estimate the polls per second saved compared to polling every
+        backing-off address at the base delay.
+
+        :return: polls per second
+        """
+        return sum(
+            1 / self.base_delay - 1 / state.delay
+            for state in self._states.values()
+            if state.delay > self.base_delay
+        )
@@ -0,0 +1,59 @@
+"""Batching of SenML records before they are published to MQTT."""
+import asyncio
+from typing import Callable, List
+
+
+class SenMLBatcher:
+    """Collects the SenML records of every plug and publishes them together
+    as a single SenML pack when the time window expires or enough records
+    have been collected."""
+
+    def __init__(
+        self, publish: Callable[[List[dict]], None], max_records: int, window: float
+    ):
+        """
+        Constructor for SenMLBatcher.
+
+        :param publish: called with each SenML pack to publish
+        :param max_records: records that trigger a flush
+        :param window: seconds between flushes when run in a Loop
+        """
+        self.publish = publish
+        self.max_records = max_records
+        self.window = window
+        self._records: List[dict] = []
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def add(self, senml: List[dict]) -> None:
+        """
+        Add the records of a measurement to the next pack.
+
+        :param senml: senml records returned by Gatherer.info_to_senml
+        :return: None
+        """
+        # info_to_senml returns an empty record for unknown plugs
+        self._records.extend(record for record in senml if record)
+        if len(self._records) >= self.max_records:
+            self.flush()
+
+    def flush(self) -> int:
+        """
+        Publish the collected records as one pack.
+
+        :return: number of published records
+        """
+        records, self._records = self._records, []
+        if records:
+            self.publish(records)
+        return len(records)
+
+    async def run_once(self) -> None:
+        """
+        Sleep {window} seconds and flush, to be run in a Loop.
+
+        :return: None
+        """
+        await asyncio.sleep(self.window)
+        self.flush()
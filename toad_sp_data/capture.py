@@ -0,0 +1,111 @@
+"""Capture of the raw responses of the SmartPlugs, to replay real firmware
+payloads offline with benchmarks/replay.py."""
+import os
+import struct
+from time import time
+from typing import Iterator, NamedTuple, Optional
+
+from toad_sp_data import logger
+
+# time() of the response, latency in seconds, IP length and frame length
+_HEADER = struct.Struct(">dfBI")
+
+
+class CapturedResponse(NamedTuple):
+    timestamp: float
+    ip: str
+    latency: float
+    # encrypted response with its length header, as accepted by decrypt()
+    frame: bytes
+
+
+class CaptureWriter:
+    """Appends responses to a capture file, one record after another."""
+
+    def __init__(self, path: str):
+        """
+        Constructor for CaptureWriter.
+
+        :param path: capture file, created if needed and appended to
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.records = 0
+        self._file = open(path, "ab")
+
+    def write(
+        self, ip: str, latency: float, frame: bytes, timestamp: float = None
+    ) -> None:
+        """
+        Append a response to the capture.
+
+        :param ip: IP the response came from
+        :param latency: seconds from sending the command to reading the response
+        :param frame: encrypted response with its length header
+        :param timestamp: time() of the response, now by default
+        :return: None
+        """
+        if timestamp is None:
+            timestamp = time()
+        encoded_ip = ip.encode("ascii")
+        header = _HEADER.pack(timestamp, latency, len(encoded_ip), len(frame))
+        self._file.write(header + encoded_ip + frame)
+        self.records += 1
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def read_capture(path: str) -> Iterator[CapturedResponse]:
+    """
+    Read the responses of a capture file in the order they were written. A
+    partially written record left by a crash ends the capture.
+
+    :param path: capture file
+    :return: iterator of the captured responses
+    """
+    with open(path, "rb") as file:
+        while True:
+            header = file.read(_HEADER.size)
+            if len(header) < _HEADER.size:
+                return
+            timestamp, latency, ip_length, frame_length = _HEADER.unpack(header)
+            body = file.read(ip_length + frame_length)
+            if len(body) < ip_length + frame_length:
+                return
+            ip = body[:ip_length].decode("ascii")
+            yield CapturedResponse(timestamp, ip, latency, body[ip_length:])
+
+
+# writer of the running capture, None while not capturing
+writer: Optional[CaptureWriter] = None
+
+
+def start(path: str) -> None:
+    """
+    Capture every response read by smartplug.send_command() to path.
+
+    :param path: capture file
+    :return: None
+    """
+    global writer
+    stop()
+    writer = CaptureWriter(path)
+    logger.log_info("[SP]\tCapturing responses to %s", path)
+
+
+def stop() -> None:
+    """
+    Stop capturing responses, if capturing.
+
+    :return: None
+    """
+    global writer
+    if writer is not None:
+        writer.close()
+        logger.log_info(
+            "[SP]\tCaptured %d responses to %s", writer.records, writer.path
+        )
+        writer = None
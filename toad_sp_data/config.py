@@ -1,16 +1,47 @@
 from os import path
+from typing import Dict
 import configparser
 
+from toad_sp_data import encoding
+
 _config = configparser.ConfigParser()
 _config_path = path.join(
     *path.split(path.dirname(path.abspath(__file__)))[:-1], "config", "config.ini"
 )
 _config.read(_config_path)
 
+
+def parse_data_bases(data_bases: str) -> Dict[str, str]:
+    """
+    Parse [MQTT] DATA_BASES, failing on start rather than on every publish to
+    a misspelt encoding.
+
+    :param data_bases: comma separated data bases, each may be followed by
+        ":<encoding>" of its payloads
+    :return: dict with data bases as keys and their encodings as values
+    """
+    encodings = {}
+    for data_base in data_bases.split(","):
+        name, _, name_encoding = data_base.partition(":")
+        encodings[name] = name_encoding or "json"
+        encoding.get_encoder(encodings[name])
+    return encodings
+
+
+_capture_config = _config["CAPTURE"]
+_deadband_config = _config["DEADBAND"]
+_discovery_config = _config["DISCOVERY"]
 _etcd_config = _config["ETCD"]
 _gatherer_config = _config["GATHERER"]
 _logger_config = _config["LOGGER"]
+_metrics_config = _config["METRICS"]
 _mqtt_config = _config["MQTT"]
+_pipeline_config = _config["PIPELINE"]
+_sampler_config = _config["SAMPLER"]
+_smartplug_config = _config["SMARTPLUG"]
+_snapshot_config = _config["SNAPSHOT"]
+_spool_config = _config["SPOOL"]
+_supervisor_config = _config["SUPERVISOR"]
 _workspace_config = _config["WORKSPACE"]
 
 # Configuration variables
@@ -19,18 +50,105 @@ ETCD_HOST = _etcd_config.get("host")
 ETCD_PORT = int(_etcd_config.get("port"))
 ETCD_ID_KEY = _etcd_config.get("id_key")
 ETCD_CACHE_KEY = _etcd_config.get("cache_key")
+ETCD_MAX_WORKERS = int(_etcd_config.get("max_workers"))
+ETCD_FLUSH_INTERVAL = float(_etcd_config.get("flush_interval"))
+ETCD_WATCH = _etcd_config.getboolean("watch")
+ETCD_WATCH_TIMEOUT = float(_etcd_config.get("watch_timeout"))
 # Gatherer
 SLEEP_TIME_SHORT = float(_gatherer_config.get("sleep_time_short"))
 SLEEP_TIME_LONG = float(_gatherer_config.get("sleep_time_long"))
+GATHERER_ENGINE = _gatherer_config.get("engine")
+GATHERER_WORKERS = int(_gatherer_config.get("workers"))
+GATHERER_LOOP_MAX_TARGETS = int(_gatherer_config.get("loop_max_targets"))
+BACKOFF_FACTOR = float(_gatherer_config.get("backoff_factor"))
+BACKOFF_JITTER = float(_gatherer_config.get("backoff_jitter"))
+BACKOFF_CEILING = float(_gatherer_config.get("backoff_ceiling"))
+BACKOFF_FAST_RETRIES = int(_gatherer_config.get("fast_retries"))
+STATS_INTERVAL = float(_gatherer_config.get("stats_interval"))
+GATHERER_RAMP_RATE = int(_gatherer_config.get("ramp_rate"))
 
+# SmartPlug
+SP_CONNECT_TIMEOUT = float(_smartplug_config.get("connect_timeout"))
+SP_READ_TIMEOUT = float(_smartplug_config.get("read_timeout"))
+SP_TOTAL_TIMEOUT = float(_smartplug_config.get("total_timeout"))
+SP_MAX_RESPONSE_SIZE = int(_smartplug_config.get("max_response_size"))
+SP_KEEP_ALIVE = _smartplug_config.getboolean("keep_alive")
+SP_IDLE_TIMEOUT = float(_smartplug_config.get("idle_timeout"))
+SP_SYSINFO_INTERVAL = float(_smartplug_config.get("sysinfo_interval"))
+SP_DECODER = _smartplug_config.get("decoder")
+SP_EXTRACTOR = _smartplug_config.get("extractor")
 # Logger
 LOGGER_VERBOSE = _logger_config.getboolean("verbose")
+LOGGER_RATE_LIMIT = float(_logger_config.get("rate_limit"))
 # MQTT
 MQTT_BROKER_HOST = _mqtt_config.get("broker_host")
 MQTT_BROKER_PORT = int(_mqtt_config.get("broker_port"))
 MQTT_RESPONSE_TIMEOUT = int(_mqtt_config.get("response_timeout"))
-MQTT_DATA_BASES = _mqtt_config.get("data_bases").split(",")
+MQTT_DATA_ENCODINGS = parse_data_bases(_mqtt_config.get("data_bases"))
+MQTT_DATA_BASES = list(MQTT_DATA_ENCODINGS)
+MQTT_BATCH_SIZE = int(_mqtt_config.get("batch_size"))
+MQTT_BATCH_WINDOW = float(_mqtt_config.get("batch_window"))
+
+# Capture
+CAPTURE_ENABLED = _capture_config.getboolean("enabled")
+CAPTURE_DIRECTORY = _capture_config.get("directory")
+
+# Deadband
+DEADBAND_ENABLED = _deadband_config.getboolean("enabled")
+DEADBAND_ABSOLUTE = float(_deadband_config.get("absolute"))
+DEADBAND_RELATIVE = float(_deadband_config.get("relative"))
+DEADBAND_HEARTBEAT = float(_deadband_config.get("heartbeat"))
+
+# Metrics
+METRICS_ENABLED = _metrics_config.getboolean("enabled")
+METRICS_HOST = _metrics_config.get("host")
+METRICS_PORT = int(_metrics_config.get("port"))
+METRICS_LAG_INTERVAL = float(_metrics_config.get("lag_interval"))
+
+# Discovery
+DISCOVERY_MODE = _discovery_config.get("mode")
+DISCOVERY_TARGETS = [t for t in _discovery_config.get("targets").split(",") if t]
+DISCOVERY_TIMEOUT = float(_discovery_config.get("timeout"))
+DISCOVERY_INTERVAL = float(_discovery_config.get("interval"))
+
+# Pipeline
+PIPELINE_DECODE_CAPACITY = int(_pipeline_config.get("decode_capacity"))
+PIPELINE_DECODE_POLICY = _pipeline_config.get("decode_policy")
+PIPELINE_FORMAT_CAPACITY = int(_pipeline_config.get("format_capacity"))
+PIPELINE_FORMAT_POLICY = _pipeline_config.get("format_policy")
+PIPELINE_PUBLISH_CAPACITY = int(_pipeline_config.get("publish_capacity"))
+PIPELINE_PUBLISH_POLICY = _pipeline_config.get("publish_policy")
+PIPELINE_DRAIN_TIMEOUT = float(_pipeline_config.get("drain_timeout"))
+
+# Sampler
+SAMPLER_ENABLED = _sampler_config.getboolean("enabled")
+SAMPLER_MIN_INTERVAL = float(_sampler_config.get("min_interval"))
+SAMPLER_MAX_INTERVAL = float(_sampler_config.get("max_interval"))
+SAMPLER_BUDGET = float(_sampler_config.get("budget"))
+SAMPLER_ALPHA = float(_sampler_config.get("alpha"))
+SAMPLER_SCALE = float(_sampler_config.get("scale"))
+
+# Snapshot
+SNAPSHOT_ENABLED = _snapshot_config.getboolean("enabled")
+SNAPSHOT_DIRECTORY = _snapshot_config.get("directory")
+SNAPSHOT_INTERVAL = float(_snapshot_config.get("interval"))
+
+# Spool
+SPOOL_ENABLED = _spool_config.getboolean("enabled")
+SPOOL_DIRECTORY = _spool_config.get("directory")
+SPOOL_SEGMENT_SIZE = int(_spool_config.get("segment_size"))
+SPOOL_MAX_SIZE = int(_spool_config.get("max_size"))
+SPOOL_EVICT = _spool_config.get("evict")
+SPOOL_REPLAY_RATE = float(_spool_config.get("replay_rate"))
+SPOOL_REPLAY_BATCH = int(_spool_config.get("replay_batch"))
+
+# Supervisor
+SUPERVISOR_WORKERS = int(_supervisor_config.get("workers"))
+SUPERVISOR_MAX_RESTARTS = int(_supervisor_config.get("max_restarts"))
+SUPERVISOR_RESTART_WINDOW = float(_supervisor_config.get("restart_window"))
 
 # WORKSPACE
 WS_IP_RANGE_START = _workspace_config.get("ip_range_start")
 WS_IP_RANGE_END = _workspace_config.get("ip_range_end")
+WS_TARGETS = [t for t in _workspace_config.get("targets").split(",") if t.strip()]
+WS_EXCLUDE = [t for t in _workspace_config.get("exclude").split(",") if t.strip()]
@@ -0,0 +1,85 @@
+"""Report-by-exception of power readings."""
+from time import monotonic
+from typing import Dict, Optional
+
+
+class Reported:
+    """Last reading published for a plug."""
+
+    __slots__ = ("power", "relay_state", "time")
+
+    def __init__(self, power: float, relay_state: int, time: float):
+        self.power = power
+        self.relay_state = relay_state
+        self.time = time
+
+
+class Deadband:
+    """Decides whether a reading is worth publishing.
+
+    A reading is published when the relay state changes, when the power
+    moves away from the last published power by more than the deadband, or
+    when nothing has been published for the plug in heartbeat seconds. The
+    deadband is the larger of the absolute one and the relative one times
+    the last published power, so idle plugs ignore noise around 0 W and
+    large loads ignore small relative fluctuations.
+    """
+
+    def __init__(self, absolute: float, relative: float, heartbeat: float):
+        """
+        Constructor for Deadband.
+
+        :param absolute: deadband in W
+        :param relative: deadband as a fraction of the last published power
+        :param heartbeat: maximum seconds between readings published per plug
+        """
+        self.absolute = absolute
+        self.relative = relative
+        self.heartbeat = heartbeat
+        self.published = 0
+        self.suppressed = 0
+        self._reported: Dict[str, Reported] = {}
+
+    def __len__(self) -> int:
+        return len(self._reported)
+
+    def update(
+        self, plug: str, power: float, relay_state: int, now: Optional[float] = None
+    ) -> bool:
+        """
+        Check a reading, remembering it as the last published one if it has
+        to be published.
+
+        :param plug: key of the plug, e.g. its MAC
+        :param power: power in W
+        :param relay_state: 1 if the relay is on, 0 otherwise
+        :param now: monotonic time of the reading, defaults to now
+        :return: True if the reading has to be published
+        """
+        if now is None:
+            now = monotonic()
+        last = self._reported.get(plug)
+        if (
+            last is not None
+            and relay_state == last.relay_state
+            and now - last.time < self.heartbeat
+            and abs(power - last.power)
+            <= max(self.absolute, self.relative * abs(last.power))
+        ):
+            self.suppressed += 1
+            return False
+        if last is None:
+            self._reported[plug] = Reported(power, relay_state, now)
+        else:
+            last.power, last.relay_state, last.time = power, relay_state, now
+        self.published += 1
+        return True
+
+    def forget(self, plug: str) -> None:
+        """
+        Publish the next reading of a plug whatever its value.
+
+        :param plug: key of the plug
+        :return: None
+        """
+        self._reported.pop(plug, None)
@@ -0,0 +1,123 @@
+"""Decoders of the JSON responses of the SmartPlugs.
+
+Responses are parsed with orjson when it is installed, or with the standard
+json module. The fields the collector needs can also be extracted straight
+from the decrypted bytes, without building the whole object tree; responses
+that do not have the expected shape are left to the full parse.
+"""
+import json
+import re
+from typing import Any, Callable, Dict, Optional, Pattern, Union
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+class DecodingException(Exception):
+    pass
+
+
+DECODERS: Dict[str, Callable[[Union[bytes, str]], Any]] = {"json": json.loads}
+if orjson is not None:
+    DECODERS["orjson"] = orjson.loads
+
+
+def get_decoder(name: str) -> Callable[[Union[bytes, str]], Any]:
+    """
+    Get a JSON decoder by name.
+
+    :param name: a key of DECODERS, or "auto" for the fastest one installed
+    :return: decoder function, raising ValueError on invalid JSON
+    """
+    if name == "auto":
+        name = "orjson" if "orjson" in DECODERS else "json"
+    try:
+        return DECODERS[name]
+    except KeyError:
+        raise DecodingException(f"Unknown or not installed decoder '{name}'")
+
+
+def targeted(extractor: str, decoder: str) -> bool:
+    """
+    Tell whether fields are to be extracted without parsing the responses.
+
+    :param extractor: "targeted", "full" or "auto" to extract them only when
+        no decoder faster than the standard json module is used
+    :param decoder: name of the decoder, as given to get_decoder()
+    :return: True to use extract_power() and extract_info()
+    """
+    if extractor == "auto":
+        return get_decoder(decoder) is json.loads
+    if extractor not in ("targeted", "full"):
+        raise DecodingException(f"Unknown extractor '{extractor}'")
+    return extractor == "targeted"
+
+
+def framed(data: bytes) -> bool:
+    """
+    Tell whether a decrypted response looks like a JSON object, without
+    parsing it.
+
+    :param data: decrypted response
+    :return: False if the response cannot be decoded, e.g. it is truncated
+    """
+    data = data.strip()
+    return data[:1] == b"{" and data[-1:] == b"}"
+
+
+# values following the keys, up to the end of the value
+_NUMBER = re.compile(rb"\s*:\s*(-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][+-]?\d+)?)\s*[,}]")
+_RELAY_STATE = re.compile(rb"\s*:\s*([01])\s*[,}]")
+_MAC = re.compile(rb'\s*:\s*"([0-9A-Fa-f]{2}(?::[0-9A-Fa-f]{2}){5})"')
+
+
+def _value(data: bytes, key: bytes, pattern: Pattern) -> Optional[bytes]:
+    """
+    Find the value of a key that appears exactly once in data. A key inside a
+    string has its quotes escaped, so it cannot be mistaken for a real one.
+    """
+    start = data.find(key)
+    if start < 0 or data.find(key, start + len(key)) >= 0:
+        return None
+    match = pattern.match(data, start + len(key))
+    return None if match is None else match.group(1)
+
+
+def extract_power(data: bytes) -> Optional[float]:
+    """
+    Extract the power from a decrypted response without parsing it.
+
+    :param data: decrypted response
+    :return: power in W, None if the response has to be parsed to get it
+    """
+    power = _value(data, b'"power"', _NUMBER)
+    if power is not None:
+        if b'"power_mw"' in data:
+            return None
+        return float(power)
+    power = _value(data, b'"power_mw"', _NUMBER)
+    return None if power is None else float(power) / 1000.0
+
+
+def extract_info(data: bytes) -> Optional[dict]:
+    """
+    Extract power, relay state and MAC from a decrypted response without
+    parsing it.
+
+    Every field has to appear exactly once, so responses with a different
+    shape, e.g. errors or unexpected firmware, return None.
+
+    :param data: decrypted response
+    :return: dict with keys "power", "relay_state" and "mac", None if the
+        response has to be parsed to get them
+    """
+    power = extract_power(data)
+    if power is None:
+        return None
+    relay_state = _value(data, b'"relay_state"', _RELAY_STATE)
+    mac = _value(data, b'"mac"', _MAC)
+    if relay_state is None or mac is None:
+        return None
+    return {"power": power, "relay_state": int(relay_state), "mac": mac.decode()}
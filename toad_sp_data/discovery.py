@@ -0,0 +1,106 @@
+"""Discovery of SmartPlugs over UDP.
+
+HS110 SmartPlugs answer an encrypted get_sysinfo command sent to UDP port
+9999, either broadcast or unicast, which finds live plugs without opening
+a TCP connection to every address of the workspace.
+"""
+import asyncio
+from typing import Callable, Dict, Iterable, Tuple
+
+from toad_sp_data import logger, smartplug
+
+SYSINFO_COMMAND: Dict[str, Dict[str, dict]] = {"system": {"get_sysinfo": {}}}
+
+
+class _DiscoveryProtocol(asyncio.DatagramProtocol):
+    def __init__(self, discovery: "Discovery"):
+        self.discovery = discovery
+
+    def datagram_received(self, data: bytes, addr: Tuple[str, int]) -> None:
+        self.discovery.handle_reply(data, addr[0])
+
+    def error_received(self, exc: Exception) -> None:  # pragma: no cover
+        logger.log_error_verbose("[SP]\tDiscovery error: %s", exc)
+
+
+class Discovery:
+    """Periodically sends get_sysinfo over UDP and keeps a MAC->IP map of the
+    SmartPlugs that reply."""
+
+    def __init__(
+        self,
+        targets: Iterable[str],
+        on_found: Callable[[str, str], None] = None,
+        port: int = 9999,
+        timeout: float = 2,
+        interval: float = 60,
+    ):
+        """
+        Constructor for Discovery.
+
+        :param targets: broadcast addresses or single IPs to send requests to
+        :param on_found: called with (MAC, IP) when a plug is found or moves
+        :param port: UDP port of the SPs
+        :param timeout: seconds to wait for replies after sending requests
+        :param interval: seconds between scans when run in a Loop
+        """
+        self.targets = targets
+        self.on_found = on_found
+        self.port = port
+        self.timeout = timeout
+        self.interval = interval
+        self.plugs: Dict[str, str] = {}
+
+    def handle_reply(self, data: bytes, ip: str) -> None:
+        """
+        Register the plug that sent a reply.
+
+        :param data: encrypted reply
+        :param ip: IP address the reply came from
+        :return: None
+        """
+        try:
+            mac = smartplug.decrypt_datagram(data)["system"]["get_sysinfo"]["mac"]
+        except (smartplug.DecryptionException, KeyError, TypeError):
+            logger.log_error_limited(ip, "[SP]\tInvalid discovery reply from %s", ip)
+            return
+        if self.plugs.get(mac) == ip:
+            return
+        logger.log_info("[SP]\tDiscovered SP %s at %s", mac, ip)
+        self.plugs[mac] = ip
+        if self.on_found is not None:
+            self.on_found(mac, ip)
+
+    async def scan(self) -> Dict[str, str]:
+        """
+        Send get_sysinfo to every target and collect replies until the
+        timeout expires.
+
+        :return: dict with MAC addresses as keys and IPs as values
+        """
+        event_loop = asyncio.get_event_loop()
+        transport, _ = await event_loop.create_datagram_endpoint(
+            lambda: _DiscoveryProtocol(self),
+            local_addr=("0.0.0.0", 0),
+            allow_broadcast=True,
+        )
+        try:
+            payload = smartplug.encrypt_datagram(SYSINFO_COMMAND)
+            for target in self.targets:
+                transport.sendto(payload, (target, self.port))
+            await asyncio.sleep(self.timeout)
+        finally:
+            transport.close()
+        return self.plugs
+
+    async def run_once(self) -> None:
+        """
+        Scan once and sleep {interval} seconds, to be run in a Loop.
+
+        :return: None
+        """
+        try:
+            await self.scan()
+        except OSError as err:
+            logger.log_error("[SP]\tDiscovery scan failed: %s", err)
+        await asyncio.sleep(self.interval)
@@ -0,0 +1,219 @@
+"""Encoders of the payloads published to MQTT.
+
+Besides JSON, SenML packs can be encoded as SenML-CBOR (RFC 8428), where
+the record labels are replaced by small integers and numbers are sent in
+binary form.
+"""
+import json
+import struct
+from typing import Any, Callable, Dict, Tuple
+
+# SenML labels and their CBOR representation (RFC 8428, section 6)
+SENML_CBOR_LABELS = {
+    "bver": -1,
+    "bn": -2,
+    "bt": -3,
+    "bu": -4,
+    "bv": -5,
+    "bs": -16,
+    "n": 0,
+    "u": 1,
+    "v": 2,
+    "vs": 3,
+    "vb": 4,
+    "s": 5,
+    "t": 6,
+    "ut": 7,
+    "vd": 8,
+}
+_SENML_LABELS = {v: k for k, v in SENML_CBOR_LABELS.items()}
+
+
+class EncodingException(Exception):
+    pass
+
+
+def encode_json(payload: dict) -> bytes:
+    """
+    Encode a payload as JSON, exactly as gmqtt does with dict payloads.
+
+    :param payload: wrapped senml
+    :return: encoded payload
+    """
+    return json.dumps(payload, ensure_ascii=False).encode("utf-8")
+
+
+def _cbor_head(major: int, value: int) -> bytes:
+    if value < 24:
+        return bytes([(major << 5) | value])
+    if value < 0x100:
+        return bytes([(major << 5) | 24, value])
+    if value < 0x10000:
+        return struct.pack(">BH", (major << 5) | 25, value)
+    if value < 0x100000000:
+        return struct.pack(">BI", (major << 5) | 26, value)
+    return struct.pack(">BQ", (major << 5) | 27, value)
+
+
+def _cbor_encode(item: Any, out: bytearray) -> None:
+    if item is None:
+        out.append(0xF6)
+    elif item is True or item is False:
+        out.append(0xF5 if item else 0xF4)
+    elif isinstance(item, int):
+        if item >= 0:
+            out += _cbor_head(0, item)
+        else:
+            out += _cbor_head(1, -1 - item)
+    elif isinstance(item, float):
+        single = struct.pack(">f", item)
+        if struct.unpack(">f", single)[0] == item:
+            out.append(0xFA)
+            out += single
+        else:
+            out.append(0xFB)
+            out += struct.pack(">d", item)
+    elif isinstance(item, str):
+        encoded = item.encode("utf-8")
+        out += _cbor_head(3, len(encoded))
+        out += encoded
+    elif isinstance(item, (bytes, bytearray)):
+        out += _cbor_head(2, len(item))
+        out += item
+    elif isinstance(item, (list, tuple)):
+        out += _cbor_head(4, len(item))
+        for element in item:
+            _cbor_encode(element, out)
+    elif isinstance(item, dict):
+        out += _cbor_head(5, len(item))
+        for key, value in item.items():
+            _cbor_encode(key, out)
+            _cbor_encode(value, out)
+    else:
+        raise EncodingException(f"Unsupported CBOR type {type(item)}")
+
+
+def cbor_dumps(item: Any) -> bytes:
+    """
+    Encode an object made of dicts, lists, strings, numbers, booleans and
+    None as CBOR (RFC 8949).
+
+    :param item: object to encode
+    :return: encoded object
+    """
+    out = bytearray()
+    _cbor_encode(item, out)
+    return bytes(out)
+
+
+def _cbor_decode(data: bytes, pos: int) -> Tuple[Any, int]:
+    initial = data[pos]
+    major, info = initial >> 5, initial & 0x1F
+    pos += 1
+    if major == 7:
+        if info == 20 or info == 21:
+            return info == 21, pos
+        if info == 22:
+            return None, pos
+        if info == 26:
+            return struct.unpack_from(">f", data, pos)[0], pos + 4
+        if info == 27:
+            return struct.unpack_from(">d", data, pos)[0], pos + 8
+        raise EncodingException(f"Unsupported CBOR simple value {info}")
+    if info < 24:
+        value = info
+    elif info <= 27:
+        end = pos + (1 << (info - 24))
+        value = int.from_bytes(data[pos:end], "big")
+        pos = end
+    else:
+        raise EncodingException(f"Unsupported CBOR argument {info}")
+    if major == 0:
+        return value, pos
+    if major == 1:
+        return -1 - value, pos
+    end = pos + value
+    if major == 2:
+        return bytes(data[pos:end]), end
+    if major == 3:
+        return bytes(data[pos:end]).decode("utf-8"), end
+    if major == 4:
+        items = []
+        for _ in range(value):
+            item, pos = _cbor_decode(data, pos)
+            items.append(item)
+        return items, pos
+    if major == 5:
+        mapping = {}
+        for _ in range(value):
+            key, pos = _cbor_decode(data, pos)
+            mapping[key], pos = _cbor_decode(data, pos)
+        return mapping, pos
+    raise EncodingException(f"Unsupported CBOR major type {major}")
+
+
+def cbor_loads(data: bytes) -> Any:
+    """
+    Decode an object encoded by cbor_dumps().
+
+    :param data: encoded object
+    :return: decoded object
+    """
+    try:
+        item, pos = _cbor_decode(data, 0)
+    except (IndexError, struct.error, UnicodeDecodeError) as err:
+        raise EncodingException(str(err))
+    if pos != len(data):
+        raise EncodingException("Trailing bytes after CBOR item")
+    return item
+
+
+def encode_senml_cbor(payload: dict) -> bytes:
+    """
+    Encode a wrapped senml as CBOR, with the SenML labels of every record
+    replaced by their integer representation.
+
+    :param payload: wrapped senml, {field: [records]}
+    :return: encoded payload
+    """
+    return cbor_dumps(
+        {
+            field: [
+                {SENML_CBOR_LABELS.get(k, k): v for k, v in record.items()}
+                for record in records
+            ]
+            for field, records in payload.items()
+        }
+    )
+
+
+def decode_senml_cbor(data: bytes) -> dict:
+    """
+    Decode a payload encoded by encode_senml_cbor().
+
+    :param data: encoded payload
+    :return: wrapped senml, {field: [records]}
+    """
+    return {
+        field: [{_SENML_LABELS.get(k, k): v for k, v in r.items()} for r in records]
+        for field, records in cbor_loads(data).items()
+    }
+
+
+ENCODERS: Dict[str, Callable[[dict], bytes]] = {
+    "json": encode_json,
+    "cbor": encode_senml_cbor,
+}
+
+
+def get_encoder(name: str) -> Callable[[dict], bytes]:
+    """
+    Get a payload encoder by name.
+
+    :param name: name of the encoding, a key of ENCODERS
+    :return: encoder function
+    """
+    try:
+        return ENCODERS[name]
+    except KeyError:
+        raise EncodingException(f"Unknown payload encoding '{name}'")
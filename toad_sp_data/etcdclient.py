@@ -1,9 +1,79 @@
 """Helper submodule for operations on ETCD."""
-from typing import Dict
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from time import perf_counter
+from typing import Any, Callable, Dict, Optional, Tuple
 
 import etcd  # import python-ectd module
 
-from toad_sp_data import logger
+from toad_sp_data import config, logger, metrics
+
+# one long-lived client per ETCD server, shared by every thread
+_clients: Dict[Tuple[str, int], etcd.Client] = {}
+_clients_lock = threading.Lock()
+# bounded pool of threads running the blocking python-etcd requests
+_executor: ThreadPoolExecutor = None
+
+
+def get_client(host: str, port: int) -> etcd.Client:
+    """
+    Return the shared client of an ETCD server, creating it on first use.
+
+    The client keeps its HTTP connections alive, with one connection per
+    executor thread.
+
+    :param host: ETCD host
+    :param port: ETCD port
+    :return: python-etcd client
+    """
+    with _clients_lock:
+        client = _clients.get((host, port))
+        if client is None:
+            client = etcd.Client(
+                host=host, port=port, per_host_pool_size=config.ETCD_MAX_WORKERS
+            )
+            _clients[(host, port)] = client
+        return client
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=config.ETCD_MAX_WORKERS, thread_name_prefix="etcd"
+        )
+    return _executor
+
+
+async def _run_in_executor(func: Callable[..., Any], *args: Any) -> Any:
+    """
+    Run a blocking ETCD operation without blocking the event loop.
+
+    :param func: synchronous function of this module
+    :param args: args to pass to said function
+    :return: return value of func
+    """
+    event_loop = asyncio.get_event_loop()
+    started = perf_counter()
+    try:
+        return await event_loop.run_in_executor(_get_executor(), partial(func, *args))
+    finally:
+        latency = perf_counter() - started
+        metrics.ETCD_SECONDS.labels(func.__name__).observe(latency)
+
+
+def shutdown() -> None:
+    """
+    Wait for pending ETCD operations and stop the executor threads.
+
+    :return: None
+    """
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
 
 
 def get_smartplug_ids(host: str, port: int, key: str) -> Dict[str, str]:
@@ -15,13 +85,13 @@ def get_smartplug_ids(host: str, port: int, key: str) -> Dict[str, str]:
     :param key: parent key of all childs with SP MACs as keys and IDs as values
     :return: dict with MAC addresses as keys and IDs as values
     """
-    client = etcd.Client(host=host, port=port)
+    client = get_client(host, port)
     ids = {}
     parent: etcd.EtcdResult = ...
     try:
         parent = client.read(key)
     except etcd.EtcdKeyNotFound as err:
-        logger.log_error(f"ETCD key for the ID map not found: {err}")
+        logger.log_error("ETCD key for the ID map not found: %s", err)
         return {}
     for child in parent.children:
         k = child.key.split("/")[-1]
@@ -38,7 +108,7 @@ def get_cached_ips(host: str, port: int, key: str) -> Dict[str, str]:
     :param key: parent key of all the cached ID->IP association
     :return: dict with smartplug IDs as keys and IPs as values
     """
-    client = etcd.Client(host=host, port=port)
+    client = get_client(host, port)
     ips = {}
     parent: etcd.EtcdResult = ...
     try:
@@ -62,5 +132,92 @@ def put_cached_ip(host: str, port: int, key: str, sp_id: str, sp_ip: str) -> Non
     :param sp_ip: IP of the smartplug
     :return: None
     """
-    client = etcd.Client(host=host, port=port)
+    client = get_client(host, port)
     client.write(f"{key}/{sp_id}", sp_ip)
+
+
+def read_children(
+    host: str, port: int, key: str
+) -> Tuple[Dict[str, str], Optional[int]]:
+    """
+    Read the children of a key and the ETCD index to watch it from.
+
+    :param host: ETCD host
+    :param port: ETCD port
+    :param key: parent key
+    :return: dict with child names as keys and their values as values, and
+        the index of the next change, also when the key does not exist yet,
+        or None if ETCD did not give one
+    """
+    client = get_client(host, port)
+    try:
+        parent = client.read(key)
+    except etcd.EtcdKeyNotFound as err:
+        # watched from the index of the error, to see the key being created
+        index = (err.payload or {}).get("index")
+        return {}, None if index is None else index + 1
+    children = {}
+    for child in parent.children:
+        # python-etcd yields the parent itself when it has no children
+        if child.key != parent.key:
+            children[child.key.split("/")[-1]] = child.value
+    return children, parent.etcd_index + 1
+
+
+def watch(
+    host: str, port: int, key: str, index: Optional[int], timeout: float
+) -> etcd.EtcdResult:
+    """
+    Wait for the next change of a key or any of its children.
+
+    :param host: ETCD host
+    :param port: ETCD port
+    :param key: parent key
+    :param index: index of the first change to return, None for the next one
+    :param timeout: seconds to wait for a change
+    :return: the change, with the changed key, its new value and its index
+    :raise etcd.EtcdWatchTimedOut: if nothing changed within timeout
+    :raise etcd.EtcdEventIndexCleared: if index is too old to be watched
+    """
+    client = get_client(host, port)
+    return client.watch(key, index=index, timeout=timeout, recursive=True)
+
+
+async def get_smartplug_ids_async(host: str, port: int, key: str) -> Dict[str, str]:
+    """
+    Asynchronous version of get_smartplug_ids().
+
+    :param host: ETCD host
+    :param port: ETCD port
+    :param key: parent key of all childs with SP MACs as keys and IDs as values
+    :return: dict with MAC addresses as keys and IDs as values
+    """
+    return await _run_in_executor(get_smartplug_ids, host, port, key)
+
+
+async def get_cached_ips_async(host: str, port: int, key: str) -> Dict[str, str]:
+    """
+    Asynchronous version of get_cached_ips().
+
+    :param host: ETCD host
+    :param port: ETCD port
+    :param key: parent key of all the cached ID->IP association
+    :return: dict with smartplug IDs as keys and IPs as values
+    """
+    return await _run_in_executor(get_cached_ips, host, port, key)
+
+
+async def put_cached_ip_async(
+    host: str, port: int, key: str, sp_id: str, sp_ip: str
+) -> None:
+    """
+    Asynchronous version of put_cached_ip().
+
+    :param host: ETCD host
+    :param port: ETCD port
+    :param key: Key of cached addresses
+    :param sp_id: ID of the smartplug
+    :param sp_ip: IP of the smartplug
+    :return: None
+    """
+    await _run_in_executor(put_cached_ip, host, port, key, sp_id, sp_ip)
@@ -1,11 +1,58 @@
 import asyncio
-from time import time
-from typing import List
+import os
+from itertools import islice
+from time import monotonic, perf_counter, time
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Union
 
 from gmqtt import Client as MQTTClient
 from gmqtt.mqtt.constants import MQTTv311
 
-from toad_sp_data import config, etcdclient, logger, loop, protocol, smartplug
+from toad_sp_data import (
+    capture,
+    config,
+    etcdclient,
+    logger,
+    loop,
+    metrics,
+    protocol,
+    smartplug,
+    snapshot,
+)
+from toad_sp_data.backoff import Backoff
+from toad_sp_data.batcher import SenMLBatcher
+from toad_sp_data.deadband import Deadband
+from toad_sp_data.discovery import Discovery
+from toad_sp_data.encoding import get_encoder
+from toad_sp_data.ipcache import IPCache
+from toad_sp_data.pipeline import Pipeline
+from toad_sp_data.pool import ConnectionPool
+from toad_sp_data.registry import PlugRecord, Registry
+from toad_sp_data.sampler import Sampler
+from toad_sp_data.scheduler import Scheduler
+from toad_sp_data.spool import Spool
+from toad_sp_data.targets import TargetSpace
+from toad_sp_data.watcher import KeyWatcher
+
+
+class Reading:
+    """An answered poll on its way through the pipeline."""
+
+    __slots__ = ("ip", "response", "record", "fast", "info", "senml")
+
+    def __init__(self, ip: str, response: bytes, record: Optional[PlugRecord]):
+        """
+        Constructor for Reading.
+
+        :param ip: IP the plug answered at
+        :param response: decrypted response of the plug
+        :param record: record of the plug if it was only asked for its power
+        """
+        self.ip = ip
+        self.response = response
+        self.record = record
+        self.fast = record is not None
+        self.info: Optional[dict] = None
+        self.senml: Optional[List[dict]] = None
 
 
 class Gatherer(MQTTClient):
@@ -19,6 +66,8 @@ class Gatherer(MQTTClient):
             client_id="Gatherer",
             *args,
             smartplug_ids={},
+            cached_ips: Optional[Dict[str, str]] = None,
+            alive_ips: Iterable[str] = (),
     ):  # pragma: no cover
         """
         Constructor for Gatherer.
@@ -26,17 +75,139 @@ class Gatherer(MQTTClient):
         :param client_id: ID to give to the MQTT client
         :param args: args to pass to the MQTT client constructor
         :param smartplug_ids: dictionary with SP MACs as keys and IDs as values
+        :param cached_ips: dictionary with SP IDs as keys and IPs as values,
+            read from ETCD if None
+        :param alive_ips: IPs that answered their last poll, polled first
         """
         super().__init__(client_id, *args)
         self.event_loop = event_loop
-        self.sp_ids = smartplug_ids
-        try:
-            self.cached_ips = etcdclient.get_cached_ips(
-                config.ETCD_HOST, config.ETCD_PORT, config.ETCD_CACHE_KEY
+        # known plugs indexed by ID, MAC and IP
+        self.registry = Registry()
+        for mac, sp_id in smartplug_ids.items():
+            self.registry.set_mac(mac, sp_id)
+        self.pool = None
+        if config.SP_KEEP_ALIVE:
+            self.pool = ConnectionPool(config.SP_IDLE_TIMEOUT)
+        # the ID map and IP cache come from a snapshot, read ETCD on start
+        self.warm = cached_ips is not None
+        if cached_ips is None:
+            try:
+                cached_ips = etcdclient.get_cached_ips(
+                    config.ETCD_HOST, config.ETCD_PORT, config.ETCD_CACHE_KEY
+                )
+            except Exception as err:
+                logger.log_error("%s", err)
+                cached_ips = {}
+        self.cached_ips = IPCache(
+            config.ETCD_HOST,
+            config.ETCD_PORT,
+            config.ETCD_CACHE_KEY,
+            cached_ips,
+            registry=self.registry,
+        )
+        self.alive_ips: Set[str] = set(alive_ips)
+        # IPs whose last response could not be decoded, backing off
+        self.undecodable_ips: Set[str] = set()
+        # IPs of the range waiting to be added to the targets
+        self.pending_targets: Iterator[str] = iter(())
+        self.etcd_read: Optional[asyncio.Task] = None
+        self.snapshot_path: Optional[str] = None
+        # save of the snapshot running in the executor
+        self.snapshot_save: Optional[asyncio.Future] = None
+        if config.SNAPSHOT_ENABLED:
+            self.snapshot_path = snapshot_path(client_id)
+        # polling Loops by IP and maintenance Loops
+        self.targets: Dict[str, loop.Loop] = {}
+        self.loops: List[loop.Loop] = []
+        self.backoff = Backoff(
+            fast_delay=config.SLEEP_TIME_SHORT,
+            base_delay=config.SLEEP_TIME_LONG,
+            ceiling=config.BACKOFF_CEILING,
+            factor=config.BACKOFF_FACTOR,
+            jitter=config.BACKOFF_JITTER,
+            fast_retries=config.BACKOFF_FAST_RETRIES,
+        )
+        # poll intervals of answering plugs, SLEEP_TIME_SHORT if None
+        self.sampler: Sampler = None
+        if config.SAMPLER_ENABLED:
+            self.sampler = Sampler(
+                config.SAMPLER_MIN_INTERVAL,
+                config.SAMPLER_MAX_INTERVAL,
+                config.SAMPLER_BUDGET / config.SUPERVISOR_WORKERS,
+                config.SAMPLER_ALPHA,
+                config.SAMPLER_SCALE,
             )
-        except Exception as err:
-            logger.log_error(err.__str__())
-            self.cached_ips = {}
+            metrics.SAMPLER_POLL_RATE.set_function(self.sampler.planned_rate)
+        self.batcher: SenMLBatcher = None
+        if config.MQTT_BATCH_SIZE > 0:
+            self.batcher = SenMLBatcher(
+                lambda pack: self.pub_to_mqtt(wrap_senml(pack)),
+                config.MQTT_BATCH_SIZE,
+                config.MQTT_BATCH_WINDOW,
+            )
+        self.deadband: Deadband = None
+        if config.DEADBAND_ENABLED:
+            self.deadband = Deadband(
+                config.DEADBAND_ABSOLUTE,
+                config.DEADBAND_RELATIVE,
+                config.DEADBAND_HEARTBEAT,
+            )
+        self.discovery: Discovery = None
+        # IPs discovered plugs may be polled at
+        self.allowed_ips = TargetSpace()
+        self.watchers: List[KeyWatcher] = []
+        # messages published while the broker is unreachable
+        self.spool: Spool = None
+        if config.SPOOL_ENABLED:
+            self.spool = Spool(
+                os.path.join(config.SPOOL_DIRECTORY, client_id),
+                config.SPOOL_SEGMENT_SIZE,
+                config.SPOOL_MAX_SIZE,
+                config.SPOOL_EVICT,
+            )
+            metrics.SPOOL_MESSAGES.set_function(lambda: len(self.spool))
+        # answered polls are decoded, formatted and published in stages
+        self.pipeline = Pipeline()
+        self.pipeline.add_stage(
+            "decode",
+            self.decode_reading,
+            config.PIPELINE_DECODE_CAPACITY,
+            config.PIPELINE_DECODE_POLICY,
+            self.on_decode_failed,
+        )
+        self.pipeline.add_stage(
+            "format",
+            self.format_reading,
+            config.PIPELINE_FORMAT_CAPACITY,
+            config.PIPELINE_FORMAT_POLICY,
+            self.on_reading_failed,
+        )
+        self.pipeline.add_stage(
+            "publish",
+            self.publish_reading,
+            config.PIPELINE_PUBLISH_CAPACITY,
+            config.PIPELINE_PUBLISH_POLICY,
+            self.on_reading_failed,
+        )
+        for stage in self.pipeline.stages:
+            metrics.PIPELINE_QUEUE_DEPTH.labels(stage.name).set_function(
+                stage.queue.qsize
+            )
+            metrics.PIPELINE_DROPPED.labels(stage.name).set_function(
+                lambda queue=stage.queue: queue.dropped
+            )
+        # Loops running the pipeline stages, stopped after draining them
+        self.stage_loops: List[loop.Loop] = []
+        if config.CAPTURE_ENABLED:
+            capture.start(os.path.join(config.CAPTURE_DIRECTORY, f"{client_id}.cap"))
+        self.scheduler: Scheduler = None
+        if config.GATHERER_ENGINE == "scheduler":
+            self.scheduler = Scheduler(
+                self.poll, config.GATHERER_WORKERS, config.SLEEP_TIME_LONG
+            )
+        if self.batcher is not None:
+            metrics.MQTT_PENDING_RECORDS.set_function(lambda: len(self.batcher))
+        metrics.MQTT_WRITE_BUFFER_BYTES.set_function(self.write_buffer_size)
 
     async def connect(
             self, host, port=1883, ssl=False, keepalive=60, version=MQTTv311, raise_exc=True
@@ -47,11 +218,25 @@ class Gatherer(MQTTClient):
         logger.log_info_verbose("Connected to MQTT broker")
 
     def on_disconnect(self, *args):  # pragma: no cover
-        logger.log_info_verbose("Disconnected from MQTT broker")
+        if self.spool is not None:
+            logger.log_info("Disconnected from MQTT broker, spooling messages")
+        else:
+            logger.log_info_verbose("Disconnected from MQTT broker")
 
     def on_subscribe(self, *args):  # pragma: no cover
         logger.log_info_verbose("Subscribed to topic")
 
+    def write_buffer_size(self) -> int:
+        """
+        Bytes published but not yet written to the MQTT broker connection.
+
+        :return: size of the write buffer, 0 if not connected
+        """
+        transport = getattr(self._connection, "_transport", None)
+        if transport is None:
+            return 0
+        return transport.get_write_buffer_size()
+
     async def get_power_senml(self, ip: str) -> List:
         """
         Request power measurement from a smartplug and return a senml with the
@@ -62,7 +247,7 @@ class Gatherer(MQTTClient):
         """
         ok, power = await smartplug.get_power(ip=ip)
         if not ok:
-            logger.log_error_verbose(f"Failed to get power from '{ip}'")
+            logger.log_error_limited(ip, "Failed to get power from '%s'", ip)
             return []
         info = smartplug.extract_info(power)
         return self.info_to_senml(info)
@@ -70,69 +255,581 @@ class Gatherer(MQTTClient):
     def pub_to_mqtt(self, senml) -> None:
         """
         Publish a power measurement from a smartplug formatted as senml to the
-        MQTT broker at topic {protocol.MQTT_PUB_TOPIC}
+        MQTT broker at topic {protocol.MQTT_PUB_TOPIC}, encoded as configured
+        for each data base.
 
         :param senml: senml measurement to post
         :return: None
         """
-        logger.log_info_verbose(f"[SP]\tPublish to MQTT: {senml}")
+        logger.log_info_verbose("[SP]\tPublish to MQTT: %s", senml)
+        started = perf_counter()
+        payloads: Dict[str, bytes] = {}
         for db in config.MQTT_DATA_BASES:
             topic = f"{protocol.MQTT_PUB_TOPIC}/{db}"
-            logger.log_info_verbose(f"[SP]\tTopic: {topic}")
-            self.publish(topic, senml)
+            logger.log_info_verbose("[SP]\tTopic: %s", topic)
+            # encode once per encoding, not once per topic
+            encoding = config.MQTT_DATA_ENCODINGS[db]
+            if encoding not in payloads:
+                payloads[encoding] = get_encoder(encoding)(senml)
+            self.send(topic, payloads[encoding])
+        metrics.POLL_STAGE_SECONDS.labels("publish").observe(perf_counter() - started)
 
-    async def run_once(self, ip: str) -> None:
+    def send(self, topic: str, payload: bytes) -> None:
+        """
+        Publish a message, or spool it while the broker is unreachable or
+        older messages are waiting in the spool, to keep them in order.
+
+        :param topic: topic to publish at
+        :param payload: encoded payload
+        :return: None
+        """
+        if self.spool is not None and (len(self.spool) or not self.is_connected):
+            self.spool.append(topic, payload)
+        else:
+            self.publish(topic, payload)
+
+    async def replay_spool(self) -> None:
+        """
+        Publish the spooled messages in order once the broker is reachable,
+        at most SPOOL_REPLAY_RATE messages per second.
+
+        :return: None
+        """
+        if not self.is_connected or not len(self.spool):
+            await asyncio.sleep(1)
+            return
+        messages = self.spool.peek(config.SPOOL_REPLAY_BATCH)
+        for topic, payload in messages:
+            self.publish(topic, payload)
+        self.spool.consume(len(messages))
+        logger.log_info_verbose(
+            "[SP]\tReplayed %d spooled messages, %d left",
+            len(messages),
+            len(self.spool),
+        )
+        await asyncio.sleep(len(messages) / config.SPOOL_REPLAY_RATE)
+
+    async def poll(self, ip: str) -> float:
         """
         1. Request measurement from IP
-        2. Send measurement to MQTT broker
-        3. Sleep {RETRY_TIME} seconds
+        2. Queue the response to be decoded, formatted and published
+
+        Plugs whose MAC was confirmed at IP less than SP_SYSINFO_INTERVAL
+        seconds ago are only asked for their power, their last relay state
+        is reused. Answering plugs are polled again after the interval of the
+        sampler, if enabled.
 
         :param ip: IP address to send requests to
-        :return: None, the loop will never exit by itself
+        :return: seconds to wait before polling the IP again
         """
-        ok, power = await smartplug.get_power(ip=ip)
+        record = self.registry.by_ip(ip)
+        fast = (
+            record is not None
+            and record.mac is not None
+            and record.sysinfo_time is not None
+            and monotonic() - record.sysinfo_time < config.SP_SYSINFO_INTERVAL
+        )
+        polled = ip if record is not None else metrics.UNKNOWN_IP
+        # the response is parsed by the decode stage of the pipeline
+        if fast:
+            ok, power = await smartplug.get_realtime(ip, pool=self.pool, parse=False)
+        else:
+            ok, power = await smartplug.get_power(ip, pool=self.pool, parse=False)
         if not ok:
-            logger.log_info(f"[SP]\tFailed to get power from {ip}")
-            cached = False
-            for _, cip in self.cached_ips.items():
-                if ip == cip:
-                    cached = True
-                    break
-            if cached:
-                await asyncio.sleep(config.SLEEP_TIME_SHORT)
-            else:
-                # Give less priority to unregistered IPs
-                await asyncio.sleep(config.SLEEP_TIME_LONG)
-            return
-        info = smartplug.extract_info(power)
+            logger.log_info_limited(ip, "[SP]\tFailed to get power from %s", ip)
+            metrics.POLLS.labels(polled, "failure").inc()
+            return self.poll_failed(ip, record)
+        metrics.POLLS.labels(polled, "success").inc()
+        self.alive_ips.add(ip)
+        # waits here if the pipeline is full and blocking
+        await self.pipeline.put(Reading(ip, power, record if fast else None))
+        if ip in self.undecodable_ips:
+            # keeps backing off until a response is decoded
+            return self.backoff.delay(ip)
+        delay = self.backoff.success(ip)
+        if self.sampler is not None:
+            # from the readings decoded so far, not the one just queued
+            delay = self.sampler.interval(ip)
+        return delay
+
+    def poll_failed(self, ip: str, record: Optional[PlugRecord]) -> float:
+        """
+        Register a poll that got no usable response.
+
+        :param ip: polled IP address
+        :param record: record of the plug known at the IP, if any
+        :return: seconds to wait before polling the IP again
+        """
+        self.alive_ips.discard(ip)
+        if self.sampler is not None:
+            self.sampler.forget(ip)
+        if record is not None:
+            record.failures += 1
+            # the plug may have moved, check its MAC on the next poll
+            record.sysinfo_time = None
+        # Give less priority to unregistered IPs
+        return self.backoff.failure(ip, known=record is not None)
+
+    def on_decode_failed(self, reading: "Reading", err: Exception) -> None:
+        """
+        Count a response that could not be decoded, e.g. an error reply, as a
+        failed poll of its IP.
+
+        :param reading: reading with the response of the plug
+        :param err: exception raised decoding it
+        :return: None
+        """
+        logger.log_error_limited(
+            reading.ip, "[SP]\tFailed to decode the response of %s: %r", reading.ip, err
+        )
+        self.undecodable_ips.add(reading.ip)
+        self.poll_failed(reading.ip, self.registry.by_ip(reading.ip))
+
+    def on_reading_failed(self, reading: "Reading", err: Exception) -> None:
+        """
+        Log a reading that could not be formatted or published.
+
+        :param reading: reading of the plug
+        :param err: exception raised handling it
+        :return: None
+        """
+        logger.log_error_limited(
+            reading.ip, "[SP]\tFailed to handle the reading of %s: %r", reading.ip, err
+        )
+
+    def decode_reading(self, reading: "Reading") -> "Reading":
+        """
+        Pipeline stage extracting the measurement from a response and
+        updating the record of the plug.
+
+        :param reading: reading with the response of the plug
+        :return: reading with its info and record
+        """
+        record = reading.record
+        if reading.fast:
+            power = smartplug.parse_power(reading.response)
+            reading.info = {
+                "power": power,
+                "relay_state": record.relay_state,
+                "mac": record.mac,
+            }
+            if power > 0 and not record.relay_state:
+                # the relay was switched on, get its state on the next poll
+                record.sysinfo_time = None
+            elif power == 0 and record.relay_state and record.power:
+                # the relay may have been switched off
+                record.sysinfo_time = None
+        else:
+            reading.info = smartplug.parse_info(reading.response)
+            record = reading.record = self.registry.by_mac(reading.info["mac"])
+        if record is not None:
+            record.last_seen = time()
+            record.power = float(reading.info["power"])
+            record.relay_state = reading.info["relay_state"]
+            record.failures = 0
+        self.undecodable_ips.discard(reading.ip)
+        if self.sampler is not None:
+            self.sampler.update(reading.ip, float(reading.info["power"]))
+        return reading
+
+    def format_reading(self, reading: "Reading") -> "Reading":
+        """
+        Pipeline stage converting a measurement to senml unless the deadband
+        suppresses it.
+
+        :param reading: reading with its info
+        :return: reading with its senml, None if it is not to be published
+        """
+        info = reading.info
         # logger.log_info(f"[SP]\tObtained {info} from {ip}")
-        senml = self.info_to_senml(info)
-        self.pub_to_mqtt(wrap_senml(senml))
-        # Update local and remote (ETCD) IP cache
-        sp_id = self.sp_ids.get(info["mac"])
-        self.cached_ips[sp_id] = ip
-        try:
-            logger.log_info(f"[SP]\tCaching IP {ip} for SP {sp_id}")
-            etcdclient.put_cached_ip(
-                config.ETCD_HOST, config.ETCD_PORT, config.ETCD_CACHE_KEY, sp_id, ip
-            )
-        except Exception as err:
-            logger.log_error(err.__str__())
-        await asyncio.sleep(config.SLEEP_TIME_SHORT)
+        if self.deadband is None or self.deadband.update(
+            info["mac"], float(info["power"]), info["relay_state"]
+        ):
+            metrics.READINGS.labels("published").inc()
+            reading.senml = self.info_to_senml(info)
+        else:
+            metrics.READINGS.labels("suppressed").inc()
+        return reading
+
+    def publish_reading(self, reading: "Reading") -> None:
+        """
+        Pipeline stage publishing a measurement and caching the IP of the
+        plug.
 
-    def start(self, ips: List[str]):
+        :param reading: reading with its senml
+        :return: None
+        """
+        if reading.senml is not None:
+            if self.batcher is not None:
+                self.batcher.add(reading.senml)
+            else:
+                self.pub_to_mqtt(wrap_senml(reading.senml))
+        record, ip = reading.record, reading.ip
+        # Update local IP cache, changes are flushed to ETCD in batches
+        if record is not None and self.cached_ips.set(record.sp_id, ip):
+            logger.log_info("[SP]\tCaching IP %s for SP %s", ip, record.sp_id)
+        if record is not None and not reading.fast:
+            record.sysinfo_time = monotonic()
+
+    async def run_once(self, ip: str) -> None:
+        """
+        1. Request measurement from IP
+        2. Queue the response to be decoded, formatted and published
+        3. Sleep the time returned by poll()
+
+        :param ip: IP address to send requests to
+        :return: None, the loop will never exit by itself
+        """
+        await asyncio.sleep(await self.poll(ip))
+
+    def start(self, ips: Union[TargetSpace, List[str]]):
         """
-        Run a Loop for each ip a SmartPlug might be listening at.
+        Run a Loop for each ip a SmartPlug might be listening at, or poll them
+        all from the Scheduler if it is the configured engine or there are
+        more than GATHERER_LOOP_MAX_TARGETS ips to poll with TCP discovery.
+
+        With UDP discovery only the cached IPs and the IPs of discovered plugs
+        that belong to ips are polled, and ips are swept with unicast requests
+        if no broadcast address is configured. With TCP discovery every ip is
+        polled.
+
+        Cached IPs and IPs that answered before the last stop are polled
+        first, the rest are added at GATHERER_RAMP_RATE IPs per second. If the
+        Gatherer was created from a snapshot, the ID map and IP cache are read
+        from ETCD in the background.
 
-        :param ips: List of potential SmartPlug IP addresses.
+        :param ips: Potential SmartPlug IP addresses.
         :return: this function runs forever
         """
-        loops = []
-        for ip in ips:
-            # create loop for possible smartplug at ip=ip
-            loops.append(loop.Loop(async_func=self.run_once, arguments=(ip,)))
+        if not isinstance(ips, TargetSpace):
+            ips = TargetSpace.from_ips(ips)
+        loops = [
+            loop.Loop(async_func=self.flush_cached_ips, arguments=()),
+            loop.Loop(async_func=self.log_stats, arguments=()),
+        ]
+        if (
+            self.scheduler is None
+            and config.DISCOVERY_MODE != "udp"
+            and len(ips) > config.GATHERER_LOOP_MAX_TARGETS
+        ):
+            # a task per IP does not scale to big ranges
+            logger.log_info(
+                "[SP]\tPolling %d IPs from the scheduler, the loop engine is "
+                "limited to %d",
+                len(ips),
+                config.GATHERER_LOOP_MAX_TARGETS,
+            )
+            self.scheduler = Scheduler(
+                self.poll, config.GATHERER_WORKERS, config.SLEEP_TIME_LONG
+            )
+        if self.scheduler is not None:
+            loops.append(loop.Loop(async_func=self.scheduler.run, arguments=()))
+        if self.batcher is not None:
+            loops.append(loop.Loop(async_func=self.batcher.run_once, arguments=()))
+        if self.pool is not None:
+            loops.append(
+                loop.Loop(async_func=self.evict_idle_connections, arguments=())
+            )
+        if self.spool is not None:
+            loops.append(loop.Loop(async_func=self.replay_spool, arguments=()))
+        if self.snapshot_path is not None:
+            loops.append(loop.Loop(async_func=self.save_snapshot, arguments=()))
+        if config.METRICS_ENABLED:
+            loops.append(
+                loop.Loop(
+                    async_func=metrics.measure_loop_lag,
+                    arguments=(config.METRICS_LAG_INTERVAL,),
+                )
+            )
+        if config.DISCOVERY_MODE == "udp":
+            self.discovery = Discovery(
+                targets=config.DISCOVERY_TARGETS or ips,
+                on_found=self.on_plug_found,
+                timeout=config.DISCOVERY_TIMEOUT,
+                interval=config.DISCOVERY_INTERVAL,
+            )
+            loops.append(loop.Loop(async_func=self.discovery.run_once, arguments=()))
+            self.allowed_ips = ips
+            ips = TargetSpace.from_ips(
+                r.ip for r in self.registry if r.ip in self.allowed_ips
+            )
+        if config.ETCD_WATCH:
+            self.watchers = [
+                KeyWatcher(
+                    config.ETCD_HOST,
+                    config.ETCD_PORT,
+                    config.ETCD_ID_KEY,
+                    on_change=self.on_id_changed,
+                    on_reset=self.on_ids_read,
+                    timeout=config.ETCD_WATCH_TIMEOUT,
+                ),
+                KeyWatcher(
+                    config.ETCD_HOST,
+                    config.ETCD_PORT,
+                    config.ETCD_CACHE_KEY,
+                    on_change=self.cached_ips.apply,
+                    on_reset=self.cached_ips.apply_all,
+                    timeout=config.ETCD_WATCH_TIMEOUT,
+                ),
+            ]
+            for watcher in self.watchers:
+                watcher.start(self.event_loop)
+        elif self.warm:
+            self.etcd_read = self.event_loop.create_task(self.read_etcd())
+        self.stage_loops = [
+            loop.Loop(async_func=stage.run_once, arguments=())
+            for stage in self.pipeline.stages
+        ]
+        for sp_loop in self.stage_loops:
+            sp_loop.start(self.event_loop)
+        known = self.alive_ips.union(self.registry.ips().values())
+        for ip in known:
+            if ip in ips:
+                self.add_target(ip)
+        # generated lazily, not to hold every IP of big ranges at once
+        self.pending_targets = (ip for ip in ips if ip not in known)
+        if config.GATHERER_RAMP_RATE <= 0:
+            for ip in self.pending_targets:
+                self.add_target(ip)
+        else:
+            loops.append(loop.Loop(async_func=self.ramp_targets, arguments=()))
         for sp_loop in loops:
             sp_loop.start(self.event_loop)
+        self.loops.extend(loops)
+
+    async def ramp_targets(self) -> None:
+        """
+        Add the pending IPs to the targets, GATHERER_RAMP_RATE per second.
+
+        :return: None
+        """
+        added = 0
+        for ip in islice(self.pending_targets, config.GATHERER_RAMP_RATE):
+            self.add_target(ip)
+            added += 1
+        # sleep long once every IP was added
+        await asyncio.sleep(1 if added else 3600)
+
+    async def read_etcd(self) -> None:
+        """
+        Replace the ID map and IP cache loaded from the snapshot with the ones
+        in ETCD.
+
+        :return: None
+        """
+        try:
+            ids = await etcdclient.get_smartplug_ids_async(
+                config.ETCD_HOST, config.ETCD_PORT, config.ETCD_ID_KEY
+            )
+            ips = await etcdclient.get_cached_ips_async(
+                config.ETCD_HOST, config.ETCD_PORT, config.ETCD_CACHE_KEY
+            )
+        except Exception as err:
+            logger.log_error("[ETCD]\tKeeping the snapshot: %s", err)
+            return
+        self.on_ids_read(ids)
+        self.cached_ips.apply_all(ips)
+
+    def take_snapshot(self) -> snapshot.Snapshot:
+        """
+        :return: snapshot of the ID map, IP cache and answering IPs
+        """
+        return snapshot.Snapshot(
+            self.registry.ids(), self.registry.ips(), sorted(self.alive_ips)
+        )
+
+    async def save_snapshot(self) -> None:
+        """
+        Periodically write a snapshot to load on the next start.
+
+        :return: None
+        """
+        await asyncio.sleep(config.SNAPSHOT_INTERVAL)
+        self.snapshot_save = self.event_loop.run_in_executor(
+            None, snapshot.save, self.snapshot_path, self.take_snapshot()
+        )
+        # the thread cannot be cancelled, stop() waits for it instead
+        await asyncio.shield(self.snapshot_save)
+
+    def add_target(self, ip: str) -> None:
+        """
+        Start polling an IP unless it is already being polled.
+
+        :param ip: IP address a SmartPlug might be listening at
+        :return: None
+        """
+        if self.scheduler is not None:
+            self.scheduler.add(ip)
+            return
+        if ip in self.targets:
+            return
+        # create loop for possible smartplug at ip=ip
+        sp_loop = loop.Loop(async_func=self.run_once, arguments=(ip,))
+        sp_loop.start(self.event_loop)
+        self.targets[ip] = sp_loop
+
+    def remove_target(self, ip: str) -> None:
+        """
+        Stop polling an IP.
+
+        :param ip: IP address being polled
+        :return: None
+        """
+        if self.sampler is not None:
+            self.sampler.forget(ip)
+        if self.scheduler is not None:
+            self.scheduler.remove(ip)
+            return
+        sp_loop = self.targets.pop(ip, None)
+        if sp_loop is not None:
+            self.event_loop.create_task(sp_loop.stop())
+
+    def on_plug_found(self, mac: str, ip: str) -> None:
+        """
+        Poll a plug found by the discovery, and stop polling its previous IP.
+
+        :param mac: MAC address of the plug
+        :param ip: IP address the plug replied from
+        :return: None
+        """
+        if ip not in self.allowed_ips:
+            # outside the range, or polled by another worker process
+            return
+        record = self.registry.by_mac(mac)
+        if record is not None and record.ip is not None and record.ip != ip:
+            self.remove_target(record.ip)
+        self.add_target(ip)
+
+    def on_id_changed(self, mac: str, sp_id: Optional[str]) -> None:
+        """
+        Apply a change of the ID map made in ETCD.
+
+        :param mac: MAC address of the plug
+        :param sp_id: new ID of the plug, None if it was removed
+        :return: None
+        """
+        if not self.registry.set_mac(mac, sp_id):
+            return
+        if sp_id is None:
+            logger.log_info("[SP]\tUnregistered SP with MAC '%s'", mac)
+        else:
+            logger.log_info("[SP]\tRegistered SP %s with MAC '%s'", sp_id, mac)
+
+    def on_ids_read(self, ids: Dict[str, str]) -> None:
+        """
+        Replace the ID map with the one read from ETCD, in place.
+
+        :param ids: dictionary with SP MACs as keys and IDs as values
+        :return: None
+        """
+        for mac in [mac for mac in self.registry.ids() if mac not in ids]:
+            self.on_id_changed(mac, None)
+        for mac, sp_id in ids.items():
+            self.on_id_changed(mac, sp_id)
+
+    async def stop(self) -> None:
+        """
+        Stop every Loop, publish the readings left in the pipeline, flush
+        pending IP cache changes and disconnect.
+
+        :return: None
+        """
+        for watcher in self.watchers:
+            watcher.stop()
+        for sp_loop in [*self.targets.values(), *self.loops]:
+            await sp_loop.stop()
+        self.targets.clear()
+        self.loops.clear()
+        self.pending_targets = iter(())
+        if self.etcd_read is not None:
+            self.etcd_read.cancel()
+        if self.stage_loops and not await self.pipeline.drain(
+            config.PIPELINE_DRAIN_TIMEOUT
+        ):
+            logger.log_error(
+                "[SP]\tReadings left in the pipeline: %s", self.pipeline.depths()
+            )
+        for sp_loop in self.stage_loops:
+            await sp_loop.stop()
+        self.stage_loops.clear()
+        if self.batcher is not None:
+            self.batcher.flush()
+        await self.cached_ips.flush()
+        if self.pool is not None:
+            self.pool.close()
+        if self.spool is not None:
+            self.spool.close()
+        capture.stop()
+        if self.snapshot_save is not None:
+            # an older snapshot must not replace the final one
+            await asyncio.wait([self.snapshot_save])
+        if self.snapshot_path is not None:
+            try:
+                snapshot.save(self.snapshot_path, self.take_snapshot())
+            except OSError as err:
+                logger.log_error("[SP]\tFailed to save the snapshot: %s", err)
+        await self.disconnect()
+
+    async def flush_cached_ips(self) -> None:
+        """
+        Periodically write the changed ID->IP associations to ETCD.
+
+        :return: None
+        """
+        await asyncio.sleep(config.ETCD_FLUSH_INTERVAL)
+        await self.cached_ips.flush()
+
+    async def log_stats(self) -> None:
+        """
+        Periodically log how polls are backing off, how fast answering plugs
+        are sampled, how many readings the deadband suppressed and how full
+        the pipeline is.
+
+        :return: None
+        """
+        await asyncio.sleep(config.STATS_INTERVAL)
+        # the statistics go over every backing-off IP and sampled plug
+        if not logger.verbose:
+            return
+        logger.log_info_verbose(
+            "[SP]\tBacking off %d IPs %s, saving %.2f polls/s",
+            len(self.backoff),
+            self.backoff.distribution(),
+            self.backoff.saved_probe_rate(),
+        )
+        if self.sampler is not None:
+            logger.log_info_verbose(
+                "[SP]\tSampling %d plugs at %.2f polls/s, "
+                "intervals stretched x%.2f by the budget",
+                len(self.sampler),
+                self.sampler.planned_rate(),
+                self.sampler.stretch(),
+            )
+        if self.deadband is not None:
+            logger.log_info_verbose(
+                "[SP]\tDeadband published %d readings, suppressed %d",
+                self.deadband.published,
+                self.deadband.suppressed,
+            )
+        logger.log_info_verbose(
+            "[SP]\tPipeline queues %s, dropped %s",
+            self.pipeline.depths(),
+            self.pipeline.dropped(),
+        )
+
+    async def evict_idle_connections(self) -> None:
+        """
+        Close pooled connections that have been idle for too long and log the
+        statistics of the pool.
+
+        :return: None
+        """
+        await asyncio.sleep(config.SP_IDLE_TIMEOUT)
+        self.pool.evict_idle()
+        if logger.verbose:
+            logger.log_info_verbose(
+                "[SP]\tConnection pool: %s", self.pool.stats.as_dict()
+            )
 
     def info_to_senml(self, info: dict) -> List[dict]:
         """
@@ -146,10 +843,13 @@ class Gatherer(MQTTClient):
                 logger.log_error("[SP]\tMissing field in info dictionary")
                 return [{}]
         mac = info["mac"]
-        base_name = self.sp_ids.get(mac)
-        if base_name is None:
-            logger.log_error(f"[SP]\tNo ID found for SmartPlug with MAC '{mac}'.")
+        record = self.registry.by_mac(mac)
+        if record is None:
+            logger.log_error_limited(
+                mac, "[SP]\tNo ID found for SmartPlug with MAC '%s'.", mac
+            )
             return [{}]
+        base_name = record.sp_id
         return [
             {
                 "bn": f"{base_name}/{protocol.MEASUREMENT}",
@@ -176,12 +876,42 @@ def wrap_senml(senml):
     return {protocol.PAYLOAD_DATA_FIELD: senml}
 
 
-def create_gatherer(event_loop: asyncio.AbstractEventLoop) -> Gatherer:
+def snapshot_path(client_id: str) -> str:
+    """
+    :param client_id: MQTT client ID of the Gatherer
+    :return: path of the snapshot of the Gatherer
+    """
+    return os.path.join(config.SNAPSHOT_DIRECTORY, f"{client_id}.json")
+
+
+def create_gatherer(
+    event_loop: asyncio.AbstractEventLoop, client_id: str = "Gatherer"
+) -> Gatherer:
+    if config.SNAPSHOT_ENABLED:
+        # Start from the last snapshot, ETCD is read once started
+        path = snapshot_path(client_id)
+        warm = snapshot.load(path)
+        if warm is not None:
+            logger.log_info(
+                "Loaded %d IDs, %d IPs and %d answering IPs from %s",
+                len(warm.ids),
+                len(warm.ips),
+                len(warm.alive),
+                path,
+            )
+            return Gatherer(
+                event_loop,
+                client_id,
+                smartplug_ids=warm.ids,
+                cached_ips=warm.ips,
+                alive_ips=warm.alive,
+            )
+
     # Load smartplug IDs
     ids = etcdclient.get_smartplug_ids(
         config.ETCD_HOST, config.ETCD_PORT, config.ETCD_ID_KEY
     )
-    logger.log_info(f"IDs: [{ids}]")
+    logger.log_info("IDs: [%s]", ids)
 
     # Create gatherer
-    return Gatherer(event_loop=event_loop, smartplug_ids=ids)
+    return Gatherer(event_loop, client_id, smartplug_ids=ids)
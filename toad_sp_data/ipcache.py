@@ -0,0 +1,151 @@
+"""Write-behind cache of the ID->IP associations stored in ETCD."""
+import asyncio
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from toad_sp_data import etcdclient, logger
+from toad_sp_data.registry import Registry
+
+
+class IPCache:
+    """Local copy of the ETCD IP cache, kept in the records of a Registry.
+
+    Only associations that actually change are marked dirty, and dirty
+    entries are written to ETCD in batches by flush(). Changes made to ETCD
+    by others are applied with apply() and apply_all() and are not written
+    back.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        key: str,
+        ips: Dict[str, str] = None,
+        registry: Registry = None,
+    ):
+        """
+        Constructor for IPCache.
+
+        :param host: ETCD host
+        :param port: ETCD port
+        :param key: parent key of all the cached ID->IP association
+        :param ips: dict with smartplug IDs as keys and IPs as values
+        :param registry: registry holding the associations, a new one if None
+        """
+        self.host = host
+        self.port = port
+        self.key = key
+        self.registry = Registry() if registry is None else registry
+        for sp_id, ip in (ips or {}).items():
+            self.registry.set_ip(sp_id, ip)
+        self._dirty: Dict[str, str] = {}
+        # writes skipped because the association did not change
+        self.suppressed = 0
+        # writes sent to ETCD
+        self.flushed = 0
+        # writes that failed and were kept dirty
+        self.failed = 0
+
+    def __contains__(self, sp_id: str) -> bool:
+        return self.get(sp_id) is not None
+
+    def __iter__(self) -> Iterator[str]:
+        return (sp_id for sp_id, _ in self.items())
+
+    def __len__(self) -> int:
+        return len(self.items())
+
+    def get(self, sp_id: str, default: str = None) -> str:
+        record = self.registry.get(sp_id)
+        if record is None or record.ip is None:
+            return default
+        return record.ip
+
+    def items(self) -> List[Tuple[str, str]]:
+        return list(self.registry.ips().items())
+
+    @property
+    def dirty(self) -> int:
+        """Number of associations waiting to be flushed."""
+        return len(self._dirty)
+
+    def set(self, sp_id: str, ip: str) -> bool:
+        """
+        Associate an IP to a smartplug ID.
+
+        :param sp_id: ID of the smartplug
+        :param ip: IP of the smartplug
+        :return: True if the association changed and will be flushed
+        """
+        if not self.registry.set_ip(sp_id, ip):
+            self.suppressed += 1
+            return False
+        self._dirty[sp_id] = ip
+        return True
+
+    def apply(self, sp_id: str, ip: Optional[str]) -> bool:
+        """
+        Apply an association changed in ETCD, without marking it dirty.
+
+        Associations waiting to be flushed are newer and are kept.
+
+        :param sp_id: ID of the smartplug
+        :param ip: IP of the smartplug, None if the association was removed
+        :return: True if the local association changed
+        """
+        if sp_id in self._dirty:
+            return False
+        return self.registry.set_ip(sp_id, ip)
+
+    def apply_all(self, ips: Dict[str, str]) -> None:
+        """
+        Replace the associations with the ones read from ETCD, keeping the
+        ones waiting to be flushed.
+
+        :param ips: dict with smartplug IDs as keys and IPs as values
+        :return: None
+        """
+        for sp_id in [sp_id for sp_id in self if sp_id not in ips]:
+            self.apply(sp_id, None)
+        for sp_id, ip in ips.items():
+            self.apply(sp_id, ip)
+
+    async def flush(self) -> int:
+        """
+        Write every dirty association to ETCD concurrently.
+
+        Failed writes stay dirty unless the association changed meanwhile, and
+        so does the whole batch if the flush is cancelled, e.g. on stop.
+
+        :return: number of associations written
+        """
+        if not self._dirty:
+            return 0
+        batch, self._dirty = self._dirty, {}
+        try:
+            results = await asyncio.gather(
+                *(
+                    etcdclient.put_cached_ip_async(
+                        self.host, self.port, self.key, sp_id, ip
+                    )
+                    for sp_id, ip in batch.items()
+                ),
+                return_exceptions=True,
+            )
+        except asyncio.CancelledError:
+            for sp_id, ip in batch.items():
+                self._dirty.setdefault(sp_id, ip)
+            raise
+        written = 0
+        for (sp_id, ip), result in zip(batch.items(), results):
+            if isinstance(result, Exception):
+                logger.log_error("[SP]\tFailed to cache IP %s for SP %s", ip, sp_id)
+                self.failed += 1
+                self._dirty.setdefault(sp_id, ip)
+            else:
+                written += 1
+        self.flushed += written
+        logger.log_info_verbose(
+            "[SP]\tFlushed %d cached IPs (%d suppressed)", written, self.suppressed
+        )
+        return written
@@ -1,31 +1,118 @@
+"""Logging helpers.
+
+Messages may be %-style format strings followed by their arguments, which
+are only formatted when the record is emitted. Records are emitted by a
+background thread so the event loop never blocks writing them.
+"""
+import atexit
 import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+from time import monotonic
+from typing import Any, Dict, Hashable, Tuple
 
-from toad_sp_data.config import LOGGER_VERBOSE
+from toad_sp_data.config import LOGGER_RATE_LIMIT, LOGGER_VERBOSE
 
 verbose = LOGGER_VERBOSE
+# seconds between records logged with the same key by the *_limited functions
+rate_limit = LOGGER_RATE_LIMIT
+
+
+class _LazyQueueHandler(QueueHandler):
+    """QueueHandler that leaves the formatting to the listener thread."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
 
-# configure logger
-logging.basicConfig(
-    format="%(asctime)s - %(name)s - %(message)s",
-    datefmt="%Y-%m-%dT%H:%M:%SZ",
-    level=logging.INFO,
-)
+def _configure() -> QueueListener:
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(
+        logging.Formatter(
+            "%(asctime)s - %(name)s - %(message)s", datefmt="%Y-%m-%dT%H:%M:%SZ"
+        )
+    )
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    logging.basicConfig(handlers=[_LazyQueueHandler(records)], level=logging.INFO)
+    queue_listener = QueueListener(records, stream_handler)
+    queue_listener.start()
+    # write the pending records before exiting
+    atexit.register(queue_listener.stop)
+    return queue_listener
+
+
+listener = _configure()
 logger = logging.getLogger(__name__)
 
+# key -> (time the last record was logged, records suppressed since then)
+_limited: Dict[Hashable, Tuple[float, int]] = {}
+
 
-def log_info(msg):  # pragma: no cover
-    logger.info(msg)
+def log_info(msg, *args):  # pragma: no cover
+    logger.info(msg, *args)
 
 
-def log_error(msg):  # pragma: no cover
-    logger.error(msg)
+def log_error(msg, *args):  # pragma: no cover
+    logger.error(msg, *args)
 
 
-def log_info_verbose(msg):  # pragma: no cover
+def log_info_verbose(msg, *args):  # pragma: no cover
     if verbose:
-        logger.info(msg)
+        logger.info(msg, *args)
 
 
-def log_error_verbose(msg):  # pragma: no cover
+def log_error_verbose(msg, *args):  # pragma: no cover
     if verbose:
-        logger.error(msg)
+        logger.error(msg, *args)
+
+
+def _allow(key: Hashable) -> int:
+    """
+    Check whether a record with a key may be logged now.
+
+    :param key: key of similar records, e.g. the message and IP
+    :return: -1 if it may not, otherwise the similar records suppressed
+    """
+    now = monotonic()
+    last, suppressed = _limited.get(key, (None, 0))
+    if last is not None and now - last < rate_limit:
+        _limited[key] = (last, suppressed + 1)
+        return -1
+    _limited[key] = (now, 0)
+    return suppressed
+
+
+def _log_limited(level: int, key: Hashable, msg: str, args: Tuple[Any, ...]) -> None:
+    if not logger.isEnabledFor(level):
+        return
+    suppressed = _allow(key)
+    if suppressed < 0:
+        return
+    if suppressed:
+        msg += " (%d similar suppressed)"
+        args += (suppressed,)
+    logger.log(level, msg, *args)
+
+
+def log_info_limited(key: Hashable, msg, *args):
+    """
+    Log a repetitive message at most once every rate_limit seconds per key.
+
+    :param key: key of similar records, e.g. the IP the message is about
+    :param msg: message or format string
+    :param args: arguments of the format string
+    :return: None
+    """
+    _log_limited(logging.INFO, key, msg, args)
+
+
+def log_error_limited(key: Hashable, msg, *args):
+    """
+    Log a repetitive error at most once every rate_limit seconds per key.
+
+    :param key: key of similar records, e.g. the IP the message is about
+    :param msg: message or format string
+    :param args: arguments of the format string
+    :return: None
+    """
+    _log_limited(logging.ERROR, key, msg, args)
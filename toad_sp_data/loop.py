@@ -27,10 +27,12 @@ class Loop:
                 try:
                     await async_func(*args)
                 except asyncio.CancelledError:
-                    logger.log_error_verbose(f"[SP]\tRoutine {async_func} canceled")
+                    logger.log_error_verbose("[SP]\tRoutine %s canceled", async_func)
                     return
                 except Exception as e:
-                    logger.log_error_verbose(f"[SP]\tRoutine {async_func} failed: {e}")
+                    logger.log_error_verbose(
+                        "[SP]\tRoutine %s failed: %s", async_func, e
+                    )
                     raise e
 
         self.func = func
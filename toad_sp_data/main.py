@@ -1,24 +1,71 @@
 #!/usr/bin/env python3
 
 import asyncio
+import signal
+from typing import Optional
 
-from toad_sp_data import config, gatherer, logger, utils
+from toad_sp_data import config, etcdclient, gatherer, logger, metrics
+from toad_sp_data.supervisor import IPs, Supervisor
+from toad_sp_data.targets import TargetSpace
 
-if __name__ == "__main__":
 
-    # Load range of IPs to query
-    ips = utils.ip_range(config.WS_IP_RANGE_START, config.WS_IP_RANGE_END)
-    logger.log_info(f"IPs: {', '.join(ips)}")
+def run(ips: IPs, worker: Optional[int] = None) -> None:
+    """
+    Run a Gatherer polling ips until SIGTERM or SIGINT.
+
+    :param ips: Potential SmartPlug IP addresses.
+    :param worker: slot of the worker process when run by the Supervisor
+    :return: None
+    """
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
 
-    loop = asyncio.get_event_loop()
+    client_id = "Gatherer" if worker is None else f"Gatherer-{worker}"
+    g = gatherer.create_gatherer(loop, client_id)
 
-    g = gatherer.create_gatherer(loop)
+    metrics_server = None
+    if config.METRICS_ENABLED:
+        port = config.METRICS_PORT + (worker or 0)
+        metrics_server = loop.run_until_complete(
+            metrics.start_server(config.METRICS_HOST, port)
+        )
 
     # Connect to MQTT broker
-    asyncio.get_event_loop().run_until_complete(
+    loop.run_until_complete(
         g.connect(host=config.MQTT_BROKER_HOST, port=config.MQTT_BROKER_PORT)
     )
 
     # Start Query Loops
     g.start(ips)
-    asyncio.get_event_loop().run_forever()
+    loop.add_signal_handler(signal.SIGTERM, loop.stop)
+    try:
+        loop.run_forever()
+    except KeyboardInterrupt:
+        pass
+    # Flush pending changes before exiting
+    loop.run_until_complete(g.stop())
+    if metrics_server is not None:
+        metrics_server.close()
+    etcdclient.shutdown()
+
+
+if __name__ == "__main__":
+
+    # Load range of IPs to query
+    ips = TargetSpace.parse(
+        config.WS_TARGETS or [f"{config.WS_IP_RANGE_START}-{config.WS_IP_RANGE_END}"],
+        config.WS_EXCLUDE,
+    )
+    logger.log_info("IPs: %d in %s", len(ips), ips)
+
+    if config.SUPERVISOR_WORKERS > 1:
+        # Split the IPs across several processes
+        Supervisor(
+            target=run,
+            ips=ips,
+            workers=config.SUPERVISOR_WORKERS,
+            max_restarts=config.SUPERVISOR_MAX_RESTARTS,
+            restart_window=config.SUPERVISOR_RESTART_WINDOW,
+        ).run()
+    else:
+        run(ips)
@@ -0,0 +1,354 @@
+"""Metrics of the collector internals, served over HTTP in the Prometheus
+text format."""
+import abc
+import asyncio
+from bisect import bisect_left
+from typing import Callable, Dict, List, Sequence, Tuple, TypeVar
+
+from toad_sp_data import logger
+
+LATENCY_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    escaped = (
+        str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        for v in values
+    )
+    return "{" + ",".join(f'{n}="{v}"' for n, v in zip(names, escaped)) + "}"
+
+
+class _CounterChild:
+    __slots__ = ("value", "function")
+
+    def __init__(self):
+        self.value = 0.0
+        self.function: Callable[[], float] = None
+
+    def inc(self, amount: float = 1) -> None:
+        self.value += amount
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        """Read the total from function, for counts kept elsewhere."""
+        self.function = function
+
+    def get(self) -> float:
+        return self.function() if self.function is not None else self.value
+
+
+class _GaugeChild:
+    __slots__ = ("value", "function")
+
+    def __init__(self):
+        self.value = 0.0
+        self.function: Callable[[], float] = None
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def inc(self, amount: float = 1) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1) -> None:
+        self.value -= amount
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        """Compute the value with function every time the gauge is read."""
+        self.function = function
+
+    def get(self) -> float:
+        return self.function() if self.function is not None else self.value
+
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        # one count per bucket plus +Inf, not cumulative
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metric(abc.ABC):
+    """Base class of the metric families, children are created on demand for
+    every combination of label values."""
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._children: Dict[Tuple[str, ...], object] = {}
+
+    @abc.abstractmethod
+    def _new_child(self):
+        """Create the child for a new combination of label values."""
+
+    def labels(self, *values: str):
+        """
+        Get the child for a combination of label values.
+
+        :param values: one value per label name
+        :return: child metric
+        """
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.label_names):
+                raise ValueError(f"{self.name} expects labels {self.label_names}")
+            child = self._children[values] = self._new_child()
+        return child
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        for values, child in list(self._children.items()):
+            lines.extend(self._render_child(values, child))
+        return lines
+
+    @abc.abstractmethod
+    def _render_child(self, values, child) -> List[str]:
+        """Render the samples of a child."""
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def _new_child(self) -> _CounterChild:
+        return _CounterChild()
+
+    def inc(self, amount: float = 1) -> None:
+        self.labels().inc(amount)
+
+    def _render_child(self, values, child) -> List[str]:
+        labels = _format_labels(self.label_names, values)
+        return [f"{self.name}_total{labels} {child.get()}"]
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def _new_child(self) -> _GaugeChild:
+        return _GaugeChild()
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        self.labels().set_function(function)
+
+    def _render_child(self, values, child) -> List[str]:
+        labels = _format_labels(self.label_names, values)
+        return [f"{self.name}{labels} {child.get()}"]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def _render_child(self, values, child) -> List[str]:
+        names = self.label_names + ("le",)
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), child.counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            labels = _format_labels(names, values + (le,))
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.label_names, values)
+        lines.append(f"{self.name}_sum{labels} {child.sum}")
+        lines.append(f"{self.name}_count{labels} {child.count}")
+        return lines
+
+
+M = TypeVar("M", bound=Metric)
+
+
+class Registry:
+    """Collection of metrics rendered together."""
+
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: M) -> M:
+        self.metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """
+        Render every metric in the Prometheus text format.
+
+        :return: exposition text
+        """
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+POLL_STAGE_SECONDS = REGISTRY.register(
+    Histogram(
+        "toad_sp_poll_stage_seconds",
+        "Time spent in each stage of a poll",
+        labels=("stage",),
+    )
+)
+# IPs without a known plug share one series, not to keep one per address probed
+UNKNOWN_IP = "unknown"
+POLLS = REGISTRY.register(
+    Counter(
+        "toad_sp_polls",
+        f"Polls by IP of known plugs ('{UNKNOWN_IP}' for the rest) and result",
+        labels=("ip", "result"),
+    )
+)
+READINGS = REGISTRY.register(
+    Counter(
+        "toad_sp_readings",
+        "Readings published or suppressed by the deadband",
+        labels=("result",),
+    )
+)
+ETCD_SECONDS = REGISTRY.register(
+    Histogram(
+        "toad_sp_etcd_seconds", "Latency of ETCD operations", labels=("operation",)
+    )
+)
+MQTT_PENDING_RECORDS = REGISTRY.register(
+    Gauge("toad_sp_mqtt_pending_records", "SenML records waiting to be published")
+)
+MQTT_WRITE_BUFFER_BYTES = REGISTRY.register(
+    Gauge(
+        "toad_sp_mqtt_write_buffer_bytes",
+        "Bytes published but not yet written to the MQTT connection",
+    )
+)
+PIPELINE_QUEUE_DEPTH = REGISTRY.register(
+    Gauge(
+        "toad_sp_pipeline_queue_depth",
+        "Items waiting for a pipeline stage",
+        labels=("stage",),
+    )
+)
+PIPELINE_DROPPED = REGISTRY.register(
+    Counter(
+        "toad_sp_pipeline_dropped",
+        "Items dropped because the queue of a pipeline stage was full",
+        labels=("stage",),
+    )
+)
+SAMPLER_POLL_RATE = REGISTRY.register(
+    Gauge(
+        "toad_sp_sampler_poll_rate",
+        "Polls per second planned for the answering plugs by the sampler",
+    )
+)
+SPOOL_MESSAGES = REGISTRY.register(
+    Gauge("toad_sp_spool_messages", "Messages spooled while the broker is unreachable")
+)
+EVENT_LOOP_LAG_SECONDS = REGISTRY.register(
+    Histogram(
+        "toad_sp_event_loop_lag_seconds",
+        "Delay of the event loop in waking up a sleeping task",
+    )
+)
+
+
+async def measure_loop_lag(interval: float) -> None:
+    """
+    Sleep {interval} seconds and record how late the event loop woke up, to
+    be run in a Loop.
+
+    :param interval: seconds to sleep
+    :return: None
+    """
+    event_loop = asyncio.get_event_loop()
+    expected = event_loop.time() + interval
+    await asyncio.sleep(interval)
+    EVENT_LOOP_LAG_SECONDS.observe(max(0.0, event_loop.time() - expected))
+
+
+async def _handle_request(
+    reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+) -> None:
+    try:
+        request = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), 5)
+    except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+        writer.close()
+        return
+    except asyncio.LimitOverrunError:
+        request = b""
+    parts = request.split(b" ", 2)
+    if len(parts) > 1 and parts[0] == b"GET" and parts[1] in (b"/metrics", b"/"):
+        body = REGISTRY.render().encode("utf-8")
+        status = "200 OK"
+        content_type = "text/plain; version=0.0.4; charset=utf-8"
+    else:
+        body = b"Not Found\n"
+        status = "404 Not Found"
+        content_type = "text/plain; charset=utf-8"
+    writer.write(
+        f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+        f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("ascii")
+        + body
+    )
+    try:
+        await writer.drain()
+    except ConnectionError:
+        pass
+    writer.close()
+
+
+async def start_server(host: str, port: int) -> asyncio.AbstractServer:
+    """
+    Serve the metrics at http://{host}:{port}/metrics.
+
+    :param host: address to listen at
+    :param port: port to listen at
+    :return: the running server
+    """
+    server = await asyncio.start_server(_handle_request, host, port)
+    logger.log_info("Serving metrics at http://%s:%s/metrics", host, port)
+    return server
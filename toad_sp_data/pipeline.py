@@ -0,0 +1,179 @@
+"""Stages connected by bounded queues, so that a slow stage applies
+backpressure on the previous ones or drops items instead of growing without
+bound."""
+import asyncio
+from typing import Any, Callable, Dict, List, Optional
+
+from toad_sp_data import logger
+
+POLICIES = ("block", "drop-oldest", "drop-newest")
+
+
+class PipelineException(Exception):
+    pass
+
+
+class BoundedQueue(asyncio.Queue):
+    """asyncio.Queue with a policy for items put while it is full.
+
+    block: put() waits until there is room.
+    drop-oldest: the oldest item is dropped to make room.
+    drop-newest: the item put is dropped.
+    """
+
+    def __init__(self, maxsize: int, policy: str = "block"):
+        if policy not in POLICIES:
+            raise PipelineException(f"Unknown overflow policy '{policy}'")
+        if maxsize <= 0:
+            raise PipelineException("Queues of a pipeline must be bounded")
+        super().__init__(maxsize)
+        self.policy = policy
+        # items dropped because the queue was full
+        self.dropped = 0
+
+    async def put(self, item: Any) -> None:
+        if self.policy == "block":
+            await super().put(item)
+        else:
+            self.offer(item)
+
+    def offer(self, item: Any) -> bool:
+        """
+        Put an item without waiting, dropping an item if the queue is full.
+
+        :param item: item to put
+        :return: False if the item itself was dropped
+        """
+        if self.full():
+            self.dropped += 1
+            if self.policy != "drop-oldest":
+                return False
+            self.get_nowait()
+        self.put_nowait(item)
+        return True
+
+
+class Stage:
+    """A step of a pipeline: takes items from its queue, handles them and
+    puts the results in the queue of the next stage."""
+
+    def __init__(
+        self,
+        name: str,
+        handler: Callable[[Any], Any],
+        queue: BoundedQueue,
+        on_error: Optional[Callable[[Any, Exception], None]] = None,
+    ):
+        """
+        Constructor for Stage.
+
+        :param name: name of the stage
+        :param handler: function or coroutine function called with every
+            item, returning the item for the next stage or None to stop it
+        :param queue: queue of the items waiting for this stage
+        :param on_error: called with the item and the exception when handler
+            fails, the error is logged if None
+        """
+        self.name = name
+        self.handler = handler
+        self.queue = queue
+        self.on_error = on_error
+        self.next: Optional[Stage] = None
+        self.processed = 0
+        self.failed = 0
+        # an item was taken from the queue and is not done yet
+        self.busy = False
+
+    async def run_once(self) -> None:
+        """
+        Handle the next item, to be run in a Loop.
+
+        :return: None
+        """
+        item = await self.queue.get()
+        self.busy = True
+        try:
+            result = self.handler(item)
+            if asyncio.iscoroutine(result):
+                result = await result
+            self.processed += 1
+            if result is not None and self.next is not None:
+                await self.next.queue.put(result)
+        except Exception as err:
+            self.failed += 1
+            if self.on_error is not None:
+                self.on_error(item, err)
+            else:
+                logger.log_error_limited(
+                    self.name, "[SP]\tStage %s failed: %r", self.name, err
+                )
+        finally:
+            self.busy = False
+
+
+class Pipeline:
+    """Stages run one after another, each with its own bounded queue."""
+
+    def __init__(self):
+        self.stages: List[Stage] = []
+
+    def add_stage(
+        self,
+        name: str,
+        handler: Callable[[Any], Any],
+        capacity: int,
+        policy: str = "block",
+        on_error: Optional[Callable[[Any, Exception], None]] = None,
+    ) -> Stage:
+        """
+        Append a stage to the pipeline.
+
+        :param name: name of the stage
+        :param handler: function or coroutine function handling every item
+        :param capacity: items that may wait for the stage
+        :param policy: what to do when the queue is full, one of POLICIES
+        :param on_error: called with the item and the exception when handler
+            fails, see Stage
+        :return: the new stage
+        """
+        stage = Stage(name, handler, BoundedQueue(capacity, policy), on_error)
+        if self.stages:
+            self.stages[-1].next = stage
+        self.stages.append(stage)
+        return stage
+
+    async def put(self, item: Any) -> None:
+        """
+        Feed an item to the first stage, applying its overflow policy.
+
+        :param item: item to handle
+        :return: None
+        """
+        await self.stages[0].queue.put(item)
+
+    def depths(self) -> Dict[str, int]:
+        """
+        :return: dict with stage names as keys and waiting items as values
+        """
+        return {stage.name: stage.queue.qsize() for stage in self.stages}
+
+    def dropped(self) -> Dict[str, int]:
+        """
+        :return: dict with stage names as keys and dropped items as values
+        """
+        return {stage.name: stage.queue.dropped for stage in self.stages}
+
+    async def drain(self, timeout: float) -> bool:
+        """
+        Wait for every queue to be empty while the stages keep running.
+
+        :param timeout: maximum seconds to wait
+        :return: True if the queues were emptied
+        """
+        event_loop = asyncio.get_event_loop()
+        deadline = event_loop.time() + timeout
+        while any(stage.busy or stage.queue.qsize() for stage in self.stages):
+            if event_loop.time() >= deadline:
+                return False
+            await asyncio.sleep(0.01)
+        return True
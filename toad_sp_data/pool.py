@@ -0,0 +1,186 @@
+"""Persistent TCP connections to SmartPlugs, kept alive between polls where
+the firmware allows it."""
+import asyncio
+from time import monotonic
+from typing import Dict, Set, Tuple
+
+from toad_sp_data import logger
+
+
+class Connection:
+    """An open connection to a SmartPlug."""
+
+    __slots__ = ("ip", "port", "reader", "writer", "last_used", "uses")
+
+    def __init__(
+        self,
+        ip: str,
+        port: int,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+    ):
+        self.ip = ip
+        self.port = port
+        self.reader = reader
+        self.writer = writer
+        self.last_used = monotonic()
+        # number of responses read through this connection
+        self.uses = 0
+
+    @classmethod
+    async def open(cls, ip: str, port: int, timeout: float) -> "Connection":
+        """
+        Open a new connection to a SmartPlug.
+
+        :param ip: IP address of target SP
+        :param port: port of target SP
+        :param timeout: seconds to wait for the connection to be opened
+        :return: the new connection
+        """
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(ip, port), timeout
+        )
+        return cls(ip, port, reader, writer)
+
+    def closed(self) -> bool:
+        """
+        Check whether either side has closed the connection.
+
+        :return: True if the connection can not be used anymore
+        """
+        return self.reader.at_eof() or self.writer.is_closing()
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+class PoolStats:
+    """Counters of a ConnectionPool."""
+
+    __slots__ = ("hits", "misses", "reconnects", "idle_evictions", "server_closes")
+
+    def __init__(self):
+        # requests served by an idle pooled connection
+        self.hits = 0
+        # requests that had to open a new connection
+        self.misses = 0
+        # pooled connections dropped by the SP and retried on a new one
+        self.reconnects = 0
+        # idle connections closed after the idle timeout
+        self.idle_evictions = 0
+        # pooled connections found closed by the SP
+        self.server_closes = 0
+
+    def as_dict(self) -> Dict[str, int]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class ConnectionPool:
+    """Keeps at most one idle connection per SmartPlug address.
+
+    SmartPlugs whose firmware closes the connection after the first
+    response are remembered and served with one connection per request.
+    """
+
+    def __init__(self, idle_timeout: float):
+        """
+        Constructor for ConnectionPool.
+
+        :param idle_timeout: seconds an idle connection is kept open
+        """
+        self.idle_timeout = idle_timeout
+        self.stats = PoolStats()
+        self._idle: Dict[Tuple[str, int], Connection] = {}
+        # addresses whose firmware does not keep connections alive
+        self._no_keep_alive: Set[Tuple[str, int]] = set()
+
+    def __len__(self) -> int:
+        return len(self._idle)
+
+    async def acquire(self, ip: str, port: int, timeout: float) -> Connection:
+        """
+        Get an idle connection to a SmartPlug or open a new one.
+
+        :param ip: IP address of target SP
+        :param port: port of target SP
+        :param timeout: seconds to wait for a new connection to be opened
+        :return: connection ready to send a command
+        """
+        conn = self._idle.pop((ip, port), None)
+        if conn is not None:
+            if conn.closed():
+                self._server_closed(conn)
+            elif monotonic() - conn.last_used > self.idle_timeout:
+                self.stats.idle_evictions += 1
+                conn.close()
+            else:
+                self.stats.hits += 1
+                return conn
+        self.stats.misses += 1
+        return await Connection.open(ip, port, timeout)
+
+    async def reconnect(self, ip: str, port: int, timeout: float) -> Connection:
+        """
+        Open a new connection after the SP dropped a pooled one.
+
+        :param ip: IP address of target SP
+        :param port: port of target SP
+        :param timeout: seconds to wait for the connection to be opened
+        :return: the new connection
+        """
+        self.stats.reconnects += 1
+        return await Connection.open(ip, port, timeout)
+
+    def release(self, conn: Connection) -> None:
+        """
+        Return a connection after a successful request.
+
+        :param conn: connection returned by acquire() or reconnect()
+        :return: None
+        """
+        conn.uses += 1
+        conn.last_used = monotonic()
+        key = (conn.ip, conn.port)
+        if key in self._no_keep_alive:
+            conn.close()
+            return
+        if conn.closed():
+            self._server_closed(conn)
+            return
+        previous = self._idle.pop(key, None)
+        if previous is not None:
+            previous.close()
+        self._idle[key] = conn
+
+    def evict_idle(self) -> int:
+        """
+        Close connections that have been idle longer than the idle timeout.
+
+        :return: number of closed connections
+        """
+        deadline = monotonic() - self.idle_timeout
+        expired = [k for k, c in self._idle.items() if c.last_used < deadline]
+        for key in expired:
+            self._idle.pop(key).close()
+        self.stats.idle_evictions += len(expired)
+        return len(expired)
+
+    def close(self) -> None:
+        """
+        Close every idle connection.
+
+        :return: None
+        """
+        for conn in self._idle.values():
+            conn.close()
+        self._idle.clear()
+
+    def _server_closed(self, conn: Connection) -> None:
+        self.stats.server_closes += 1
+        conn.close()
+        if conn.uses <= 1:
+            # the SP closes the connection after every response
+            logger.log_info_verbose(
+                "[SP]\tNo keep-alive at %s, connecting per request", conn.ip
+            )
+            self._no_keep_alive.add((conn.ip, conn.port))
@@ -0,0 +1,138 @@
+"""Registry of the known SmartPlugs and their state."""
+from typing import Dict, Iterator, Optional
+
+
+class PlugRecord:
+    """A SmartPlug known by its ID, with the state of its last polls."""
+
+    __slots__ = (
+        "sp_id",
+        "mac",
+        "ip",
+        "last_seen",
+        "power",
+        "relay_state",
+        "failures",
+        "sysinfo_time",
+    )
+
+    def __init__(self, sp_id: str):
+        self.sp_id = sp_id
+        self.mac: Optional[str] = None
+        self.ip: Optional[str] = None
+        # time() of the last answered poll
+        self.last_seen: Optional[float] = None
+        self.power: Optional[float] = None
+        self.relay_state: Optional[int] = None
+        # polls missed since the last answered one
+        self.failures = 0
+        # monotonic() of the last get_sysinfo answered at ip, None to get it
+        # on the next poll
+        self.sysinfo_time: Optional[float] = None
+
+    def __repr__(self) -> str:
+        return f"PlugRecord({self.sp_id!r}, mac={self.mac!r}, ip={self.ip!r})"
+
+
+class Registry:
+    """Records of the known SmartPlugs indexed by ID, MAC and IP.
+
+    Records are created when a plug gets a MAC from the ID map or an IP from
+    the IP cache, and dropped when it has neither. Two plugs may claim the
+    same IP while the cache is stale, the IP index points to the latest.
+    """
+
+    def __init__(self):
+        self._by_id: Dict[str, PlugRecord] = {}
+        self._by_mac: Dict[str, PlugRecord] = {}
+        self._by_ip: Dict[str, PlugRecord] = {}
+
+    def __contains__(self, sp_id: str) -> bool:
+        return sp_id in self._by_id
+
+    def __iter__(self) -> Iterator[PlugRecord]:
+        return iter(list(self._by_id.values()))
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def get(self, sp_id: str) -> Optional[PlugRecord]:
+        return self._by_id.get(sp_id)
+
+    def by_mac(self, mac: str) -> Optional[PlugRecord]:
+        return self._by_mac.get(mac)
+
+    def by_ip(self, ip: str) -> Optional[PlugRecord]:
+        return self._by_ip.get(ip)
+
+    def ids(self) -> Dict[str, str]:
+        """
+        :return: dict with the MACs of the plugs as keys and IDs as values
+        """
+        return {mac: record.sp_id for mac, record in self._by_mac.items()}
+
+    def ips(self) -> Dict[str, str]:
+        """
+        :return: dict with the IDs of the plugs as keys and IPs as values
+        """
+        return {r.sp_id: r.ip for r in self._by_id.values() if r.ip is not None}
+
+    def _record(self, sp_id: str) -> PlugRecord:
+        record = self._by_id.get(sp_id)
+        if record is None:
+            record = self._by_id[sp_id] = PlugRecord(sp_id)
+        return record
+
+    def _prune(self, record: PlugRecord) -> None:
+        if record.mac is None and record.ip is None:
+            self._by_id.pop(record.sp_id, None)
+
+    def set_mac(self, mac: str, sp_id: Optional[str]) -> bool:
+        """
+        Associate a MAC to a plug ID, as in the ID map.
+
+        :param mac: MAC of the plug
+        :param sp_id: ID of the plug, None to forget the MAC
+        :return: True if the association changed
+        """
+        previous = self._by_mac.get(mac)
+        if previous is not None and previous.sp_id == sp_id:
+            return False
+        if previous is None and sp_id is None:
+            return False
+        if previous is not None:
+            previous.mac = None
+            del self._by_mac[mac]
+            self._prune(previous)
+        if sp_id is not None:
+            record = self._record(sp_id)
+            if record.mac is not None:
+                del self._by_mac[record.mac]
+            record.mac = mac
+            self._by_mac[mac] = record
+        return True
+
+    def set_ip(self, sp_id: str, ip: Optional[str]) -> bool:
+        """
+        Associate an IP to a plug ID, as in the IP cache.
+
+        :param sp_id: ID of the plug
+        :param ip: IP of the plug, None to forget its IP
+        :return: True if the association changed
+        """
+        record = self._by_id.get(sp_id)
+        if record is None:
+            if ip is None:
+                return False
+            record = self._record(sp_id)
+        if record.ip == ip:
+            return False
+        if record.ip is not None and self._by_ip.get(record.ip) is record:
+            del self._by_ip[record.ip]
+        record.ip = ip
+        record.sysinfo_time = None
+        if ip is None:
+            self._prune(record)
+        else:
+            self._by_ip[ip] = record
+        return True
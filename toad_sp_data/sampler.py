@@ -0,0 +1,124 @@
+"""Per-plug poll intervals adapted to how much their power changes."""
+from math import sqrt
+from typing import Dict
+
+
+class SamplerState:
+    """Recent power of a plug that answered its polls."""
+
+    __slots__ = ("mean", "variance", "interval")
+
+    def __init__(self, power: float, interval: float):
+        self.mean = power
+        self.variance = 0.0
+        self.interval = interval
+
+
+class Sampler:
+    """Computes the delay before polling a plug again from the recent
+    variance of its power.
+
+    The mean and variance are exponentially weighted, so a plug whose load
+    starts changing is sampled faster after a single reading and a steady
+    one slows down gradually. Intervals go from max_interval for a constant
+    power down to min_interval, halving when the standard deviation reaches
+    scale. If the planned polls per second exceed the budget, every interval
+    is stretched by the same factor, but never beyond max_interval.
+    """
+
+    def __init__(
+        self,
+        min_interval: float,
+        max_interval: float,
+        budget: float,
+        alpha: float = 0.2,
+        scale: float = 5,
+    ):
+        """
+        Constructor for Sampler.
+
+        :param min_interval: seconds between polls of the most variable plugs
+        :param max_interval: seconds between polls of the steadiest plugs
+        :param budget: maximum polls per second, 0 for no limit
+        :param alpha: weight of every new reading in the mean and variance
+        :param scale: standard deviation of the power in W that halves the
+            interval from max_interval
+        """
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.budget = budget
+        self.alpha = alpha
+        self.scale = scale
+        self._states: Dict[str, SamplerState] = {}
+        # polls per second of the unstretched intervals
+        self._rate = 0.0
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+    def update(self, plug: str, power: float) -> None:
+        """
+        Register a reading of a plug.
+
+        :param plug: key of the plug, e.g. its IP
+        :param power: power in W
+        :return: None
+        """
+        state = self._states.get(plug)
+        if state is None:
+            # sampled fast until there is a variance to go by
+            self._states[plug] = SamplerState(power, self.min_interval)
+            self._rate += 1 / self.min_interval
+            return
+        diff = power - state.mean
+        increment = self.alpha * diff
+        state.mean += increment
+        state.variance = (1 - self.alpha) * (state.variance + diff * increment)
+        interval = self.max_interval / (1 + sqrt(state.variance) / self.scale)
+        interval = max(interval, self.min_interval)
+        self._rate += 1 / interval - 1 / state.interval
+        state.interval = interval
+
+    def stretch(self) -> float:
+        """
+        :return: factor every interval is multiplied by to meet the budget
+        """
+        if self.budget <= 0 or self._rate <= self.budget:
+            return 1.0
+        return self._rate / self.budget
+
+    def interval(self, plug: str) -> float:
+        """
+        Get the delay before polling a plug again.
+
+        :param plug: key of the plug
+        :return: seconds to wait, min_interval for plugs without readings
+        """
+        state = self._states.get(plug)
+        if state is None:
+            return self.min_interval
+        return min(state.interval * self.stretch(), self.max_interval)
+
+    def forget(self, plug: str) -> None:
+        """
+        Stop tracking a plug, e.g. when it stops answering.
+
+        :param plug: key of the plug
+        :return: None
+        """
+        state = self._states.pop(plug, None)
+        if state is not None:
+            self._rate -= 1 / state.interval
+        if not self._states:
+            # drop the rounding errors accumulated
+            self._rate = 0.0
+
+    def planned_rate(self) -> float:
+        """
+        :return: polls per second of the tracked plugs at their intervals
+        """
+        stretch = self.stretch()
+        return sum(
+            1 / min(state.interval * stretch, self.max_interval)
+            for state in self._states.values()
+        )
@@ -0,0 +1,132 @@
+"""Polling engine that runs every target from a single timer queue."""
+import asyncio
+import heapq
+from itertools import count
+from time import monotonic
+from typing import Awaitable, Callable, Dict, List, Tuple
+
+from toad_sp_data import logger
+
+
+class Scheduler:
+    """Keeps every target in a heap ordered by next-due time and hands due
+    targets to a fixed number of workers, which caps the number of polls
+    (and so of open connections) in flight."""
+
+    def __init__(
+        self,
+        poll: Callable[[str], Awaitable[float]],
+        workers: int,
+        retry_delay: float = 15,
+    ):
+        """
+        Constructor for Scheduler.
+
+        :param poll: coroutine polling a target and returning the seconds to
+            wait before polling it again
+        :param workers: maximum number of polls in flight
+        :param retry_delay: seconds to wait after a poll raised an exception
+        """
+        self.poll = poll
+        self.workers = workers
+        self.retry_delay = retry_delay
+        # heap of (due time, sequence, target, generation)
+        self._heap: List[Tuple[float, int, str, int]] = []
+        self._sequence = count()
+        # generation of every scheduled target, to skip removed entries
+        self._targets: Dict[str, int] = {}
+        self._queue: asyncio.Queue = None
+        self._wakeup: asyncio.Event = None
+        self.in_flight = 0
+
+    def __contains__(self, target: str) -> bool:
+        return target in self._targets
+
+    def __len__(self) -> int:
+        return len(self._targets)
+
+    def add(self, target: str, delay: float = 0) -> None:
+        """
+        Schedule a target to be polled.
+
+        :param target: target to pass to poll
+        :param delay: seconds to wait before the first poll
+        :return: None
+        """
+        if target in self._targets:
+            return
+        generation = next(self._sequence)
+        self._targets[target] = generation
+        self._push(target, generation, monotonic() + delay)
+
+    def remove(self, target: str) -> None:
+        """
+        Stop polling a target, a poll in flight is left to finish.
+
+        :param target: target passed to add
+        :return: None
+        """
+        self._targets.pop(target, None)
+
+    async def run(self) -> None:
+        """
+        Dispatch due targets to the workers until cancelled.
+
+        :return: None
+        """
+        self._queue = asyncio.Queue(maxsize=self.workers)
+        self._wakeup = asyncio.Event()
+        workers = [asyncio.ensure_future(self._work()) for _ in range(self.workers)]
+        try:
+            while True:
+                await self._dispatch()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+    async def _dispatch(self) -> None:
+        if not self._heap:
+            await self._wait(None)
+            return
+        due, _, target, generation = self._heap[0]
+        now = monotonic()
+        if due > now:
+            await self._wait(due - now)
+            return
+        heapq.heappop(self._heap)
+        if self._targets.get(target) == generation:
+            # blocks while every worker is busy
+            await self._queue.put((target, generation))
+
+    async def _wait(self, timeout: float) -> None:
+        """Sleep until timeout expires or a target is added."""
+        self._wakeup.clear()
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _work(self) -> None:
+        while True:
+            target, generation = await self._queue.get()
+            if self._targets.get(target) != generation:
+                continue
+            self.in_flight += 1
+            try:
+                delay = await self.poll(target)
+            except Exception as err:
+                logger.log_error_limited(
+                    target, "[SP]\tPoll of %s failed: %s", target, err
+                )
+                delay = self.retry_delay
+            finally:
+                self.in_flight -= 1
+            if self._targets.get(target) == generation:
+                self._push(target, generation, monotonic() + delay)
+
+    def _push(self, target: str, generation: int, due: float) -> None:
+        entry = (due, next(self._sequence), target, generation)
+        heapq.heappush(self._heap, entry)
+        if self._wakeup is not None and self._heap[0] is entry:
+            self._wakeup.set()
@@ -4,10 +4,38 @@ https://www.softscheck.com/en/reverse-engineering-tp-link-hs110/"""
 
 import asyncio
 import json
-from struct import pack
-from typing import Any, Tuple
+from struct import pack, unpack
+from time import perf_counter
+from typing import Any, Dict, Tuple, Union
 
-from toad_sp_data import logger
+from toad_sp_data import capture, config, decoding, logger, metrics
+from toad_sp_data.pool import Connection, ConnectionPool
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+# Initial key of the TP-Link autokey XOR cipher
+INITIAL_KEY = 171
+# Buffers of at least this many bytes are XORed with NumPy when it is installed
+NUMPY_THRESHOLD = 4096
+
+Buffer = Union[bytes, bytearray, memoryview]
+
+_CONNECT_SECONDS = metrics.POLL_STAGE_SECONDS.labels("connect")
+_SEND_SECONDS = metrics.POLL_STAGE_SECONDS.labels("send")
+_RECEIVE_SECONDS = metrics.POLL_STAGE_SECONDS.labels("receive")
+_DECRYPT_SECONDS = metrics.POLL_STAGE_SECONDS.labels("decrypt")
+_PARSE_SECONDS = metrics.POLL_STAGE_SECONDS.labels("parse")
+
+# power, relay state and MAC
+FULL_COMMAND: Dict[str, Dict[str, dict]] = {
+    "emeter": {"get_realtime": {}},
+    "system": {"get_sysinfo": {}},
+}
+# power only, the HS110 reports the relay state in get_sysinfo alone
+REALTIME_COMMAND: Dict[str, Dict[str, dict]] = {"emeter": {"get_realtime": {}}}
 
 
 class DecryptionException(Exception):
@@ -22,6 +50,58 @@ class DecryptionException(Exception):
     pass
 
 
+def _xor_encrypt(payload: Buffer, key: int = INITIAL_KEY) -> bytes:
+    """
+    Apply the autokey cipher to a payload without the length header.
+
+    Every encrypted byte is the XOR of all the previous plain bytes and the
+    key, so the whole payload is processed as one big integer with a
+    logarithmic number of shift-and-XOR passes instead of a per-byte loop.
+
+    :param payload: plain bytes
+    :param key: key used for the first byte
+    :return: encrypted bytes
+    """
+    size = len(payload)
+    if size == 0:
+        return b""
+    if np is not None and size >= NUMPY_THRESHOLD:
+        plain = np.frombuffer(payload, dtype=np.uint8).copy()
+        plain[0] ^= key
+        return np.bitwise_xor.accumulate(plain).tobytes()
+    value = int.from_bytes(payload, "big") ^ (key << (8 * (size - 1)))
+    shift = 8
+    while shift < 8 * size:
+        value ^= value >> shift
+        shift <<= 1
+    return value.to_bytes(size, "big")
+
+
+def _xor_decrypt(cipher: Buffer, key: int = INITIAL_KEY) -> bytes:
+    """
+    Revert the autokey cipher on a payload without the length header.
+
+    Every plain byte is the XOR of an encrypted byte and the encrypted byte
+    preceding it (or the key for the first one).
+
+    :param cipher: encrypted bytes
+    :param key: key used for the first byte
+    :return: decrypted bytes
+    """
+    size = len(cipher)
+    if size == 0:
+        return b""
+    if np is not None and size >= NUMPY_THRESHOLD:
+        encrypted = np.frombuffer(cipher, dtype=np.uint8)
+        plain = np.empty_like(encrypted)
+        plain[0] = encrypted[0] ^ key
+        np.bitwise_xor(encrypted[1:], encrypted[:-1], out=plain[1:])
+        return plain.tobytes()
+    value = int.from_bytes(cipher, "big")
+    key_stream = (key << (8 * (size - 1))) | (value >> 8)
+    return (value ^ key_stream).to_bytes(size, "big")
+
+
 def encrypt(payload: bytes) -> bytes:
     """
     Encrypt payload to be sent to a SP.
@@ -29,15 +109,10 @@ def encrypt(payload: bytes) -> bytes:
     :param payload: raw payload
     :return: encrypted payload
     """
-    key = 171
-    result = pack(">I", len(payload))
-    for i in payload:
-        key = x = key ^ i
-        result += bytes([x])
-    return result
+    return pack(">I", len(payload)) + _xor_encrypt(payload)
 
 
-def decrypt(response: bytes) -> bytes:
+def decrypt(response: Buffer) -> bytes:
     """
     Decrypt a response from a SP.
 
@@ -47,15 +122,33 @@ def decrypt(response: bytes) -> bytes:
     if response is None or len(response) < 4:
         raise DecryptionException("Invalid or null response")
     # strip unused bytes
-    response = response[4:]
-    # decrypt message
-    key = 171
-    result = b""
-    for i in response:
-        x = key ^ i
-        key = i
-        result += bytes([x])
-    return result
+    return _xor_decrypt(memoryview(response)[4:])
+
+
+class Decryptor:
+    """Incremental decryptor for responses that arrive in several chunks.
+
+    The length header is not handled here, only the encrypted payload
+    that follows it.
+    """
+
+    __slots__ = ("_key",)
+
+    def __init__(self):
+        self._key = INITIAL_KEY
+
+    def feed(self, chunk: Buffer) -> bytes:
+        """
+        Decrypt the next chunk of an encrypted payload.
+
+        :param chunk: encrypted bytes following the previously fed ones
+        :return: decrypted chunk
+        """
+        if len(chunk) == 0:
+            return b""
+        decrypted = _xor_decrypt(chunk, self._key)
+        self._key = chunk[-1]
+        return decrypted
 
 
 def encrypt_command(cmd: dict) -> bytes:
@@ -68,6 +161,16 @@ def encrypt_command(cmd: dict) -> bytes:
     return encrypt(json.dumps(cmd).encode("utf-8"))
 
 
+def loads(data: bytes) -> Any:
+    """
+    Parse a decrypted response with the configured decoder.
+
+    :param data: decrypted response
+    :return: parsed response
+    """
+    return decoding.get_decoder(config.SP_DECODER)(data)
+
+
 def decrypt_command(cmd: bytes) -> dict:
     """
     Decrypt the response of an SmartPlug or raise DecryptionException.
@@ -76,59 +179,232 @@ def decrypt_command(cmd: bytes) -> dict:
     :return: decrypted response
     """
     try:
-        return json.loads(decrypt(cmd))
-    except (json.JSONDecodeError, UnicodeDecodeError) as err:
+        return loads(decrypt(cmd))
+    except ValueError as err:
+        raise DecryptionException(str(err))
+
+
+def encrypt_datagram(cmd: dict) -> bytes:
+    """
+    Encrypt a command to be sent over UDP, where messages carry no length
+    header.
+
+    :param cmd: command to encrypt
+    :return: bytes containing encrypted command
+    """
+    return _xor_encrypt(json.dumps(cmd).encode("utf-8"))
+
+
+def decrypt_datagram(data: bytes) -> dict:
+    """
+    Decrypt a response received over UDP or raise DecryptionException.
+
+    :param data: bytes containing response to decrypt
+    :return: decrypted response
+    """
+    try:
+        return loads(_xor_decrypt(data))
+    except ValueError as err:
         raise DecryptionException(str(err))
 
 
-async def send_command(cmd: dict, ip: str, port: int = 9999) -> Tuple[bool, Any]:
+async def read_frame(
+    reader: asyncio.StreamReader, read_timeout: float = None, raw: bytearray = None
+) -> bytes:
+    """
+    Read a length-prefixed response from a SmartPlug and decrypt it as its
+    chunks arrive.
+
+    :param reader: stream connected to the SP
+    :param read_timeout: seconds to wait for each chunk of the response
+    :param raw: if given, the encrypted response is appended to it
+    :return: decrypted response
+    """
+    if read_timeout is None:
+        read_timeout = config.SP_READ_TIMEOUT
+    started = perf_counter()
+    header = await asyncio.wait_for(reader.readexactly(4), read_timeout)
+    (length,) = unpack(">I", header)
+    if length > config.SP_MAX_RESPONSE_SIZE:
+        raise DecryptionException(f"Response length {length} exceeds the limit")
+    if raw is not None:
+        raw += header
+    decryptor = Decryptor()
+    decrypted = bytearray()
+    remaining = length
+    decrypt_time = 0.0
+    while remaining:
+        chunk = await asyncio.wait_for(reader.read(remaining), read_timeout)
+        if not chunk:
+            raise asyncio.IncompleteReadError(bytes(decrypted), length)
+        if raw is not None:
+            raw += chunk
+        chunk_started = perf_counter()
+        decrypted += decryptor.feed(chunk)
+        decrypt_time += perf_counter() - chunk_started
+        remaining -= len(chunk)
+    _RECEIVE_SECONDS.observe(perf_counter() - started - decrypt_time)
+    _DECRYPT_SECONDS.observe(decrypt_time)
+    return bytes(decrypted)
+
+
+async def _exchange(
+    cmd: dict,
+    ip: str,
+    port: int,
+    connect_timeout: float,
+    read_timeout: float,
+    pool: ConnectionPool = None,
+    parse: bool = True,
+) -> Tuple[bool, Any]:
+    """
+    Send a command to a SmartPlug and read its response, either on a new
+    connection or on one taken from a pool.
+
+    :param cmd: dict containing command to send
+    :param ip: IP address of target SP
+    :param port: port of target SP
+    :param connect_timeout: seconds to wait for the connection to be opened
+    :param read_timeout: seconds to wait for each chunk of the response
+    :param pool: pool of connections to reuse, None to connect per request
+    :param parse: False to return the decrypted bytes without parsing them
+    :return: (True/False if command was successful, decrypted response)
+    """
+    payload = encrypt_command(cmd)
+    started = perf_counter()
+    if pool is None:
+        conn = await Connection.open(ip, port, connect_timeout)
+    else:
+        conn = await pool.acquire(ip, port, connect_timeout)
+    _CONNECT_SECONDS.observe(perf_counter() - started)
+    # raw response to capture, if capturing
+    raw = None if capture.writer is None else bytearray()
+    while True:
+        try:
+            started = perf_counter()
+            conn.writer.write(payload)
+            await conn.writer.drain()
+            _SEND_SECONDS.observe(perf_counter() - started)
+            data = await read_frame(conn.reader, read_timeout, raw)
+            break
+        except (asyncio.IncompleteReadError, ConnectionError) as err:
+            conn.close()
+            if raw is not None:
+                raw.clear()
+            empty = len(getattr(err, "partial", b"")) == 0
+            if pool is not None and conn.uses > 0 and empty:
+                # the SP dropped the pooled connection, retry on a new one
+                conn = await pool.reconnect(ip, port, connect_timeout)
+                continue
+            if isinstance(err, asyncio.IncompleteReadError) and empty:
+                logger.log_error_verbose("[SP]\tEmpty response from %s", ip)
+                return False, {}
+            raise
+        except BaseException:
+            conn.close()
+            raise
+    if pool is None:
+        conn.close()
+    else:
+        pool.release(conn)
+    if raw is not None and capture.writer is not None:
+        capture.writer.write(ip, perf_counter() - started, bytes(raw))
+    if not parse:
+        # the decode stage parses it, only reject what it cannot decode
+        if not decoding.framed(data):
+            logger.log_error_verbose("[SP]\tInvalid response from %s", ip)
+            return False, {}
+        return True, data
+    started = perf_counter()
+    response = loads(data)
+    _PARSE_SECONDS.observe(perf_counter() - started)
+    return True, response
+
+
+async def send_command(
+    cmd: dict,
+    ip: str,
+    port: int = 9999,
+    connect_timeout: float = None,
+    read_timeout: float = None,
+    total_timeout: float = None,
+    pool: ConnectionPool = None,
+    parse: bool = True,
+) -> Tuple[bool, Any]:
     """
     Send a command to a SmartPlug.
 
+    Timeouts default to the values in the [SMARTPLUG] configuration section.
+
     :param cmd: dict containing command to send
     :param ip: IP address of target SP
     :param port: port of target SP
+    :param connect_timeout: seconds to wait for the connection to be opened
+    :param read_timeout: seconds to wait for each chunk of the response
+    :param total_timeout: seconds to wait for the whole exchange
+    :param pool: pool of connections to reuse, None to connect per request
+    :param parse: False to return the decrypted bytes without parsing them
     :return: (True/False if command was successful, decrypted response)
     """
     logger.log_info_verbose(
-        "[SP]\tSend command to SP: addr({}:{}) msg({})".format(ip, port, cmd)
+        "[SP]\tSend command to SP: addr(%s:%s) msg(%s)", ip, port, cmd
     )
+    if connect_timeout is None:
+        connect_timeout = config.SP_CONNECT_TIMEOUT
+    if read_timeout is None:
+        read_timeout = config.SP_READ_TIMEOUT
+    if total_timeout is None:
+        total_timeout = config.SP_TOTAL_TIMEOUT
     try:
-        reader, writer = await asyncio.open_connection(ip, port)
-        writer.write(encrypt(json.dumps(cmd).encode("utf-8")))
-        await writer.drain()
-        data = await reader.read(2048)
-        writer.close()
-        await writer.wait_closed()
-        if len(data) == 0:
-            logger.log_error_verbose(f"[SP]\tEmpty response from {ip}")
-            return False, {}
-        decrypted = decrypt(data)
-        return True, json.loads(decrypted)
+        return await asyncio.wait_for(
+            _exchange(cmd, ip, port, connect_timeout, read_timeout, pool, parse),
+            total_timeout,
+        )
+    except asyncio.TimeoutError as err:
+        logger.log_error_verbose("[SP]\tTimeout waiting for %s", ip)
+        return False, err
     except Exception as err:
-        logger.log_error_verbose(f"[SP]\tError: '{str(err)}'")
+        logger.log_error_verbose("[SP]\tError: '%s'", err)
         return False, err
 
 
-async def get_power(ip: str, port: int = 9999) -> Tuple[bool, Any]:
+async def get_power(
+    ip: str, port: int = 9999, pool: ConnectionPool = None, parse: bool = True
+) -> Tuple[bool, Any]:
     """
     Get current power from a SmartPlug.
 
     :param ip: P address of target SP
     :param port: port of target SP
+    :param pool: pool of connections to reuse, None to connect per request
+    :param parse: False to return the decrypted bytes, see parse_info()
     :return: (True/False if command was successful, decrypted response)
     """
-    cmd: dict = {"emeter": {"get_realtime": {}}, "system": {"get_sysinfo": {}}}
-    return await send_command(cmd, ip, port)
+    return await send_command(FULL_COMMAND, ip, port, pool=pool, parse=parse)
 
 
-def extract_info(response: dict) -> dict:
+async def get_realtime(
+    ip: str, port: int = 9999, pool: ConnectionPool = None, parse: bool = True
+) -> Tuple[bool, Any]:
+    """
+    Get current power from a SmartPlug without its system information, a
+    much smaller response than the one of get_power().
 
+    :param ip: IP address of target SP
+    :param port: port of target SP
+    :param pool: pool of connections to reuse, None to connect per request
+    :param parse: False to return the decrypted bytes, see parse_power()
+    :return: (True/False if command was successful, decrypted response)
     """
-    Extract power, state and MAC address from SP response.
+    return await send_command(REALTIME_COMMAND, ip, port, pool=pool, parse=parse)
+
+
+def extract_power(response: dict) -> float:
+    """
+    Extract power from SP response.
 
     :param response: decrypted response from SmartPlug
-    :return: dict with keys "power", "relay_state" and "mac"
+    :return: power in W
     """
     power_key = (
         "power" if "power" in response["emeter"]["get_realtime"].keys() else "power_mw"
@@ -136,10 +412,59 @@ def extract_info(response: dict) -> dict:
     power = response["emeter"]["get_realtime"][power_key]
     if power_key == "power_mw":
         power = power / 1000.0
+    return power
+
+
+def extract_info(response: dict) -> dict:
+
+    """
+    Extract power, state and MAC address from SP response.
+
+    :param response: decrypted response from SmartPlug
+    :return: dict with keys "power", "relay_state" and "mac"
+    """
     info = {
-        "power": power,  # in W
+        "power": extract_power(response),  # in W
         "relay_state": response["system"]["get_sysinfo"]["relay_state"],
         "mac": response["system"]["get_sysinfo"]["mac"],
     }
-    logger.log_info_verbose(f"[SP]\tExtract info from response: {info}")
+    logger.log_info_verbose("[SP]\tExtract info from response: %s", info)
+    return info
+
+
+def parse_power(data: bytes) -> float:
+    """
+    Extract power from a decrypted SP response, parsing it whole unless the
+    targeted extraction is enabled and succeeds.
+
+    :param data: decrypted response from SmartPlug
+    :return: power in W
+    """
+    started = perf_counter()
+    power = None
+    if decoding.targeted(config.SP_EXTRACTOR, config.SP_DECODER):
+        power = decoding.extract_power(data)
+    if power is None:
+        power = extract_power(loads(data))
+    _PARSE_SECONDS.observe(perf_counter() - started)
+    return power
+
+
+def parse_info(data: bytes) -> dict:
+    """
+    Extract power, state and MAC address from a decrypted SP response,
+    parsing it whole unless the targeted extraction is enabled and succeeds.
+
+    :param data: decrypted response from SmartPlug
+    :return: dict with keys "power", "relay_state" and "mac"
+    """
+    started = perf_counter()
+    info = None
+    if decoding.targeted(config.SP_EXTRACTOR, config.SP_DECODER):
+        info = decoding.extract_info(data)
+    if info is None:
+        info = extract_info(loads(data))
+    else:
+        logger.log_info_verbose("[SP]\tExtract info from response: %s", info)
+    _PARSE_SECONDS.observe(perf_counter() - started)
     return info
@@ -0,0 +1,52 @@
+"""Local snapshot of what the Gatherer knows about the plugs, to start
+polling them on boot without waiting for ETCD."""
+import json
+import os
+from typing import Dict, List, NamedTuple, Optional
+
+from toad_sp_data import logger
+
+
+class Snapshot(NamedTuple):
+    # MACs as keys and IDs as values, as in the ID map
+    ids: Dict[str, str]
+    # IDs as keys and IPs as values, as in the IP cache
+    ips: Dict[str, str]
+    # IPs that answered their last poll
+    alive: List[str]
+
+
+def save(path: str, snapshot: Snapshot) -> None:
+    """
+    Write a snapshot, replacing the previous one atomically.
+
+    :param path: snapshot file
+    :param snapshot: snapshot to write
+    :return: None
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path + ".tmp", "w") as file:
+        json.dump(snapshot._asdict(), file)
+    os.replace(path + ".tmp", path)
+
+
+def load(path: str) -> Optional[Snapshot]:
+    """
+    Read a snapshot written by save().
+
+    :param path: snapshot file
+    :return: the snapshot, None if there is none or it cannot be read
+    """
+    try:
+        with open(path) as file:
+            content = json.load(file)
+        return Snapshot(
+            dict(content["ids"]), dict(content["ips"]), list(content["alive"])
+        )
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, KeyError, TypeError) as err:
+        logger.log_error("[SP]\tIgnoring snapshot %s: %r", path, err)
+        return None
@@ -0,0 +1,254 @@
+"""On-disk spool of the MQTT messages published while the broker is
+unreachable."""
+import os
+import struct
+import zlib
+from collections import deque
+from typing import BinaryIO, Deque, List, Optional, Tuple
+
+from toad_sp_data import logger
+
+# crc32 of the rest of the record, topic length and payload length
+_HEADER = struct.Struct(">IHI")
+_SUFFIX = ".seg"
+# name of the file keeping how much of the oldest segment was consumed
+_OFFSET_FILE = "offset"
+
+Record = Tuple[str, bytes]
+
+
+class SpoolException(Exception):
+    pass
+
+
+class Segment:
+    """A file of the spool holding records one after another."""
+
+    __slots__ = ("path", "size", "records")
+
+    def __init__(self, path: str, size: int = 0, records: int = 0):
+        self.path = path
+        self.size = size
+        self.records = records
+
+
+def _read_record(file, size: int) -> Tuple[Record, int]:
+    """
+    Read the record at the position of file.
+
+    :param file: segment opened for reading
+    :param size: bytes of the segment that may be read
+    :return: the record and its length in bytes, or None and 0 if the record
+        is incomplete or corrupt
+    """
+    start = file.tell()
+    header = file.read(_HEADER.size)
+    if len(header) < _HEADER.size:
+        return None, 0
+    crc, topic_length, payload_length = _HEADER.unpack(header)
+    length = _HEADER.size + topic_length + payload_length
+    if start + length > size:
+        return None, 0
+    body = file.read(topic_length + payload_length)
+    if zlib.crc32(header[4:] + body) != crc:
+        return None, 0
+    topic = body[:topic_length].decode("utf-8")
+    return (topic, body[topic_length:]), length
+
+
+class Spool:
+    """Append-only log of messages split in segment files.
+
+    Messages are appended to the newest segment and read in order from the
+    oldest one, which is deleted once every message in it has been
+    consumed. When the spool reaches max_size bytes, either the oldest
+    segment is evicted or new messages are dropped. A partially written
+    message left by a crash is truncated when the spool is opened again, and
+    messages peeked but not consumed before a crash are read again.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        segment_size: int = 1 << 20,
+        max_size: int = 100 << 20,
+        evict: str = "oldest",
+    ):
+        """
+        Constructor for Spool.
+
+        :param directory: directory of the segment files, created if needed
+        :param segment_size: bytes after which a new segment is started
+        :param max_size: maximum bytes of all the segments
+        :param evict: "oldest" to delete the oldest segment when full, or
+            "newest" to drop the messages appended while full
+        """
+        if evict not in ("oldest", "newest"):
+            raise SpoolException(f"Unknown eviction policy '{evict}'")
+        self.directory = directory
+        self.segment_size = segment_size
+        self.max_size = max(max_size, segment_size)
+        self.evict = evict
+        # messages lost because the spool was full
+        self.dropped = 0
+        self._segments: Deque[Segment] = deque()
+        # position and messages already read in the oldest segment
+        self._read_offset = 0
+        self._read_records = 0
+        # positions after each peeked message
+        self._peeked: List[int] = []
+        self._writer: Optional[BinaryIO] = None
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    def __len__(self) -> int:
+        return sum(s.records for s in self._segments) - self._read_records
+
+    @property
+    def size(self) -> int:
+        """Bytes of all the segments."""
+        return sum(s.size for s in self._segments)
+
+    def _load(self) -> None:
+        names = sorted(n for n in os.listdir(self.directory) if n.endswith(_SUFFIX))
+        for name in names:
+            path = os.path.join(self.directory, name)
+            segment = Segment(path)
+            size = os.path.getsize(path)
+            with open(path, "rb") as file:
+                while True:
+                    record, length = _read_record(file, size)
+                    if record is None:
+                        break
+                    segment.size += length
+                    segment.records += 1
+            if segment.size < size:
+                logger.log_error(
+                    "[SPOOL]\tTruncating %d bytes of %s", size - segment.size, path
+                )
+                os.truncate(path, segment.size)
+            if segment.records:
+                self._segments.append(segment)
+            else:
+                os.remove(path)
+        try:
+            with open(os.path.join(self.directory, _OFFSET_FILE)) as file:
+                name, offset, records = file.read().split()
+        except (OSError, ValueError):
+            return
+        if self._segments and os.path.basename(self._segments[0].path) == name:
+            self._read_offset, self._read_records = int(offset), int(records)
+
+    def _save_offset(self) -> None:
+        path = os.path.join(self.directory, _OFFSET_FILE)
+        name = os.path.basename(self._segments[0].path) if self._segments else ""
+        with open(path + ".tmp", "w") as file:
+            file.write(f"{name} {self._read_offset} {self._read_records}")
+        os.replace(path + ".tmp", path)
+
+    def _new_segment(self) -> Segment:
+        if self._writer is not None:
+            self._writer.close()
+        number = 0
+        if self._segments:
+            number = int(os.path.basename(self._segments[-1].path)[:-4]) + 1
+        segment = Segment(os.path.join(self.directory, f"{number:020d}{_SUFFIX}"))
+        self._segments.append(segment)
+        self._writer = open(segment.path, "ab", buffering=0)
+        return segment
+
+    def _remove_oldest(self) -> Segment:
+        segment = self._segments.popleft()
+        if not self._segments and self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        os.remove(segment.path)
+        self._read_offset = 0
+        self._read_records = 0
+        self._peeked.clear()
+        return segment
+
+    def append(self, topic: str, payload: bytes) -> bool:
+        """
+        Append a message at the end of the spool.
+
+        :param topic: MQTT topic of the message
+        :param payload: encoded payload of the message
+        :return: False if the message was dropped because the spool is full
+        """
+        encoded_topic = topic.encode("utf-8")
+        body = _HEADER.pack(0, len(encoded_topic), len(payload))[4:]
+        body += encoded_topic + payload
+        record = struct.pack(">I", zlib.crc32(body)) + body
+        while self._segments and self.size + len(record) > self.max_size:
+            if self.evict == "newest" or len(self._segments) == 1:
+                self.dropped += 1
+                return False
+            unread = self._segments[0].records - self._read_records
+            self._remove_oldest()
+            self._save_offset()
+            self.dropped += unread
+            logger.log_error("[SPOOL]\tSpool full, dropped %d messages", unread)
+        segment = self._segments[-1] if self._segments else None
+        if (
+            segment is None
+            or self._writer is None
+            or segment.size + len(record) > self.segment_size
+        ):
+            segment = self._new_segment()
+        self._writer.write(record)
+        segment.size += len(record)
+        segment.records += 1
+        return True
+
+    def peek(self, count: int) -> List[Record]:
+        """
+        Read the next messages of the oldest segment without consuming them.
+
+        :param count: maximum number of messages to read
+        :return: messages in the order they were appended
+        """
+        self._peeked.clear()
+        if not self._segments:
+            return []
+        segment = self._segments[0]
+        records: List[Record] = []
+        with open(segment.path, "rb") as file:
+            file.seek(self._read_offset)
+            offset = self._read_offset
+            while len(records) < count:
+                record, length = _read_record(file, segment.size)
+                if record is None:
+                    break
+                offset += length
+                records.append(record)
+                self._peeked.append(offset)
+        return records
+
+    def consume(self, count: int) -> None:
+        """
+        Consume the first messages returned by the last peek().
+
+        :param count: number of messages handled
+        :return: None
+        """
+        if count <= 0:
+            return
+        if count > len(self._peeked):
+            raise SpoolException(f"Only {len(self._peeked)} messages were peeked")
+        self._read_offset = self._peeked[count - 1]
+        self._read_records += count
+        self._peeked.clear()
+        if self._read_offset >= self._segments[0].size:
+            self._remove_oldest()
+        self._save_offset()
+
+    def close(self) -> None:
+        """
+        Close the file being appended to.
+
+        :return: None
+        """
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
@@ -0,0 +1,153 @@
+"""Supervisor that splits the IP range across several Gatherer processes."""
+import multiprocessing
+import signal
+from multiprocessing.process import BaseProcess
+from time import monotonic, sleep
+from typing import Callable, Dict, List, Optional, Union
+
+from toad_sp_data import logger, utils
+from toad_sp_data.targets import TargetSpace
+
+IPs = Union[TargetSpace, List[str]]
+
+
+class Supervisor:
+    """Runs one worker process per shard of the IP range.
+
+    Crashed workers are restarted. A worker slot that crashes more than
+    max_restarts times within restart_window seconds is dropped and its
+    IPs are rebalanced across the remaining workers, and it comes back
+    (rebalancing again) after restart_window seconds.
+    """
+
+    def __init__(
+        self,
+        target: Callable[[IPs, Optional[int]], None],
+        ips: IPs,
+        workers: int,
+        max_restarts: int = 5,
+        restart_window: float = 60,
+        check_interval: float = 1,
+    ):
+        """
+        Constructor for Supervisor.
+
+        :param target: function run by every worker with its IPs and its
+            worker slot, e.g. toad_sp_data.main.run
+        :param ips: every IP a SmartPlug might be listening at
+        :param workers: number of worker processes
+        :param max_restarts: restarts allowed per worker within restart_window
+        :param restart_window: seconds over which restarts are counted
+        :param check_interval: seconds between checks of the workers
+        """
+        self.target = target
+        self.ips = ips
+        self.workers = workers
+        self.max_restarts = max_restarts
+        self.restart_window = restart_window
+        self.check_interval = check_interval
+        self._context = multiprocessing.get_context("spawn")
+        self._processes: Dict[int, BaseProcess] = {}
+        # restart times of every worker slot
+        self._restarts: Dict[int, List[float]] = {i: [] for i in range(workers)}
+        # time at which each dropped slot comes back
+        self._dropped: Dict[int, float] = {}
+        self._running = False
+
+    @property
+    def active(self) -> List[int]:
+        """Worker slots that are not dropped."""
+        return [i for i in range(self.workers) if i not in self._dropped]
+
+    def shards(self) -> Dict[int, IPs]:
+        """
+        Split the IPs across the active worker slots, in contiguous ranges if
+        they are a TargetSpace.
+
+        :return: dict with worker slots as keys and their IPs as values
+        """
+        active = self.active
+        if isinstance(self.ips, TargetSpace):
+            return dict(zip(active, self.ips.shards(len(active))))
+        return dict(zip(active, utils.shard(self.ips, len(active))))
+
+    def run(self) -> None:
+        """
+        Start the workers and supervise them until SIGTERM or SIGINT.
+
+        :return: None
+        """
+        self._running = True
+        signal.signal(signal.SIGTERM, self._handle_signal)
+        self._start_all()
+        try:
+            while self._running:
+                sleep(self.check_interval)
+                self.check()
+        except KeyboardInterrupt:
+            pass
+        self.stop()
+
+    def check(self) -> None:
+        """
+        Restart crashed workers, dropping and bringing back worker slots.
+
+        :return: None
+        """
+        now = monotonic()
+        rebalance = False
+        for slot, back_at in list(self._dropped.items()):
+            if now >= back_at:
+                logger.log_info("[SUP]\tBringing back worker %d", slot)
+                del self._dropped[slot]
+                self._restarts[slot].clear()
+                rebalance = True
+        for slot, process in list(self._processes.items()):
+            if process.is_alive():
+                continue
+            logger.log_error("[SUP]\tWorker %d exited with %s", slot, process.exitcode)
+            del self._processes[slot]
+            restarts = self._restarts[slot]
+            restarts[:] = [t for t in restarts if now - t < self.restart_window]
+            restarts.append(now)
+            if len(restarts) > self.max_restarts and len(self.active) > 1:
+                logger.log_error("[SUP]\tDropping worker %d", slot)
+                self._dropped[slot] = now + self.restart_window
+                rebalance = True
+            elif not rebalance:
+                self._start(slot, self.shards()[slot])
+        if rebalance:
+            self._stop_all()
+            self._start_all()
+
+    def stop(self) -> None:
+        """
+        Stop every worker and wait for them to exit.
+
+        :return: None
+        """
+        self._running = False
+        self._stop_all()
+
+    def _handle_signal(self, *args) -> None:
+        self._running = False
+
+    def _start_all(self) -> None:
+        for slot, ips in self.shards().items():
+            self._start(slot, ips)
+
+    def _start(self, slot: int, ips: IPs) -> None:
+        logger.log_info("[SUP]\tStarting worker %d with %d IPs", slot, len(ips))
+        process = self._context.Process(
+            target=self.target, args=(ips, slot), name=f"gatherer-{slot}"
+        )
+        process.start()
+        self._processes[slot] = process
+
+    def _stop_all(self) -> None:
+        # workers flush their state and exit on SIGTERM
+        for process in self._processes.values():
+            process.terminate()
+        for process in self._processes.values():
+            process.join()
+        self._processes.clear()
@@ -0,0 +1,186 @@
+"""Space of the IPv4 addresses SmartPlugs might be listening at."""
+import ipaddress
+import socket
+import struct
+from array import array
+from bisect import bisect_right
+from typing import Iterable, Iterator, List, Tuple
+
+Range = Tuple[int, int]
+
+
+class TargetSpaceException(Exception):
+    pass
+
+
+def ip_to_int(ip: str) -> int:
+    return struct.unpack(">I", socket.inet_aton(ip))[0]
+
+
+def int_to_ip(number: int) -> str:
+    return socket.inet_ntoa(struct.pack(">I", number))
+
+
+def parse_range(spec: str) -> Range:
+    """
+    Parse a range of addresses.
+
+    :param spec: "10.0.0.0/20" for the hosts of a network (without its
+        network and broadcast addresses, up to /30), "10.0.0.5-10.0.0.20"
+        for both addresses and the ones in between, or a single address
+    :return: first and last address of the range as integers
+    """
+    spec = spec.strip()
+    try:
+        if "/" in spec:
+            network = ipaddress.IPv4Network(spec, strict=False)
+            first = int(network.network_address)
+            last = int(network.broadcast_address)
+            if network.prefixlen <= 30:
+                first, last = first + 1, last - 1
+            return first, last
+        if "-" in spec:
+            start, end = spec.split("-")
+            first, last = ip_to_int(start.strip()), ip_to_int(end.strip())
+        else:
+            first = last = ip_to_int(spec)
+    except (OSError, ValueError) as err:
+        raise TargetSpaceException(f"Invalid IP range '{spec}': {err}")
+    if first > last:
+        raise TargetSpaceException(f"Empty IP range '{spec}'")
+    return first, last
+
+
+def _merge(ranges: Iterable[Range]) -> List[Range]:
+    merged: List[Range] = []
+    for first, last in sorted(ranges):
+        if merged and first <= merged[-1][1] + 1:
+            if last > merged[-1][1]:
+                merged[-1] = (merged[-1][0], last)
+        else:
+            merged.append((first, last))
+    return merged
+
+
+def _subtract(ranges: List[Range], excluded: List[Range]) -> List[Range]:
+    """Remove excluded from ranges, both sorted and merged."""
+    result: List[Range] = []
+    i = 0
+    for first, last in ranges:
+        while i < len(excluded) and excluded[i][1] < first:
+            i += 1
+        j = i
+        while j < len(excluded) and excluded[j][0] <= last:
+            if excluded[j][0] > first:
+                result.append((first, excluded[j][0] - 1))
+            first = max(first, excluded[j][1] + 1)
+            j += 1
+        if first <= last:
+            result.append((first, last))
+    return result
+
+
+class TargetSpace:
+    """Sorted, disjoint ranges of IPv4 addresses kept as two arrays of
+    integers, so that a /16 takes a few bytes instead of 65536 strings.
+
+    Addresses are generated lazily when iterating, and membership is checked
+    with a binary search over the ranges.
+    """
+
+    def __init__(self, ranges: Iterable[Range] = (), excluded: Iterable[Range] = ()):
+        """
+        Constructor for TargetSpace.
+
+        :param ranges: (first, last) addresses as integers, both included,
+            that may overlap
+        :param excluded: (first, last) addresses to leave out
+        """
+        merged = _subtract(_merge(ranges), _merge(excluded))
+        self._firsts = array("I", (first for first, _ in merged))
+        self._lasts = array("I", (last for _, last in merged))
+        self._size = sum(last - first + 1 for first, last in merged)
+
+    @classmethod
+    def parse(
+        cls, ranges: Iterable[str], excluded: Iterable[str] = ()
+    ) -> "TargetSpace":
+        """
+        Build a TargetSpace from range specifications, see parse_range().
+
+        :param ranges: ranges to include
+        :param excluded: ranges to leave out
+        :return: the target space
+        """
+        return cls(
+            [parse_range(s) for s in ranges if s.strip()],
+            [parse_range(s) for s in excluded if s.strip()],
+        )
+
+    @classmethod
+    def from_ips(cls, ips: Iterable[str]) -> "TargetSpace":
+        """
+        :param ips: single addresses
+        :return: target space of the addresses
+        """
+        return cls((number, number) for number in map(ip_to_int, ips))
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator[str]:
+        for first, last in zip(self._firsts, self._lasts):
+            for number in range(first, last + 1):
+                yield int_to_ip(number)
+
+    def __contains__(self, ip: object) -> bool:
+        if not isinstance(ip, str):
+            return False
+        try:
+            number = ip_to_int(ip)
+        except OSError:
+            return False
+        index = bisect_right(self._firsts, number) - 1
+        return index >= 0 and number <= self._lasts[index]
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, TargetSpace):
+            return NotImplemented
+        return self.ranges() == other.ranges()
+
+    def __repr__(self) -> str:
+        ranges = ", ".join(
+            f"{int_to_ip(first)}-{int_to_ip(last)}" for first, last in self.ranges()
+        )
+        return f"TargetSpace([{ranges}])"
+
+    def ranges(self) -> List[Range]:
+        """
+        :return: (first, last) addresses of the ranges as integers
+        """
+        return list(zip(self._firsts, self._lasts))
+
+    def shards(self, count: int) -> List["TargetSpace"]:
+        """
+        Split the space into count contiguous shards of (almost) the same size.
+
+        :param count: number of shards
+        :return: list of shards, every address is in exactly one of them
+        """
+        shards: List[TargetSpace] = []
+        ranges = self.ranges()
+        for index in range(count):
+            # addresses the shard takes
+            remaining = self._size // count + (index < self._size % count)
+            taken: List[Range] = []
+            while remaining and ranges:
+                first, last = ranges[0]
+                if last - first + 1 <= remaining:
+                    taken.append(ranges.pop(0))
+                    remaining -= last - first + 1
+                else:
+                    taken.append((first, first + remaining - 1))
+                    ranges[0] = (first + remaining, last)
+                    remaining = 0
+            shards.append(TargetSpace(taken))
+        return shards
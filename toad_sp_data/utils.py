@@ -13,4 +13,15 @@ def ip_range(start: str, end: str) -> List[str]:
     """
     start_n = struct.unpack(">I", socket.inet_aton(start))[0]
     end_n = struct.unpack(">I", socket.inet_aton(end))[0]
-    return [socket.inet_ntoa(struct.pack(">I", i)) for i in range(start_n, end_n)]
+    return [socket.inet_ntoa(struct.pack(">I", i)) for i in range(start_n, end_n + 1)]
+
+
+def shard(items: List[str], count: int) -> List[List[str]]:
+    """
+    Split items into count shards of (almost) the same size.
+
+    :param items: items to split
+    :param count: number of shards
+    :return: list of shards, every item is in exactly one of them
+    """
+    return [items[i::count] for i in range(count)]
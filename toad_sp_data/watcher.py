@@ -0,0 +1,142 @@
+"""Live mirror of the children of an ETCD key."""
+import asyncio
+import threading
+from typing import Any, Callable, Dict, Optional
+
+import etcd
+
+from toad_sp_data import etcdclient, logger
+
+# actions of the ETCD changes that remove a key
+_REMOVALS = ("delete", "expire", "compareAndDelete")
+
+
+class KeyWatcher:
+    """Watches the children of an ETCD key and reports their changes.
+
+    The blocking long-polls run in a daemon thread, so they neither block
+    the event loop nor hold one of the ETCD executor threads, and the
+    callbacks are called on the event loop. The index of the last change
+    seen is tracked so that no change is missed between two polls; if ETCD
+    no longer keeps that index, the whole key is read again.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        key: str,
+        on_change: Callable[[str, Optional[str]], Any],
+        on_reset: Callable[[Dict[str, str]], Any],
+        timeout: float = 60,
+        retry_delay: float = 5,
+    ):
+        """
+        Constructor for KeyWatcher.
+
+        :param host: ETCD host
+        :param port: ETCD port
+        :param key: parent key to watch
+        :param on_change: called with the name of a child and its new value,
+            or None if it was removed
+        :param on_reset: called with every child (names as keys) when the
+            key is read whole
+        :param timeout: seconds each long-poll waits for a change
+        :param retry_delay: seconds to wait after ETCD fails
+        """
+        self.host = host
+        self.port = port
+        self.key = key.rstrip("/")
+        self.on_change = on_change
+        self.on_reset = on_reset
+        self.timeout = timeout
+        self.retry_delay = retry_delay
+        # index of the next change to watch, None to read the key whole
+        self.index: Optional[int] = None
+        self._event_loop: asyncio.AbstractEventLoop = None
+        self._stopped = threading.Event()
+        self._thread: threading.Thread = None
+
+    def start(self, event_loop: asyncio.AbstractEventLoop) -> None:
+        """
+        Start watching the key.
+
+        :param event_loop: loop the callbacks are called on
+        :return: None
+        """
+        self._event_loop = event_loop
+        self._stopped.clear()
+        self._thread = threading.Thread(
+            target=self._run, name=f"watch{self.key}", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stop watching, the pending long-poll is abandoned.
+
+        :return: None
+        """
+        self._stopped.set()
+
+    def _call(self, callback: Callable, *args) -> None:
+        try:
+            self._event_loop.call_soon_threadsafe(callback, *args)
+        except RuntimeError:
+            # the event loop is closed
+            self._stopped.set()
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                self.poll_once()
+            except etcd.EtcdWatchTimedOut:
+                continue
+            except etcd.EtcdEventIndexCleared:
+                logger.log_info("[ETCD]\tMissed changes of %s, reading it", self.key)
+                self.index = None
+            except Exception as err:
+                logger.log_error("[ETCD]\tFailed to watch %s: %s", self.key, err)
+                self._stopped.wait(self.retry_delay)
+
+    def poll_once(self) -> None:
+        """
+        Read the key whole if needed, or wait for its next change.
+
+        :return: None
+        """
+        if self.index is None:
+            children, self.index = etcdclient.read_children(
+                self.host, self.port, self.key
+            )
+            if not self._stopped.is_set():
+                self._call(self.on_reset, children)
+            if self.index is None:
+                # the key does not exist and there is no index to watch it from
+                self._stopped.wait(self.retry_delay)
+            return
+        result = etcdclient.watch(
+            self.host, self.port, self.key, self.index, self.timeout
+        )
+        if not self._stopped.is_set():
+            self.handle(result)
+
+    def handle(self, result: etcd.EtcdResult) -> None:
+        """
+        Report a change returned by a watch and move past its index.
+
+        :param result: change of the key or one of its children
+        :return: None
+        """
+        self.index = result.modifiedIndex + 1
+        key = result.key.rstrip("/")
+        if key == self.key:
+            if result.action in _REMOVALS:
+                self._call(self.on_reset, {})
+            return
+        if result.dir or key.rsplit("/", 1)[0] != self.key:
+            # only direct children are mirrored
+            return
+        name = key.rsplit("/", 1)[-1]
+        value = None if result.action in _REMOVALS else result.value
+        self._call(self.on_change, name, value)